@@ -0,0 +1,24 @@
+"""
+Gunicorn settings for the video service
+
+    cd backend && gunicorn -c gunicorn.conf.py video_service:app
+
+Jobs, their SSE waiters, the in-flight generation table and the worker pools
+all live in the serving process, so this runs ONE worker and gets its
+concurrency from threads. Extra workers would each see only the jobs they
+created. preload_app stays off: the SQLite connection and background threads
+that video_service starts at import must be created in the worker, not in a
+master that then forks.
+"""
+
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5001')
+workers = 1
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+preload_app = False
+
+# Synchronous stitches and SSE streams hold a request open for minutes
+timeout = 300
+graceful_timeout = 30
@@ -4,16 +4,223 @@ Media Manager - Manages videos and workflows with persistence
 Handles video storage, deduplication, and workflow associations
 """
 
+import os
+import queue
 import sqlite3
 import hashlib
-import json
+import mmap
+import threading
+import zlib
+from collections import Counter, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Set
 import logging
 
+import orjson
+
+try:
+    from fastcdc import fastcdc
+except ImportError:
+    fastcdc = None
+
+try:
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
+
 logger = logging.getLogger(__name__)
 
+# Algorithm tag stored alongside each file_hash so rows hashed with a
+# different scheme are never compared against each other
+HASH_ALGO = 'sha256'
+
+# Tree hash: SHA256 over the concatenated SHA256 digests of 8 MiB chunks,
+# which lets chunks be hashed on several cores. Enabled via USE_PARALLEL_HASH.
+TREE_HASH_ALGO = 'sha256-tree-8M'
+TREE_HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+# BLAKE3 (SIMD, multithreaded over the file's internal tree); needs the
+# optional blake3 package. Selected with DEDUP_HASH_ALGO=blake3.
+BLAKE3_HASH_ALGO = 'blake3'
+
+# Read size for the buffered hashing fallback
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Synthetic content id for files the caller guarantees are unique (e.g. fresh
+# generations); no bytes are read to produce it
+SYNTHETIC_HASH_ALGO = 'synthetic'
+
+# Placeholder fingerprint for rows added with defer_hash=True until the
+# background worker has hashed the file; unique per video id, so it never
+# matches anything in the dedupe index
+PENDING_HASH_ALGO = 'pending'
+
+# Chunk index (opt-in via INDEX_VIDEO_CHUNKS): each file is cut into
+# content-defined chunks (FastCDC, when the fastcdc package is installed) and
+# every chunk's BLAKE2b digest is recorded, so re-encodes and remuxes that keep
+# most of the bytes can be found via find_similar_videos. Without fastcdc the
+# file is cut at fixed CHUNK_AVG_SIZE offsets, which only matches in-place edits;
+# fingerprints from the two chunkers are not comparable, so the index records
+# which one built it.
+CHUNK_MIN_SIZE = 256 * 1024
+CHUNK_AVG_SIZE = 1024 * 1024
+CHUNK_MAX_SIZE = 4 * 1024 * 1024
+FASTCDC_CHUNKER = 'fastcdc'
+FIXED_CHUNKER = 'fixed'
+
+# Prefilter: files of at least QUICK_FP_SIZE bytes get a cheap fingerprint
+# (size plus a hash of the first QUICK_FP_SIZE bytes). With DEDUP_PREFILTER
+# set, a file whose quick fingerprint matches nothing is stored without a
+# full hash, under a placeholder that is unique per video id; it is hashed
+# for real only once a later file shares its quick fingerprint.
+QUICK_FP_SIZE = 4096
+UNHASHED_ALGO = 'unhashed'
+
+# Columns of the videos table, in schema order; list_videos projects onto these
+VIDEO_COLUMNS = (
+    'id', 'name', 'file_path', 'file_hash', 'hash_algo', 'size_bytes',
+    'duration_seconds', 'resolution', 'aspect_ratio', 'codec', 'fps',
+    'source_type', 'created_at', 'metadata', 'hash_status', 'quick_fp'
+)
+
+# Statements on the hot paths. Keeping the text fixed (no per-call string
+# building) means each one is compiled once and then served from the
+# connection's statement cache.
+_SQL_GET_FINGERPRINT = '''
+    SELECT file_hash FROM fs_fingerprint
+    WHERE dev = ? AND inode = ? AND size = ? AND mtime_ns = ? AND hash_algo = ?
+'''
+_SQL_PUT_FINGERPRINT = '''
+    INSERT OR REPLACE INTO fs_fingerprint
+    (dev, inode, size, mtime_ns, hash_algo, file_hash)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+_SQL_FIND_DUP = 'SELECT id, file_path FROM videos WHERE file_hash = ? AND hash_algo = ?'
+_SQL_INSERT_VIDEO = '''
+    INSERT INTO videos (
+        id, name, file_path, file_hash, hash_algo, size_bytes,
+        duration_seconds, resolution, aspect_ratio, codec, fps,
+        source_type, metadata, hash_status, quick_fp
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+# Same insert, skipped (no row returned) when the content is already stored
+_SQL_INSERT_VIDEO_DEDUP = _SQL_INSERT_VIDEO + '''
+    ON CONFLICT(file_hash, hash_algo) DO NOTHING
+    RETURNING id
+'''
+_SQL_PUT_CHUNK = '''
+    INSERT INTO chunks (fp, size, refcount) VALUES (?, ?, 1)
+    ON CONFLICT(fp) DO UPDATE SET refcount = refcount + 1
+'''
+_SQL_GET_VIDEO = 'SELECT * FROM videos WHERE id = ?'
+_SQL_PUT_JOB = 'INSERT OR REPLACE INTO jobs (id, created_at, status, data) VALUES (?, ?, ?, ?)'
+_SQL_GET_GENERATION = 'SELECT * FROM video_generation WHERE video_id = ?'
+_SQL_PUT_GENERATION = '''
+    INSERT OR REPLACE INTO video_generation (
+        video_id, provider, model, prompt, generation_params,
+        job_id, status, error, started_at, completed_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+# Absent (NULL) arguments keep the current column value
+_SQL_UPDATE_WORKFLOW = '''
+    UPDATE workflows SET
+        name = COALESCE(?, name),
+        description = COALESCE(?, description),
+        definition = COALESCE(?, definition),
+        status = COALESCE(?, status),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+'''
+_SQL_UPDATE_EXECUTION = '''
+    UPDATE workflow_executions
+    SET status = ?, error = ?, execution_data = ?, completed_at = ?
+    WHERE id = ?
+'''
+
+# How often queued workflow execution updates are written, in seconds
+EXECUTION_FLUSH_INTERVAL = 0.1
+
+
+def _dumps(obj: Any) -> str:
+    """Serialize obj to a JSON string (orjson; handles datetimes natively)"""
+    return orjson.dumps(obj).decode()
+
+
+# Opaque values (generation_params, execution_data) are never read by SQL,
+# so they are stored as the UTF-8 bytes orjson produces, skipping the str
+# round trip. _loads accepts both bytes and the text rows written earlier.
+_dumps_blob = orjson.dumps
+
+_loads = orjson.loads
+
+
+def _generation_row(
+    video_id: str,
+    provider: str,
+    prompt: str,
+    model: Optional[str] = None,
+    generation_params: Optional[Dict[str, Any]] = None,
+    job_id: Optional[str] = None,
+    status: str = 'completed',
+    error: Optional[str] = None,
+    started_at: Optional[str] = None,
+    completed_at: Optional[str] = None
+) -> tuple:
+    """Parameters for _SQL_PUT_GENERATION"""
+    return (
+        video_id, provider, model, prompt,
+        _dumps_blob(generation_params) if generation_params else None,
+        job_id, status, error, started_at, completed_at
+    )
+
+
+# On-disk format version, tracked in PRAGMA user_version
+#   1: workflows.definition stored as a zlib-compressed JSON BLOB
+#   2: trigger-maintained counters in video_stats / workflow_status_counts
+#   3: videos.quick_fp filled in for hashed rows (now done on every start
+#      with the prefilter on, see _fill_quick_fingerprints)
+SCHEMA_VERSION = 3
+
+
+def _pack_definition(definition: Dict[str, Any]) -> bytes:
+    """Encode a workflow definition for storage (compressed JSON bytes)"""
+    return zlib.compress(orjson.dumps(definition), 3)
+
+
+def _unpack_definition(value) -> Dict[str, Any]:
+    """Decode a stored workflow definition; rows written before v1 are JSON text"""
+    if isinstance(value, bytes):
+        return orjson.loads(zlib.decompress(value))
+    return orjson.loads(value)
+
+
+class _TreeHasher:
+    """Incremental form of MediaManager._calculate_tree_hash (same digest)"""
+
+    def __init__(self):
+        self._digests = []
+        self._chunk = hashlib.sha256()
+        self._filled = 0
+
+    def update(self, data):
+        view = memoryview(data)
+        while view:
+            take = min(len(view), TREE_HASH_CHUNK_SIZE - self._filled)
+            self._chunk.update(view[:take])
+            self._filled += take
+            view = view[take:]
+            if self._filled == TREE_HASH_CHUNK_SIZE:
+                self._digests.append(self._chunk.digest())
+                self._chunk = hashlib.sha256()
+                self._filled = 0
+
+    def hexdigest(self) -> str:
+        digests = self._digests + ([self._chunk.digest()] if self._filled else [])
+        return hashlib.sha256(b"".join(digests)).hexdigest()
+
 
 class MediaManager:
     """
@@ -26,12 +233,122 @@ class MediaManager:
         self.video_dir.mkdir(exist_ok=True)
         self.db_path.parent.mkdir(exist_ok=True)
 
+        self.hash_algo = self._select_hash_algo()
+        self.index_chunks = os.environ.get('INDEX_VIDEO_CHUNKS', '').lower() in ('1', 'true', 'yes')
+        if self.index_chunks and fastcdc is None:
+            logger.warning(
+                "INDEX_VIDEO_CHUNKS is on but the fastcdc package is not installed: chunking at "
+                "fixed offsets, which misses near-duplicates whose content is shifted by an insertion"
+            )
+        self.dedup_prefilter = os.environ.get('DEDUP_PREFILTER', '').lower() in ('1', 'true', 'yes')
+
+        # One long-lived connection shared by every method; reopening the
+        # database per call re-reads the schema and cold-starts the page cache
+        self._lock = threading.RLock()
+        self._conn = self._connect()
+
+        # Execution progress updates are coalesced and written in batches
+        self._exec_write_queue = queue.Queue()
+        self._exec_flush_lock = threading.Lock()
+        self._exec_writer = None
+        self._exec_writer_stop = threading.Event()
+
+        # Background hashing for videos added with defer_hash=True
+        self._hash_executor = None
+
         self._init_database()
+        self._resume_deferred_hashes()
+
+    @staticmethod
+    def _select_hash_algo() -> str:
+        """
+        Pick the dedup hash from DEDUP_HASH_ALGO (or the older USE_PARALLEL_HASH)
+
+        SHA256 stays the default: with SHA-NI it is the fastest hash in
+        hashlib, and files only dedupe against rows hashed the same way.
+        """
+        algo = os.environ.get('DEDUP_HASH_ALGO', '').strip()
+        if not algo:
+            use_parallel_hash = os.environ.get('USE_PARALLEL_HASH', '').lower() in ('1', 'true', 'yes')
+            return TREE_HASH_ALGO if use_parallel_hash else HASH_ALGO
+
+        if algo == BLAKE3_HASH_ALGO and blake3 is None:
+            logger.warning("DEDUP_HASH_ALGO=blake3 but the blake3 package is not installed, using sha256")
+            return HASH_ALGO
+        if algo not in (HASH_ALGO, TREE_HASH_ALGO, BLAKE3_HASH_ALGO):
+            raise ValueError(f"Unknown DEDUP_HASH_ALGO: {algo}")
+        return algo
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the shared connection and apply per-connection tuning"""
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False, cached_statements=128)
+        conn.row_factory = sqlite3.Row
+
+        # WAL: readers never block the writer and the writer never blocks
+        # readers; with synchronous=NORMAL commits no longer fsync twice,
+        # only checkpoints do. journal_mode persists in the database file
+        # and cannot be switched inside a transaction, so set it up front.
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        # Enforce the ON DELETE CASCADE / SET NULL clauses in the schema
+        conn.execute('PRAGMA foreign_keys=ON')
+
+        # Page cache and mmap are per connection, so they only pay off now
+        # that the connection outlives a single call
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA mmap_size=268435456')  # 256 MiB
+        conn.execute('PRAGMA cache_size=-131072')   # 128 MiB
+        return conn
+
+    def close(self):
+        """Finish background work and close the shared database connection"""
+        if self._hash_executor is not None:
+            self._hash_executor.shutdown(wait=True)
+
+        self._exec_writer_stop.set()
+        if self._exec_writer is not None:
+            self._exec_writer.join()
+        self.flush_execution_updates()
+
+        with self._lock:
+            self._conn.execute('PRAGMA optimize')
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self, immediate: bool = False):
+        """
+        Yield a cursor on the shared connection; commit on success, roll back on error
+
+        With immediate=True the write lock is taken up front (BEGIN IMMEDIATE),
+        so a read-then-write block cannot race another process's writer.
+        """
+        with self._lock:
+            cursor = self._conn.cursor()
+            if immediate:
+                cursor.execute('BEGIN IMMEDIATE')
+            try:
+                yield cursor
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
 
     def _init_database(self):
         """Initialize SQLite database with required tables"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
+        with self._transaction() as cursor:
+            self._create_tables(cursor)
+            # Gather planner statistics the first time; PRAGMA optimize on
+            # close keeps them fresh afterwards
+            has_stats = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            ).fetchone()
+            if not has_stats:
+                cursor.execute('ANALYZE')
+        logger.info(f"Database initialized at {self.db_path}")
+
+    def _create_tables(self, cursor):
+        """Create tables and indexes that do not exist yet"""
 
         # Videos table - stores all video metadata
         cursor.execute('''
@@ -40,6 +357,7 @@ class MediaManager:
                 name TEXT NOT NULL,
                 file_path TEXT NOT NULL UNIQUE,
                 file_hash TEXT NOT NULL,
+                hash_algo TEXT NOT NULL DEFAULT 'sha256',
                 size_bytes INTEGER NOT NULL,
                 duration_seconds REAL,
                 resolution TEXT,
@@ -48,15 +366,32 @@ class MediaManager:
                 fps REAL,
                 source_type TEXT NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                metadata JSON
+                metadata JSON,
+                hash_status TEXT NOT NULL DEFAULT 'ready',
+                quick_fp TEXT
             )
         ''')
 
-        # Create index on file_hash for deduplication
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_videos_hash
-            ON videos(file_hash)
-        ''')
+        # Bring databases created by older versions up to date
+        self._migrate_schema(cursor)
+
+        # Unique content fingerprint: lets add_video dedupe in the INSERT
+        # itself. A database that already holds duplicate hashes (from before
+        # the constraint) keeps the plain index and the check-then-insert path.
+        try:
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_videos_hash_unique
+                ON videos(file_hash, hash_algo)
+            ''')
+            cursor.execute('DROP INDEX IF EXISTS idx_videos_hash')
+            self._hash_unique = True
+        except sqlite3.IntegrityError as e:
+            logger.warning(f"Existing duplicate video hashes, not enforcing uniqueness: {e}")
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_videos_hash
+                ON videos(file_hash)
+            ''')
+            self._hash_unique = False
 
         # Generation details table - tracks how videos were created
         cursor.execute('''
@@ -65,7 +400,7 @@ class MediaManager:
                 provider TEXT,
                 model TEXT,
                 prompt TEXT,
-                generation_params JSON,
+                generation_params BLOB,
                 job_id TEXT,
                 status TEXT,
                 error TEXT,
@@ -75,6 +410,31 @@ class MediaManager:
             )
         ''')
 
+        # File fingerprint cache - maps stat identity to a previously computed
+        # hash so unchanged files are never re-read
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fs_fingerprint (
+                dev INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash_algo TEXT NOT NULL,
+                file_hash TEXT NOT NULL,
+                PRIMARY KEY (dev, inode, size, mtime_ns, hash_algo)
+            )
+        ''')
+
+        # ffprobe results keyed by absolute path; a row is only valid while
+        # the file's size and mtime still match
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS video_metadata_cache (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                metadata BLOB NOT NULL
+            )
+        ''')
+
         # Workflows table - stores workflow definitions and state
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS workflows (
@@ -82,7 +442,7 @@ class MediaManager:
                 name TEXT NOT NULL,
                 description TEXT,
                 status TEXT DEFAULT 'draft',
-                definition JSON NOT NULL,
+                definition BLOB NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 last_executed_at TIMESTAMP
@@ -98,7 +458,7 @@ class MediaManager:
                 started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 completed_at TIMESTAMP,
                 error TEXT,
-                execution_data JSON,
+                execution_data BLOB,
                 FOREIGN KEY (workflow_id) REFERENCES workflows(id) ON DELETE CASCADE
             )
         ''')
@@ -120,31 +480,688 @@ class MediaManager:
             )
         ''')
 
-        conn.commit()
-        conn.close()
-        logger.info(f"Database initialized at {self.db_path}")
+        # Ids of deferred-hash videos that turned out to be duplicates,
+        # mapped to the video they were merged into
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS video_aliases (
+                alias_id TEXT PRIMARY KEY,
+                video_id TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE
+            )
+        ''')
+
+        # Chunk fingerprints shared across videos; refcount is the number of
+        # video_chunks rows pointing at the chunk
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chunks (
+                fp BLOB PRIMARY KEY,
+                size INTEGER NOT NULL,
+                refcount INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS video_chunks (
+                video_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                fp BLOB NOT NULL,
+                PRIMARY KEY (video_id, seq),
+                FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_video_chunks_fp
+            ON video_chunks(fp)
+        ''')
+        # Which chunker built the index (one row)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chunk_index_info (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                chunker TEXT NOT NULL
+            )
+        ''')
+        # Release chunks as video rows go away (including cascaded deletes)
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_video_chunks_delete AFTER DELETE ON video_chunks
+            BEGIN
+                UPDATE chunks SET refcount = refcount - 1 WHERE fp = OLD.fp;
+                DELETE FROM chunks WHERE fp = OLD.fp AND refcount <= 0;
+            END
+        ''')
+
+        # Video service jobs (generate/upload/stitch), one row per job with
+        # its state as an orjson blob, so they survive a restart
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                status TEXT NOT NULL,
+                data BLOB NOT NULL
+            )
+        ''')
+
+        # Counters behind get_workflow_stats, kept current by the triggers
+        # below so the stats never need a table scan
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS video_stats (
+                source_type TEXT PRIMARY KEY,
+                count INTEGER NOT NULL,
+                total_size INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS workflow_status_counts (
+                status TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            )
+        ''')
+        self._create_stats_triggers(cursor)
+
+        # Indexes for the listing and join paths: each supports both the
+        # filter and the ORDER BY, so no temp B-tree sort is needed
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_videos_created
+            ON videos(created_at DESC)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_videos_source_created
+            ON videos(source_type, created_at DESC)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_wv_workflow
+            ON workflow_videos(workflow_id, created_at DESC)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_wv_video
+            ON workflow_videos(video_id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_workflows_status_updated
+            ON workflows(status, updated_at DESC)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_exec_wf
+            ON workflow_executions(workflow_id, started_at DESC)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_videos_quick_fp
+            ON videos(quick_fp) WHERE quick_fp IS NOT NULL
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_jobs_created
+            ON jobs(created_at DESC)
+        ''')
+
+        # Convert rows stored in older formats
+        self._migrate_data(cursor)
+        if self.dedup_prefilter:
+            self._fill_quick_fingerprints(cursor)
+        self._check_chunk_index(cursor)
+
+    @staticmethod
+    def _create_stats_triggers(cursor):
+        """Triggers that keep video_stats and workflow_status_counts in step"""
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_video_stats_insert AFTER INSERT ON videos
+            BEGIN
+                INSERT INTO video_stats (source_type, count, total_size)
+                VALUES (NEW.source_type, 1, NEW.size_bytes)
+                ON CONFLICT(source_type) DO UPDATE SET
+                    count = count + 1,
+                    total_size = total_size + excluded.total_size;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_video_stats_delete AFTER DELETE ON videos
+            BEGIN
+                UPDATE video_stats
+                SET count = count - 1, total_size = total_size - OLD.size_bytes
+                WHERE source_type = OLD.source_type;
+                DELETE FROM video_stats WHERE source_type = OLD.source_type AND count <= 0;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_video_stats_update
+            AFTER UPDATE OF source_type, size_bytes ON videos
+            BEGIN
+                UPDATE video_stats
+                SET count = count - 1, total_size = total_size - OLD.size_bytes
+                WHERE source_type = OLD.source_type;
+                DELETE FROM video_stats WHERE source_type = OLD.source_type AND count <= 0;
+                INSERT INTO video_stats (source_type, count, total_size)
+                VALUES (NEW.source_type, 1, NEW.size_bytes)
+                ON CONFLICT(source_type) DO UPDATE SET
+                    count = count + 1,
+                    total_size = total_size + excluded.total_size;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_workflow_counts_insert AFTER INSERT ON workflows
+            BEGIN
+                INSERT INTO workflow_status_counts (status, count) VALUES (NEW.status, 1)
+                ON CONFLICT(status) DO UPDATE SET count = count + 1;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_workflow_counts_delete AFTER DELETE ON workflows
+            BEGIN
+                UPDATE workflow_status_counts SET count = count - 1 WHERE status = OLD.status;
+                DELETE FROM workflow_status_counts WHERE status = OLD.status AND count <= 0;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_workflow_counts_update AFTER UPDATE OF status ON workflows
+            WHEN OLD.status IS NOT NEW.status
+            BEGIN
+                UPDATE workflow_status_counts SET count = count - 1 WHERE status = OLD.status;
+                DELETE FROM workflow_status_counts WHERE status = OLD.status AND count <= 0;
+                INSERT INTO workflow_status_counts (status, count) VALUES (NEW.status, 1)
+                ON CONFLICT(status) DO UPDATE SET count = count + 1;
+            END
+        ''')
+
+    @staticmethod
+    def _ensure_column(cursor, table: str, column: str, definition: str):
+        """Add a column to an existing table if it is missing"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            logger.info(f"Migrated table {table}: added column {column}")
+
+    def _migrate_schema(self, cursor):
+        """Apply additive migrations to tables created by older versions"""
+        # Rows hashed before hash_algo existed were all SHA256
+        self._ensure_column(cursor, 'videos', 'hash_algo', "TEXT NOT NULL DEFAULT 'sha256'")
+        # 'hashing' while a deferred hash is outstanding, then 'ready' (or 'failed')
+        self._ensure_column(cursor, 'videos', 'hash_status', "TEXT NOT NULL DEFAULT 'ready'")
+        self._ensure_column(cursor, 'videos', 'quick_fp', 'TEXT')
+
+    def _migrate_data(self, cursor):
+        """Rewrite stored values into the current format, once per database"""
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        if version < 1:
+            rows = cursor.execute(
+                "SELECT id, definition FROM workflows WHERE typeof(definition) = 'text'"
+            ).fetchall()
+            cursor.executemany(
+                'UPDATE workflows SET definition = ? WHERE id = ?',
+                [(_pack_definition(_loads(row[1])), row[0]) for row in rows]
+            )
+            if rows:
+                logger.info(f"Migrated {len(rows)} workflow definitions to compressed storage")
+
+        if version < 2:
+            # Seed the counters from the rows that predate the triggers
+            cursor.execute('DELETE FROM video_stats')
+            cursor.execute('''
+                INSERT INTO video_stats (source_type, count, total_size)
+                SELECT source_type, COUNT(*), SUM(size_bytes) FROM videos GROUP BY source_type
+            ''')
+            cursor.execute('DELETE FROM workflow_status_counts')
+            cursor.execute('''
+                INSERT INTO workflow_status_counts (status, count)
+                SELECT status, COUNT(*) FROM workflows GROUP BY status
+            ''')
+
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _fill_quick_fingerprints(self, cursor):
+        """
+        Give hashed rows without one their quick fingerprint: rows from before
+        the prefilter existed, or added while it was off. Only the first
+        QUICK_FP_SIZE bytes of each file are read. Files that are gone (or
+        too small to have one) keep a NULL quick_fp and are simply never
+        prefilter candidates.
+        """
+        rows = cursor.execute(
+            'SELECT id, file_path FROM videos WHERE quick_fp IS NULL AND hash_algo NOT IN (?, ?)',
+            (SYNTHETIC_HASH_ALGO, PENDING_HASH_ALGO)
+        ).fetchall()
+        updates = []
+        for row in rows:
+            try:
+                quick_fp = self.quick_fingerprint(row[1])
+            except OSError:
+                continue
+            if quick_fp:
+                updates.append((quick_fp, row[0]))
+        cursor.executemany('UPDATE videos SET quick_fp = ? WHERE id = ?', updates)
+        if updates:
+            logger.info(f"Computed quick fingerprints for {len(updates)} videos")
+
+    def _check_chunk_index(self, cursor):
+        """
+        Drop a chunk index built by the other chunker: its fingerprints would
+        never match the ones this process computes. An index from before the
+        chunker was recorded is taken to be this one's.
+        """
+        chunker = self.chunker()
+        row = cursor.execute('SELECT chunker FROM chunk_index_info WHERE id = 1').fetchone()
+        if row is None:
+            cursor.execute('INSERT INTO chunk_index_info (id, chunker) VALUES (1, ?)', (chunker,))
+            return
+        if row[0] == chunker:
+            return
+
+        count = cursor.execute('SELECT COUNT(DISTINCT video_id) FROM video_chunks').fetchone()[0]
+        cursor.execute('DELETE FROM video_chunks')
+        cursor.execute('UPDATE chunk_index_info SET chunker = ? WHERE id = 1', (chunker,))
+        if count:
+            logger.warning(
+                f"Chunk index was built with {row[0]} chunking, now {chunker}: dropped the chunks "
+                f"of {count} videos (index_video_chunks rebuilds them)"
+            )
 
     def calculate_file_hash(self, file_path: str) -> str:
-        """Calculate SHA256 hash of file for deduplication"""
-        sha256_hash = hashlib.sha256()
+        """
+        Calculate hash of file for deduplication using self.hash_algo
+
+        Results are memoized by (dev, inode, size, mtime_ns), so a file that
+        has not changed since it was last hashed is not read again.
+        """
+        return self.hash_files([file_path])[0]
+
+    def hash_files(self, file_paths: List[str]) -> List[str]:
+        """
+        Hash several files at once; returns hashes in input order
+
+        Memoized fingerprints are looked up in one pass, each distinct file
+        (by stat identity, so repeated paths and hard links count once) that
+        still needs hashing is read on a thread pool, and the new fingerprints
+        are stored in a single transaction.
+        """
+        keys = []
+        for path in file_paths:
+            st = os.stat(path)
+            keys.append((st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, self.hash_algo))
+
+        known = {}
+        with self._lock:
+            for key in set(keys):
+                row = self._conn.execute(_SQL_GET_FINGERPRINT, key).fetchone()
+                if row:
+                    known[key] = row[0]
+
+        missing = {}
+        for key, path in zip(keys, file_paths):
+            if key not in known and key not in missing:
+                missing[key] = path
+
+        if missing:
+            # Hash outside the lock so other callers are not blocked on file I/O;
+            # hashlib releases the GIL, so files hash concurrently
+            if len(missing) > 1:
+                workers = min(len(missing), os.cpu_count() or 1)
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    digests = list(pool.map(self._hash_file_contents, missing.values()))
+            else:
+                digests = [self._hash_file_contents(path) for path in missing.values()]
+
+            hashed = dict(zip(missing, digests))
+            with self._transaction() as cursor:
+                cursor.executemany(
+                    _SQL_PUT_FINGERPRINT, [key + (file_hash,) for key, file_hash in hashed.items()]
+                )
+            known.update(hashed)
+
+        return [known[key] for key in keys]
+
+    def content_hasher(self):
+        """
+        An incremental hasher for self.hash_algo (update()/hexdigest())
+
+        Lets a caller that is writing a file hash it on the way to disk;
+        pass the digest to remember_file_hash() afterwards.
+        """
+        if self.hash_algo == TREE_HASH_ALGO:
+            return _TreeHasher()
+        if self.hash_algo == BLAKE3_HASH_ALGO:
+            return blake3()
+        return hashlib.sha256()
+
+    def remember_file_hash(self, file_path: str, file_hash: str):
+        """Memoize a hash computed while the file was written, so hash_files() never reads it"""
+        st = os.stat(file_path)
+        with self._transaction() as cursor:
+            cursor.execute(
+                _SQL_PUT_FINGERPRINT,
+                (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, self.hash_algo, file_hash)
+            )
+
+    def _hash_file_contents(self, file_path: str) -> str:
+        """Read the file and hash it with self.hash_algo"""
+        if self.hash_algo == TREE_HASH_ALGO:
+            return self._calculate_tree_hash(file_path)
+        if self.hash_algo == BLAKE3_HASH_ALGO:
+            return self._calculate_blake3(file_path)
+
         with open(file_path, "rb") as f:
-            # Read in chunks to handle large files
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
+            # Map the file and hash it in a single update() call: no read
+            # copies, no Python loop, and the GIL is released for the whole
+            # digest. Empty files cannot be mapped (ValueError), and some
+            # filesystems refuse mmap (OSError); those use the read paths.
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    sha256_hash = hashlib.sha256()
+                    with memoryview(mm) as view:
+                        sha256_hash.update(view)
+                    return sha256_hash.hexdigest()
+            except (ValueError, OSError):
+                pass
+
+            if hasattr(hashlib, 'file_digest'):
+                # Python 3.11+: hashes in C with the GIL released, using
+                # OpenSSL's SHA-NI code path where the CPU supports it
+                return hashlib.file_digest(f, HASH_ALGO).hexdigest()
+
+            sha256_hash = hashlib.sha256()
+            # Read in 1 MiB chunks into one reused buffer
+            buf = bytearray(READ_CHUNK_SIZE)
+            view = memoryview(buf)
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                sha256_hash.update(view[:n])
         return sha256_hash.hexdigest()
 
-    def find_duplicate_video(self, file_hash: str) -> Optional[Dict[str, Any]]:
-        """Check if video with same hash already exists"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+    def _calculate_tree_hash(self, file_path: str) -> str:
+        """Hash 8 MiB chunks on a thread pool, then hash the ordered chunk digests"""
+        workers = os.cpu_count() or 1
+        digests = []
+        pending = deque()
+
+        with open(file_path, "rb") as f, ThreadPoolExecutor(max_workers=workers) as pool:
+            for chunk in iter(lambda: f.read(TREE_HASH_CHUNK_SIZE), b""):
+                # hashlib releases the GIL while hashing large buffers
+                pending.append(pool.submit(lambda data: hashlib.sha256(data).digest(), chunk))
+                # Bound the chunks held in memory while workers catch up
+                if len(pending) >= workers * 2:
+                    digests.append(pending.popleft().result())
+            digests.extend(future.result() for future in pending)
+
+        return hashlib.sha256(b"".join(digests)).hexdigest()
+
+    @staticmethod
+    def quick_fingerprint(file_path: str) -> Optional[str]:
+        """
+        Cheap prefilter key: file size plus a hash of the first QUICK_FP_SIZE bytes
 
-        cursor.execute('''
-            SELECT * FROM videos WHERE file_hash = ?
-        ''', (file_hash,))
+        Returns None for files smaller than QUICK_FP_SIZE, which are cheap
+        enough to always hash in full.
+        """
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < QUICK_FP_SIZE:
+                return None
+            head = f.read(QUICK_FP_SIZE)
+        return f"{size}:{hashlib.blake2b(head, digest_size=16).hexdigest()}"
+
+    def _known_quick_fingerprints(self, quick_fps: List[Optional[str]]) -> Set[str]:
+        """The given quick fingerprints that some stored video already has"""
+        wanted = list({fp for fp in quick_fps if fp})
+        known = set()
+        with self._lock:
+            for i in range(0, len(wanted), 500):
+                chunk = wanted[i:i + 500]
+                placeholders = ', '.join('?' * len(chunk))
+                known.update(row[0] for row in self._conn.execute(
+                    f'SELECT DISTINCT quick_fp FROM videos WHERE quick_fp IN ({placeholders})', chunk
+                ))
+        return known
+
+    @staticmethod
+    def _rows_by_quick_fp(cursor, sql: str, quick_fps, params: tuple = ()) -> List[tuple]:
+        """Run sql (ending in 'quick_fp IN') for quick_fps, 500 at a time"""
+        wanted = list(quick_fps)
+        rows = []
+        for i in range(0, len(wanted), 500):
+            chunk = wanted[i:i + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            rows.extend(cursor.execute(f'{sql} ({placeholders})', (*params, *chunk)).fetchall())
+        return rows
+
+    def _hash_placeholders(self, quick_fps: Set[str], tried: Set[str]):
+        """
+        Give stored placeholder ('unhashed') videos sharing any of quick_fps
+        their real hash, so files with the same quick fingerprint can be
+        compared against them by full hash. Rows in tried are skipped, and
+        the ids attempted are added to it. The files are read without
+        holding the database lock.
+        """
+        with self._lock:
+            rows = self._rows_by_quick_fp(
+                self._conn, 'SELECT id, file_path FROM videos WHERE hash_algo = ? AND quick_fp IN',
+                quick_fps, (UNHASHED_ALGO,)
+            )
+        rows = [row for row in rows if row[0] not in tried]
+        tried.update(row[0] for row in rows)
+
+        updates = []
+        for video_id, file_path in rows:
+            try:
+                updates.append((self._hash_file_contents(file_path), self.hash_algo, video_id, UNHASHED_ALGO))
+            except OSError as e:
+                logger.warning(f"Cannot hash video {video_id} for deduplication: {e}")
+        if updates:
+            with self._transaction() as cursor:
+                # OR IGNORE: two placeholder rows can only collide if their files were
+                # added concurrently; the second one simply keeps its placeholder.
+                # Rows settled by another writer meanwhile are left alone.
+                cursor.executemany(
+                    'UPDATE OR IGNORE videos SET file_hash = ?, hash_algo = ? WHERE id = ? AND hash_algo = ?',
+                    updates
+                )
+
+    def _dedup_work_left(self, cursor, fingerprints: List[tuple], tried: Set[str]):
+        """
+        What must still be hashed before fingerprints can be checked against
+        the stored videos: the indexes of placeholder entries whose quick
+        fingerprint some stored video now has, and the quick fingerprints
+        shared by hashed entries and untried stored placeholders
+        """
+        unhashed = {quick_fp for _, algo, quick_fp in fingerprints if quick_fp and algo == UNHASHED_ALGO}
+        hashed = {quick_fp for _, algo, quick_fp in fingerprints if quick_fp and algo != UNHASHED_ALGO}
+
+        # Another writer stored a matching file since the prefilter ran
+        stored = {row[0] for row in self._rows_by_quick_fp(
+            cursor, 'SELECT DISTINCT quick_fp FROM videos WHERE quick_fp IN', unhashed
+        )}
+        rehash = [
+            i for i, (_, algo, quick_fp) in enumerate(fingerprints)
+            if algo == UNHASHED_ALGO and quick_fp in stored
+        ]
+        settle = {
+            row[1] for row in self._rows_by_quick_fp(
+                cursor, 'SELECT id, quick_fp FROM videos WHERE hash_algo = ? AND quick_fp IN',
+                hashed, (UNHASHED_ALGO,)
+            )
+            if row[0] not in tried
+        }
+        # A rehashed entry needs the placeholders it matches hashed as well
+        settle.update(fingerprints[i][2] for i in rehash)
+        return rehash, settle
+
+    @contextmanager
+    def _dedup_transaction(self, fingerprints: List[tuple], file_paths: List[str]):
+        """
+        An immediate transaction in which fingerprints - (file_hash,
+        hash_algo, quick_fp) per file in file_paths, updated in place - can
+        be compared against the stored videos by full hash
+
+        Whole files are hashed before the transaction, so other database
+        users are not held up for the reads. If another writer changed what
+        needs hashing in between, that is hashed and the check runs again.
+        """
+        tried = set()
+        rehash = []
+        settle = {quick_fp for _, algo, quick_fp in fingerprints if quick_fp and algo != UNHASHED_ALGO}
+        while True:
+            for i in rehash:
+                fingerprints[i] = (self._hash_file_contents(file_paths[i]), self.hash_algo, fingerprints[i][2])
+            if settle:
+                self._hash_placeholders(settle, tried)
+
+            with self._transaction(immediate=True) as cursor:
+                rehash, settle = self._dedup_work_left(cursor, fingerprints, tried)
+                if not rehash and not settle:
+                    yield cursor
+                    return
+
+    @staticmethod
+    def _calculate_blake3(file_path: str) -> str:
+        """BLAKE3 over the mapped file, hashed on all cores"""
+        hasher = blake3(max_threads=blake3.AUTO)
+        with open(file_path, "rb") as f:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    hasher.update(mm)
+                    return hasher.hexdigest()
+            except (ValueError, OSError):
+                pass
+
+            for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    @staticmethod
+    def chunker() -> str:
+        """The chunker fingerprint_chunks uses: FASTCDC_CHUNKER or FIXED_CHUNKER"""
+        return FASTCDC_CHUNKER if fastcdc is not None else FIXED_CHUNKER
+
+    @staticmethod
+    def fingerprint_chunks(file_path: str) -> List[tuple]:
+        """
+        Cut a file into chunks (see chunker()) and fingerprint each one
+
+        Returns:
+            (BLAKE2b-256 digest, size) per chunk, in file order
+        """
+        if fastcdc is not None:
+            return [
+                (hashlib.blake2b(chunk.data, digest_size=32).digest(), chunk.length)
+                for chunk in fastcdc(
+                    file_path, min_size=CHUNK_MIN_SIZE, avg_size=CHUNK_AVG_SIZE,
+                    max_size=CHUNK_MAX_SIZE, fat=True
+                )
+            ]
+
+        fingerprints = []
+        buf = bytearray(CHUNK_AVG_SIZE)
+        view = memoryview(buf)
+        with open(file_path, 'rb') as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                fingerprints.append((hashlib.blake2b(view[:n], digest_size=32).digest(), n))
+        return fingerprints
+
+    def index_video_chunks(self, video_id: str, file_path: str):
+        """Record a video's chunk fingerprints, replacing any it already has"""
+        fingerprints = self.fingerprint_chunks(file_path)
+
+        try:
+            with self._transaction() as cursor:
+                cursor.execute('DELETE FROM video_chunks WHERE video_id = ?', (video_id,))
+                cursor.executemany(
+                    'INSERT INTO video_chunks (video_id, seq, fp) VALUES (?, ?, ?)',
+                    [(video_id, seq, fp) for seq, (fp, _) in enumerate(fingerprints)]
+                )
+                cursor.executemany(_SQL_PUT_CHUNK, fingerprints)
+        except sqlite3.IntegrityError:
+            # The video was deleted while its file was being read
+            logger.warning(f"Video {video_id} no longer exists, chunks not indexed")
+
+    def find_similar_videos(self, video_id: str, min_similarity: float = 0.5) -> List[Dict[str, Any]]:
+        """
+        Find videos sharing indexed chunks with video_id
+
+        Returns:
+            Dicts with video_id, shared_bytes and similarity (the fraction of
+            this video's distinct chunk bytes also present in the other one),
+            most similar first
+        """
+        with self._lock:
+            total = self._conn.execute('''
+                SELECT SUM(c.size) FROM (SELECT DISTINCT fp FROM video_chunks WHERE video_id = ?) mine
+                JOIN chunks c ON c.fp = mine.fp
+            ''', (video_id,)).fetchone()[0]
+            if not total:
+                return []
+
+            rows = self._conn.execute('''
+                SELECT shared.video_id, SUM(c.size) AS shared_bytes
+                FROM (
+                    SELECT DISTINCT other.video_id, other.fp
+                    FROM video_chunks mine
+                    JOIN video_chunks other ON other.fp = mine.fp AND other.video_id != mine.video_id
+                    WHERE mine.video_id = ?
+                ) shared
+                JOIN chunks c ON c.fp = shared.fp
+                GROUP BY shared.video_id
+                HAVING SUM(c.size) >= ?
+                ORDER BY shared_bytes DESC
+            ''', (video_id, total * min_similarity)).fetchall()
+
+        return [
+            {'video_id': row[0], 'shared_bytes': row[1], 'similarity': row[1] / total}
+            for row in rows
+        ]
+
+    @staticmethod
+    def synthetic_content_id(*parts: Optional[str]) -> str:
+        """Derive a content id from identifying fields instead of file bytes"""
+        return hashlib.sha256('|'.join(p or '' for p in parts).encode('utf-8')).hexdigest()
+
+    def get_cached_video_metadata(self, files: List[tuple]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up cached ffprobe metadata for several files in one query
 
-        row = cursor.fetchone()
-        conn.close()
+        Args:
+            files: (absolute path, size, mtime_ns) tuples
+
+        Returns:
+            Metadata by path, for entries whose size and mtime still match
+        """
+        if not files:
+            return {}
+
+        current = {path: (size, mtime_ns) for path, size, mtime_ns in files}
+        paths = list(current)
+        rows = []
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(paths), 500):
+                chunk = paths[i:i + 500]
+                placeholders = ', '.join('?' * len(chunk))
+                rows += self._conn.execute(
+                    f'SELECT path, size, mtime_ns, metadata FROM video_metadata_cache WHERE path IN ({placeholders})',
+                    chunk
+                ).fetchall()
+
+        return {
+            row[0]: _loads(row[3]) for row in rows
+            if current[row[0]] == (row[1], row[2])
+        }
+
+    def cache_video_metadata(self, path: str, size: int, mtime_ns: int, metadata: Dict[str, Any]):
+        """Store ffprobe metadata for a file at its current size and mtime"""
+        with self._transaction() as cursor:
+            cursor.execute('''
+                INSERT OR REPLACE INTO video_metadata_cache (path, size, mtime_ns, metadata)
+                VALUES (?, ?, ?, ?)
+            ''', (path, size, mtime_ns, _dumps_blob(metadata)))
+
+    def find_duplicate_video(self, file_hash: str, hash_algo: str = HASH_ALGO) -> Optional[Dict[str, Any]]:
+        """Check if video with same hash already exists"""
+        with self._lock:
+            row = self._conn.execute('''
+                SELECT * FROM videos WHERE file_hash = ? AND hash_algo = ?
+            ''', (file_hash, hash_algo)).fetchone()
 
         if row:
             return dict(row)
@@ -162,7 +1179,9 @@ class MediaManager:
         aspect_ratio: Optional[str] = None,
         codec: Optional[str] = None,
         fps: Optional[float] = None,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        trusted_unique: bool = False,
+        defer_hash: bool = False
     ) -> Dict[str, Any]:
         """
         Add a video to the database
@@ -179,56 +1198,237 @@ class MediaManager:
             codec: Video codec
             fps: Frames per second
             metadata: Additional metadata
+            trusted_unique: Caller guarantees the file is new (e.g. a fresh
+                generation), so skip reading it and use a synthetic content id
+            defer_hash: Insert right away and hash in the background. The
+                result has hash_status 'hashing'; if the file turns out to be
+                a duplicate, video_id is later merged into the original and
+                get_video(video_id) returns the original.
 
         Returns:
             Video record with deduplication info
         """
-        # Calculate file hash for deduplication
-        file_hash = self.calculate_file_hash(file_path)
+        return self.add_videos_bulk([{
+            'video_id': video_id,
+            'name': name,
+            'file_path': file_path,
+            'size_bytes': size_bytes,
+            'source_type': source_type,
+            'duration_seconds': duration_seconds,
+            'resolution': resolution,
+            'aspect_ratio': aspect_ratio,
+            'codec': codec,
+            'fps': fps,
+            'metadata': metadata,
+            'trusted_unique': trusted_unique,
+            'defer_hash': defer_hash
+        }])[0]
+
+    def add_videos_bulk(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Add several videos in one transaction
 
-        # Check for duplicates
-        duplicate = self.find_duplicate_video(file_hash)
-        if duplicate:
-            logger.info(f"Duplicate video detected: {video_id} -> {duplicate['id']}")
-            return {
-                'video_id': duplicate['id'],
-                'is_duplicate': True,
-                'original_id': duplicate['id'],
-                'file_path': duplicate['file_path']
-            }
+        Args:
+            records: One dict per video, keyed like the add_video arguments.
+                An optional 'generation' dict, keyed like the
+                add_generation_details arguments (without video_id), is
+                stored in the same transaction when the video is inserted.
 
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
+        Returns:
+            One result per record, in order, shaped like add_video's result.
+            A record whose content matches an existing video - or an earlier
+            record in the same batch - is reported as a duplicate.
+        """
+        to_hash = [
+            r['file_path'] for r in records
+            if not r.get('trusted_unique') and not r.get('defer_hash')
+        ]
+
+        # With the prefilter, only files whose quick fingerprint is already
+        # stored (or repeated within this batch) need a full hash. Without
+        # it, quick fingerprints are neither read nor stored.
+        if self.dedup_prefilter:
+            quick_fps = [self.quick_fingerprint(path) for path in to_hash]
+            known = self._known_quick_fingerprints(quick_fps)
+            counts = Counter(quick_fps)
+            needs_hash = [fp is None or fp in known or counts[fp] > 1 for fp in quick_fps]
+        else:
+            quick_fps = [None] * len(to_hash)
+            needs_hash = [True] * len(to_hash)
+
+        # Hash every file that needs it up front, as one batch
+        hashes = iter(self.hash_files([p for p, n in zip(to_hash, needs_hash) if n]))
+        hashed = iter(zip(quick_fps, needs_hash))
+
+        fingerprints = []
+        for r in records:
+            if r.get('trusted_unique'):
+                fingerprints.append((
+                    self.synthetic_content_id(r['source_type'], r['video_id'], r['file_path']),
+                    SYNTHETIC_HASH_ALGO, None
+                ))
+            elif r.get('defer_hash'):
+                fingerprints.append((f"pending:{r['video_id']}", PENDING_HASH_ALGO, None))
+            else:
+                quick_fp, full = next(hashed)
+                if full:
+                    fingerprints.append((next(hashes), self.hash_algo, quick_fp))
+                else:
+                    fingerprints.append((f"unhashed:{r['video_id']}", UNHASHED_ALGO, quick_fp))
+
+        results = []
+        added = []
+
+        with self._dedup_transaction(fingerprints, [r['file_path'] for r in records]) as cursor:
+            for r, (file_hash, hash_algo, quick_fp) in zip(records, fingerprints):
+                metadata = r.get('metadata')
+                row = (
+                    r['video_id'], r['name'], r['file_path'], file_hash, hash_algo, r['size_bytes'],
+                    r.get('duration_seconds'), r.get('resolution'), r.get('aspect_ratio'),
+                    r.get('codec'), r.get('fps'),
+                    r['source_type'], _dumps(metadata) if metadata else None,
+                    'hashing' if hash_algo == PENDING_HASH_ALGO else 'ready',
+                    quick_fp
+                )
 
-        try:
-            cursor.execute('''
-                INSERT INTO videos (
-                    id, name, file_path, file_hash, size_bytes,
-                    duration_seconds, resolution, aspect_ratio, codec, fps,
-                    source_type, metadata
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                video_id, name, file_path, file_hash, size_bytes,
-                duration_seconds, resolution, aspect_ratio, codec, fps,
-                source_type, json.dumps(metadata) if metadata else None
-            ))
+                try:
+                    if self._hash_unique:
+                        # One statement: the unique index settles duplicates,
+                        # including ones added earlier in this batch
+                        inserted = cursor.execute(_SQL_INSERT_VIDEO_DEDUP, row).fetchone()
+                        duplicate = None if inserted else cursor.execute(
+                            _SQL_FIND_DUP, (file_hash, hash_algo)
+                        ).fetchone()
+                    else:
+                        duplicate = cursor.execute(_SQL_FIND_DUP, (file_hash, hash_algo)).fetchone()
+                        if not duplicate:
+                            cursor.execute(_SQL_INSERT_VIDEO, row)
+                except sqlite3.IntegrityError as e:
+                    logger.error(f"Failed to add video {r['video_id']}: {e}")
+                    raise
+
+                if duplicate:
+                    logger.info(f"Duplicate video detected: {r['video_id']} -> {duplicate[0]}")
+                    results.append({
+                        'video_id': duplicate[0],
+                        'is_duplicate': True,
+                        'original_id': duplicate[0],
+                        'file_path': duplicate[1]
+                    })
+                    continue
+
+                added.append(r)
+                if r.get('generation'):
+                    cursor.execute(_SQL_PUT_GENERATION, _generation_row(r['video_id'], **r['generation']))
+
+                if hash_algo == PENDING_HASH_ALGO:
+                    results.append({
+                        'video_id': r['video_id'],
+                        'is_duplicate': False,
+                        'file_path': r['file_path'],
+                        'hash_status': 'hashing'
+                    })
+                    continue
+
+                results.append({
+                    'video_id': r['video_id'],
+                    'is_duplicate': False,
+                    'file_path': r['file_path'],
+                    'file_hash': file_hash,
+                    'hash_algo': hash_algo,
+                    'hash_status': 'ready'
+                })
+
+        for r in added:
+            logger.info(f"Added video: {r['video_id']} ({r['name']})")
+            if r.get('defer_hash'):
+                self._submit_deferred_hash(r['video_id'], r['file_path'])
+            elif self.index_chunks and not r.get('trusted_unique'):
+                self.index_video_chunks(r['video_id'], r['file_path'])
+
+        return results
+
+    def _submit_deferred_hash(self, video_id: str, file_path: str):
+        """Queue a deferred-hash video for the background hashing worker"""
+        with self._lock:
+            if self._hash_executor is None:
+                # One worker: files are read back to back rather than
+                # competing for the disk
+                self._hash_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix='media-manager-hash'
+                )
+            self._hash_executor.submit(self._resolve_deferred_hash, video_id, file_path)
+
+    def _resume_deferred_hashes(self):
+        """Requeue videos still marked 'hashing' when the last process exited"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, file_path FROM videos WHERE hash_status = 'hashing'"
+            ).fetchall()
+        for row in rows:
+            self._submit_deferred_hash(row[0], row[1])
 
-            conn.commit()
-            logger.info(f"Added video: {video_id} ({name})")
+    def _resolve_deferred_hash(self, video_id: str, file_path: str):
+        """
+        Hash a deferred video and settle its deduplication
 
-            return {
-                'video_id': video_id,
-                'is_duplicate': False,
-                'file_path': file_path,
-                'file_hash': file_hash
-            }
+        A unique file gets its real hash and becomes 'ready'. A duplicate is
+        merged into the original: workflow links and generation details move
+        to the original, its id is recorded in video_aliases so get_video
+        still resolves it, and its own row is deleted. Files are never removed.
+        """
+        try:
+            file_hash = self.calculate_file_hash(file_path)
+            quick_fp = self.quick_fingerprint(file_path) if self.dedup_prefilter else None
+        except OSError as e:
+            logger.error(f"Failed to hash video {video_id}: {e}")
+            with self._transaction() as cursor:
+                cursor.execute(
+                    "UPDATE videos SET hash_status = 'failed' WHERE id = ? AND hash_status = 'hashing'",
+                    (video_id,)
+                )
+            return
+
+        with self._dedup_transaction([(file_hash, self.hash_algo, quick_fp)], [file_path]) as cursor:
+            pending = cursor.execute(
+                "SELECT 1 FROM videos WHERE id = ? AND hash_status = 'hashing'", (video_id,)
+            ).fetchone()
+            if not pending:
+                # Deleted (or already resolved) while it was being hashed
+                return
+
+            original = cursor.execute(_SQL_FIND_DUP, (file_hash, self.hash_algo)).fetchone()
+            if original is None:
+                cursor.execute(
+                    "UPDATE videos SET file_hash = ?, hash_algo = ?, hash_status = 'ready', quick_fp = ? WHERE id = ?",
+                    (file_hash, self.hash_algo, quick_fp, video_id)
+                )
+            else:
+                original_id = original[0]
+                cursor.execute(
+                    'UPDATE OR IGNORE workflow_videos SET video_id = ? WHERE video_id = ?',
+                    (original_id, video_id)
+                )
+                cursor.execute(
+                    'UPDATE OR IGNORE video_generation SET video_id = ? WHERE video_id = ?',
+                    (original_id, video_id)
+                )
+                cursor.execute(
+                    'UPDATE video_aliases SET video_id = ? WHERE video_id = ?', (original_id, video_id)
+                )
+                cursor.execute(
+                    'INSERT OR REPLACE INTO video_aliases (alias_id, video_id) VALUES (?, ?)',
+                    (video_id, original_id)
+                )
+                # Cascades whatever could not be moved (links the original already has)
+                cursor.execute('DELETE FROM videos WHERE id = ?', (video_id,))
 
-        except sqlite3.IntegrityError as e:
-            conn.rollback()
-            logger.error(f"Failed to add video {video_id}: {e}")
-            raise
-        finally:
-            conn.close()
+        if original is None:
+            if self.index_chunks:
+                self.index_video_chunks(video_id, file_path)
+            return
+
+        logger.info(f"Duplicate video detected after hashing: {video_id} -> {original_id}")
 
     def add_generation_details(
         self,
@@ -244,128 +1444,217 @@ class MediaManager:
         completed_at: Optional[str] = None
     ):
         """Add generation details for a video"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT OR REPLACE INTO video_generation (
-                video_id, provider, model, prompt, generation_params,
+        with self._transaction() as cursor:
+            cursor.execute(_SQL_PUT_GENERATION, _generation_row(
+                video_id, provider, prompt, model, generation_params,
                 job_id, status, error, started_at, completed_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            video_id, provider, model, prompt,
-            json.dumps(generation_params) if generation_params else None,
-            job_id, status, error, started_at, completed_at
-        ))
+            ))
 
-        conn.commit()
-        conn.close()
         logger.info(f"Added generation details for video: {video_id}")
 
+    def add_generated_video(self, generation: Dict[str, Any], **video) -> Dict[str, Any]:
+        """
+        Add a generated video and its generation details in one transaction
+
+        Args:
+            generation: add_generation_details arguments, without video_id
+            **video: add_video arguments
+
+        Returns:
+            Same as add_video. The generation details are only stored when the
+            video row is inserted, not for a duplicate.
+        """
+        return self.add_videos_bulk([{**video, 'generation': generation}])[0]
+
     def get_video(self, video_id: str) -> Optional[Dict[str, Any]]:
         """Get video by ID with all associated data"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        with self._lock:
+            # Get video data
+            video_row = self._conn.execute(_SQL_GET_VIDEO, (video_id,)).fetchone()
+
+            if not video_row:
+                # A deferred-hash duplicate resolves to the video it was merged into
+                alias = self._conn.execute(
+                    'SELECT video_id FROM video_aliases WHERE alias_id = ?', (video_id,)
+                ).fetchone()
+                if alias:
+                    video_id = alias[0]
+                    video_row = self._conn.execute(_SQL_GET_VIDEO, (video_id,)).fetchone()
 
-        # Get video data
-        cursor.execute('SELECT * FROM videos WHERE id = ?', (video_id,))
-        video_row = cursor.fetchone()
+            if not video_row:
+                return None
 
-        if not video_row:
-            conn.close()
-            return None
+            # Get generation details if exists
+            gen_row = self._conn.execute(_SQL_GET_GENERATION, (video_id,)).fetchone()
 
         video = dict(video_row)
 
         # Parse JSON fields
         if video['metadata']:
-            video['metadata'] = json.loads(video['metadata'])
+            video['metadata'] = _loads(video['metadata'])
 
-        # Get generation details if exists
-        cursor.execute('SELECT * FROM video_generation WHERE video_id = ?', (video_id,))
-        gen_row = cursor.fetchone()
         if gen_row:
             video['generation'] = dict(gen_row)
             if video['generation']['generation_params']:
-                video['generation']['generation_params'] = json.loads(
+                video['generation']['generation_params'] = _loads(
                     video['generation']['generation_params']
                 )
 
-        conn.close()
         return video
 
+    def get_videos_bulk(self, video_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up many videos at once, keyed by the id asked for (aliases
+        included); ids that are not stored are left out. Rows carry only
+        id and file_path.
+        """
+        wanted = list(dict.fromkeys(video_ids))
+        found = {}
+        with self._lock:
+            for i in range(0, len(wanted), 500):
+                chunk = wanted[i:i + 500]
+                placeholders = ', '.join('?' * len(chunk))
+                for row in self._conn.execute(
+                    f'SELECT id, file_path FROM videos WHERE id IN ({placeholders})', chunk
+                ):
+                    found[row[0]] = {'id': row[0], 'file_path': row[1]}
+                for row in self._conn.execute(f'''
+                    SELECT a.alias_id, v.id, v.file_path FROM video_aliases a
+                    JOIN videos v ON v.id = a.video_id
+                    WHERE a.alias_id IN ({placeholders})
+                ''', chunk):
+                    found.setdefault(row[0], {'id': row[1], 'file_path': row[2]})
+        return found
+
     def list_videos(
         self,
         source_type: Optional[str] = None,
         workflow_id: Optional[str] = None,
         limit: int = 100,
-        offset: int = 0
+        offset: int = 0,
+        fields: Optional[Set[str]] = None,
+        metadata_keys: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
-        """List videos with optional filtering"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        """
+        List videos with optional filtering
+
+        Args:
+            fields: Video columns to return (all columns if None). The metadata
+                blob is only parsed when 'metadata' is among them.
+            metadata_keys: Top-level metadata keys to pull out in SQL with
+                json_extract; returned as a partial 'metadata' dict
+        """
+        if fields is None:
+            columns = list(VIDEO_COLUMNS)
+        else:
+            unknown = set(fields) - set(VIDEO_COLUMNS)
+            if unknown:
+                raise ValueError(f"Unknown video fields: {sorted(unknown)}")
+            columns = [c for c in VIDEO_COLUMNS if c in fields]
+
+        if metadata_keys and 'metadata' in columns:
+            raise ValueError("Request either the metadata field or metadata_keys, not both")
+
+        select = [f'v.{c}' for c in columns]
+        select_params = []
+        for i, key in enumerate(metadata_keys or []):
+            select.append(f'json_extract(v.metadata, ?) AS _meta_{i}')
+            select_params.append(f'$."{key}"')
 
         if workflow_id:
             # Get videos associated with a workflow
-            cursor.execute('''
-                SELECT v.*, wv.node_id, wv.node_type, wv.role
+            select += ['wv.node_id', 'wv.node_type', 'wv.role']
+            query = f'''
+                SELECT {', '.join(select)}
                 FROM videos v
                 JOIN workflow_videos wv ON v.id = wv.video_id
                 WHERE wv.workflow_id = ?
                 ORDER BY v.created_at DESC
                 LIMIT ? OFFSET ?
-            ''', (workflow_id, limit, offset))
+            '''
+            params = (workflow_id, limit, offset)
         elif source_type:
-            cursor.execute('''
-                SELECT * FROM videos
+            query = f'''
+                SELECT {', '.join(select)} FROM videos v
                 WHERE source_type = ?
                 ORDER BY created_at DESC
                 LIMIT ? OFFSET ?
-            ''', (source_type, limit, offset))
+            '''
+            params = (source_type, limit, offset)
         else:
-            cursor.execute('''
-                SELECT * FROM videos
+            query = f'''
+                SELECT {', '.join(select)} FROM videos v
                 ORDER BY created_at DESC
                 LIMIT ? OFFSET ?
-            ''', (limit, offset))
+            '''
+            params = (limit, offset)
+
+        with self._lock:
+            rows = self._conn.execute(query, (*select_params, *params)).fetchall()
 
-        rows = cursor.fetchall()
         videos = [dict(row) for row in rows]
 
         # Parse JSON fields
         for video in videos:
-            if video.get('metadata'):
-                video['metadata'] = json.loads(video['metadata'])
+            if metadata_keys:
+                video['metadata'] = {
+                    key: video.pop(f'_meta_{i}') for i, key in enumerate(metadata_keys)
+                }
+            elif video.get('metadata'):
+                video['metadata'] = _loads(video['metadata'])
 
-        conn.close()
         return videos
 
     def delete_video(self, video_id: str, delete_file: bool = True):
         """Delete video from database and optionally from disk"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-
-        # Get file path before deleting
-        cursor.execute('SELECT file_path FROM videos WHERE id = ?', (video_id,))
-        row = cursor.fetchone()
+        with self._transaction() as cursor:
+            # Delete from database (cascades to related tables)
+            row = cursor.execute(
+                'DELETE FROM videos WHERE id = ? RETURNING file_path', (video_id,)
+            ).fetchone()
 
-        if row:
-            file_path = row[0]
+        if not row:
+            return
 
-            # Delete from database (cascades to related tables)
-            cursor.execute('DELETE FROM videos WHERE id = ?', (video_id,))
-            conn.commit()
+        file_path = row[0]
 
-            # Delete file if requested
-            if delete_file and Path(file_path).exists():
-                Path(file_path).unlink()
+        # Delete file if requested
+        if delete_file:
+            try:
+                os.unlink(file_path)
                 logger.info(f"Deleted video file: {file_path}")
+            except FileNotFoundError:
+                pass
+
+        logger.info(f"Deleted video: {video_id}")
 
-            logger.info(f"Deleted video: {video_id}")
+    # ========== Job Persistence ==========
 
-        conn.close()
+    def save_job(self, job_id: str, created_at: str, status: str, data: Dict[str, Any]):
+        """Insert or overwrite the stored state of a video service job"""
+        with self._transaction() as cursor:
+            cursor.execute(_SQL_PUT_JOB, (job_id, created_at, status, _dumps_blob(data)))
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the stored state of a job"""
+        with self._lock:
+            row = self._conn.execute('SELECT data FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return _loads(row[0]) if row else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """List stored jobs, newest first"""
+        with self._lock:
+            rows = self._conn.execute('SELECT data FROM jobs ORDER BY created_at DESC').fetchall()
+        return [_loads(row[0]) for row in rows]
+
+    def delete_job(self, job_id: str):
+        """Forget a stored job (its video file is left alone)"""
+        self.delete_jobs([job_id])
+
+    def delete_jobs(self, job_ids: List[str]):
+        """Forget many stored jobs in one transaction"""
+        with self._transaction() as cursor:
+            cursor.executemany('DELETE FROM jobs WHERE id = ?', [(job_id,) for job_id in job_ids])
 
     # ========== Workflow Management ==========
 
@@ -378,16 +1667,12 @@ class MediaManager:
         status: str = 'draft'
     ) -> Dict[str, Any]:
         """Create a new workflow"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO workflows (id, name, description, status, definition)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (workflow_id, name, description, status, json.dumps(definition)))
+        with self._transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO workflows (id, name, description, status, definition)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (workflow_id, name, description, status, _pack_definition(definition)))
 
-        conn.commit()
-        conn.close()
         logger.info(f"Created workflow: {workflow_id} ({name})")
 
         return {
@@ -405,104 +1690,92 @@ class MediaManager:
         status: Optional[str] = None
     ):
         """Update workflow"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
+        # Falsy name/definition/status leave the column unchanged, as before
+        params = (
+            name or None,
+            description,
+            _pack_definition(definition) if definition else None,
+            status or None,
+            workflow_id
+        )
+
+        with self._transaction() as cursor:
+            cursor.execute(_SQL_UPDATE_WORKFLOW, params)
 
-        updates = []
-        params = []
-
-        if name:
-            updates.append('name = ?')
-            params.append(name)
-        if description is not None:
-            updates.append('description = ?')
-            params.append(description)
-        if definition:
-            updates.append('definition = ?')
-            params.append(json.dumps(definition))
-        if status:
-            updates.append('status = ?')
-            params.append(status)
-
-        updates.append('updated_at = CURRENT_TIMESTAMP')
-
-        params.append(workflow_id)
-
-        cursor.execute(f'''
-            UPDATE workflows
-            SET {', '.join(updates)}
-            WHERE id = ?
-        ''', params)
-
-        conn.commit()
-        conn.close()
         logger.info(f"Updated workflow: {workflow_id}")
 
     def get_workflow(self, workflow_id: str) -> Optional[Dict[str, Any]]:
         """Get workflow with all associated videos"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT * FROM workflows WHERE id = ?', (workflow_id,)
+            ).fetchone()
 
-        cursor.execute('SELECT * FROM workflows WHERE id = ?', (workflow_id,))
-        row = cursor.fetchone()
+            if not row:
+                return None
 
-        if not row:
-            conn.close()
-            return None
+            # Get associated videos
+            video_rows = self._conn.execute('''
+                SELECT v.*, wv.node_id, wv.node_type, wv.role, wv.execution_id
+                FROM videos v
+                JOIN workflow_videos wv ON v.id = wv.video_id
+                WHERE wv.workflow_id = ?
+                ORDER BY wv.created_at DESC
+            ''', (workflow_id,)).fetchall()
 
         workflow = dict(row)
-        workflow['definition'] = json.loads(workflow['definition'])
+        workflow['definition'] = _unpack_definition(workflow['definition'])
 
-        # Get associated videos
-        cursor.execute('''
-            SELECT v.*, wv.node_id, wv.node_type, wv.role, wv.execution_id
-            FROM videos v
-            JOIN workflow_videos wv ON v.id = wv.video_id
-            WHERE wv.workflow_id = ?
-            ORDER BY wv.created_at DESC
-        ''', (workflow_id,))
-
-        video_rows = cursor.fetchall()
         workflow['videos'] = []
         for video_row in video_rows:
             video = dict(video_row)
             if video.get('metadata'):
-                video['metadata'] = json.loads(video['metadata'])
+                video['metadata'] = _loads(video['metadata'])
             workflow['videos'].append(video)
 
-        conn.close()
         return workflow
 
     def list_workflows(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
         """List workflows"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        if status:
-            cursor.execute('''
-                SELECT * FROM workflows
-                WHERE status = ?
-                ORDER BY updated_at DESC
-            ''', (status,))
-        else:
-            cursor.execute('''
-                SELECT * FROM workflows
-                ORDER BY updated_at DESC
-            ''')
+        with self._lock:
+            if status:
+                rows = self._conn.execute('''
+                    SELECT * FROM workflows
+                    WHERE status = ?
+                    ORDER BY updated_at DESC
+                ''', (status,)).fetchall()
+            else:
+                rows = self._conn.execute('''
+                    SELECT * FROM workflows
+                    ORDER BY updated_at DESC
+                ''').fetchall()
 
-        rows = cursor.fetchall()
         workflows = []
 
         for row in rows:
             workflow = dict(row)
-            workflow['definition'] = json.loads(workflow['definition'])
+            workflow['definition'] = _unpack_definition(workflow['definition'])
             workflows.append(workflow)
 
-        conn.close()
         return workflows
 
+    def list_workflows_summary(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """List workflows without their definitions (id, name, status, updated_at)"""
+        with self._lock:
+            if status:
+                rows = self._conn.execute('''
+                    SELECT id, name, status, updated_at FROM workflows
+                    WHERE status = ?
+                    ORDER BY updated_at DESC
+                ''', (status,)).fetchall()
+            else:
+                rows = self._conn.execute('''
+                    SELECT id, name, status, updated_at FROM workflows
+                    ORDER BY updated_at DESC
+                ''').fetchall()
+
+        return [dict(row) for row in rows]
+
     def associate_video_with_workflow(
         self,
         workflow_id: str,
@@ -513,18 +1786,26 @@ class MediaManager:
         execution_id: Optional[str] = None
     ):
         """Associate a video with a workflow node"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT OR REPLACE INTO workflow_videos
+        self.associate_videos_bulk([
             (workflow_id, video_id, node_id, node_type, role, execution_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (workflow_id, video_id, node_id, node_type, role, execution_id))
+        ])
 
-        conn.commit()
-        conn.close()
-        logger.info(f"Associated video {video_id} with workflow {workflow_id}")
+    def associate_videos_bulk(self, rows: List[tuple]):
+        """
+        Associate many videos with workflow nodes in one transaction
+
+        Args:
+            rows: (workflow_id, video_id, node_id, node_type, role, execution_id) tuples
+        """
+        with self._transaction(immediate=True) as cursor:
+            cursor.executemany('''
+                INSERT OR REPLACE INTO workflow_videos
+                (workflow_id, video_id, node_id, node_type, role, execution_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+
+        for workflow_id, video_id, *_ in rows:
+            logger.info(f"Associated video {video_id} with workflow {workflow_id}")
 
     def create_workflow_execution(
         self,
@@ -533,16 +1814,12 @@ class MediaManager:
         status: str = 'running'
     ) -> str:
         """Create a workflow execution record"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO workflow_executions (id, workflow_id, status)
-            VALUES (?, ?, ?)
-        ''', (execution_id, workflow_id, status))
+        with self._transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO workflow_executions (id, workflow_id, status)
+                VALUES (?, ?, ?)
+            ''', (execution_id, workflow_id, status))
 
-        conn.commit()
-        conn.close()
         logger.info(f"Created workflow execution: {execution_id}")
         return execution_id
 
@@ -553,54 +1830,84 @@ class MediaManager:
         error: Optional[str] = None,
         execution_data: Optional[Dict[str, Any]] = None
     ):
-        """Update workflow execution status"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
+        """
+        Update workflow execution status
 
+        Intermediate updates are queued and written by a background thread
+        every EXECUTION_FLUSH_INTERVAL seconds, keeping only the latest
+        update per execution. A 'completed' or 'failed' status is flushed
+        before returning, so the final state is visible right away.
+        """
         completed_at = datetime.utcnow().isoformat() if status in ['completed', 'failed'] else None
 
-        cursor.execute('''
-            UPDATE workflow_executions
-            SET status = ?, error = ?, execution_data = ?, completed_at = ?
-            WHERE id = ?
-        ''', (
+        self._exec_write_queue.put((
             status,
             error,
-            json.dumps(execution_data) if execution_data else None,
+            _dumps_blob(execution_data) if execution_data else None,
             completed_at,
             execution_id
         ))
 
-        conn.commit()
-        conn.close()
+        if completed_at:
+            self.flush_execution_updates()
+        else:
+            self._start_execution_writer()
+
+    def flush_execution_updates(self):
+        """Write all queued execution updates in one transaction"""
+        # Held across dequeue and write so a concurrent flush cannot commit
+        # an older update for the same execution after a newer one
+        with self._exec_flush_lock:
+            latest = {}
+            while True:
+                try:
+                    update = self._exec_write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                latest[update[-1]] = update
+
+            if not latest:
+                return
+
+            with self._transaction() as cursor:
+                cursor.executemany(_SQL_UPDATE_EXECUTION, list(latest.values()))
+
+    def _start_execution_writer(self):
+        """Start the background execution writer on first use"""
+        with self._lock:
+            if self._exec_writer is None:
+                self._exec_writer = threading.Thread(
+                    target=self._run_execution_writer,
+                    name='media-manager-exec-writer',
+                    daemon=True
+                )
+                self._exec_writer.start()
+
+    def _run_execution_writer(self):
+        """Background loop: flush queued execution updates until close()"""
+        while not self._exec_writer_stop.wait(EXECUTION_FLUSH_INTERVAL):
+            try:
+                self.flush_execution_updates()
+            except Exception as e:
+                logger.error(f"Failed to write workflow execution updates: {e}")
 
     def get_workflow_stats(self) -> Dict[str, Any]:
         """Get statistics about workflows and videos"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-
         stats = {}
 
-        # Total videos by source type
-        cursor.execute('''
-            SELECT source_type, COUNT(*) as count, SUM(size_bytes) as total_size
-            FROM videos
-            GROUP BY source_type
-        ''')
-        stats['videos_by_source'] = {row[0]: {'count': row[1], 'total_size': row[2]}
-                                     for row in cursor.fetchall()}
+        with self._lock:
+            cursor = self._conn.cursor()
 
-        # Total workflows by status
-        cursor.execute('''
-            SELECT status, COUNT(*) as count
-            FROM workflows
-            GROUP BY status
-        ''')
-        stats['workflows_by_status'] = {row[0]: row[1] for row in cursor.fetchall()}
+            # Total videos by source type
+            cursor.execute('SELECT source_type, count, total_size FROM video_stats')
+            stats['videos_by_source'] = {row[0]: {'count': row[1], 'total_size': row[2]}
+                                         for row in cursor.fetchall()}
+
+            # Total workflows by status
+            cursor.execute('SELECT status, count FROM workflow_status_counts')
+            stats['workflows_by_status'] = {row[0]: row[1] for row in cursor.fetchall()}
 
         # Total storage used
-        cursor.execute('SELECT SUM(size_bytes) FROM videos')
-        stats['total_storage_bytes'] = cursor.fetchone()[0] or 0
+        stats['total_storage_bytes'] = sum(v['total_size'] for v in stats['videos_by_source'].values())
 
-        conn.close()
         return stats
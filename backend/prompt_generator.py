@@ -3,15 +3,102 @@ Prompt Generator Module
 Generates multiple prompts using OpenAI GPT API based on system and user prompts.
 """
 
-import json
+import asyncio
+import functools
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
+import threading
+from collections import OrderedDict
+from typing import Iterator, List, Dict, Any, Optional
+from openai import AsyncOpenAI, OpenAI
 import os
 
+import orjson
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Keys that may hold the prompt list when the model wraps it in an object
+PROMPT_LIST_KEYS = ('prompts', 'episodes', 'items')
+
+# Structured-output schema, so models that support it return the prompt
+# list in one fixed shape
+PROMPTS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "prompt_list",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "prompts": {"type": "array", "items": {"type": "string"}}
+            },
+            "required": ["prompts"],
+            "additionalProperties": False
+        }
+    }
+}
+
+
+@functools.lru_cache(maxsize=4)
+def _get_client(api_key: str) -> OpenAI:
+    """
+    OpenAI client shared by every generator using api_key
+
+    The client owns the HTTP connection pool, so sharing it keeps connections
+    (and their TLS sessions) alive across generators instead of handshaking
+    again for each new one.
+    """
+    return OpenAI(api_key=api_key)
+
+
+class _PromptStreamParser:
+    """
+    Incremental parser that pulls string elements out of a streamed JSON array.
+
+    Text before the first '[' is skipped, so both a bare array and an object
+    wrapping one (e.g. {"prompts": [...]}) work. Each string element is
+    returned by feed() once its closing quote has arrived; nested values and
+    anything after the array are ignored.
+    """
+
+    def __init__(self):
+        self._depth = 0          # bracket depth, counted from the first '['
+        self._in_string = False
+        self._escape = False
+        self._buf = []
+        self._done = False
+
+    def feed(self, text: str) -> List[str]:
+        """Consume the next piece of the response; return completed elements"""
+        completed = []
+        for ch in text:
+            if self._done:
+                break
+
+            if self._in_string:
+                if self._depth == 1:
+                    self._buf.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        completed.append(orjson.loads('"' + ''.join(self._buf)))
+                        self._buf = []
+            elif ch == '"':
+                self._in_string = True
+            elif ch == '[' or (ch == '{' and self._depth > 0):
+                self._depth += 1
+            elif ch in ']}' and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._done = True
+
+        return completed
+
 
 class PromptGenerator:
     """
@@ -22,6 +109,7 @@ class PromptGenerator:
         model (str): GPT model to use (default: gpt-4)
         temperature (float): Sampling temperature (default: 0.7)
         max_tokens (int): Maximum tokens per response (default: 2000)
+        cache_size (int): Generations kept in the in-memory cache (0 disables it)
     """
 
     def __init__(
@@ -29,7 +117,8 @@ class PromptGenerator:
         api_key: Optional[str] = None,
         model: str = "gpt-4",
         temperature: float = 0.7,
-        max_tokens: int = 2000
+        max_tokens: int = 2000,
+        cache_size: int = 128
     ):
         """
         Initialize the PromptGenerator.
@@ -39,16 +128,29 @@ class PromptGenerator:
             model: GPT model to use
             temperature: Sampling temperature (0.0 to 2.0)
             max_tokens: Maximum tokens in the response
+            cache_size: Number of generations to cache by exact request (0 disables)
         """
         self.api_key = api_key or os.environ.get('OPENAI_API_KEY')
         if not self.api_key:
             raise ValueError("OpenAI API key must be provided or set in OPENAI_API_KEY environment variable")
 
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = _get_client(self.api_key)
+        self._async_client = None
+        # Every async API call runs on one long-lived loop: the async client's
+        # connections are bound to the loop that opened them, so they can only
+        # be reused there, whichever loop the caller awaits from
+        self._loop = None
+        self._loop_lock = threading.Lock()
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
 
+        # Exact-match LRU cache: identical requests (e.g. workflow re-runs)
+        # are answered without another API call
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
     def generate_prompts(
         self,
         system_prompt: str,
@@ -74,123 +176,364 @@ class PromptGenerator:
             ValueError: If inputs are invalid
             openai.OpenAIError: If API call fails
         """
-        # Validate inputs
-        if not system_prompt or not system_prompt.strip():
-            raise ValueError("system_prompt cannot be empty")
-
-        if not user_prompt or not user_prompt.strip():
-            raise ValueError("user_prompt cannot be empty")
-
-        if prompt_count < 1:
-            raise ValueError("prompt_count must be at least 1")
-
-        if prompt_count > 50:
-            raise ValueError("prompt_count cannot exceed 50")
+        self._validate_inputs(system_prompt, user_prompt, prompt_count)
 
         # Use provided values or defaults
         temp = temperature if temperature is not None else self.temperature
         tokens = max_tokens if max_tokens is not None else self.max_tokens
 
-        # Construct the full user message with JSON output instruction
-        full_user_message = f"""{user_prompt}
-
-Generate exactly {prompt_count} prompt(s). Return your response as a valid JSON array of strings.
-Format: ["prompt 1", "prompt 2", ...]
+        cache_key = self._cache_key(system_prompt, user_prompt, prompt_count, temp, tokens)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info(f"Returning {len(cached)} cached prompts")
+            return cached
 
-Each prompt should be detailed, specific, and ready to use for video generation."""
+        messages = self._build_messages(system_prompt, user_prompt, prompt_count)
 
         try:
             logger.info(f"Generating {prompt_count} prompts using {self.model}")
 
-            # Call OpenAI API (try with json_object format first, fall back if not supported)
+            # Call OpenAI API (try with structured output first, fall back if not supported)
             try:
                 response = self.client.chat.completions.create(
                     model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": full_user_message}
-                    ],
+                    messages=messages,
                     temperature=temp,
                     max_tokens=tokens,
                     n=1,
-                    response_format={"type": "json_object"}
+                    response_format=PROMPTS_RESPONSE_FORMAT
                 )
             except Exception as json_error:
-                # If json_object format is not supported, try without it
-                logger.warning(f"JSON object format not supported, falling back to text: {json_error}")
+                # If structured output is not supported, try without it
+                logger.warning(f"Structured output not supported, falling back to text: {json_error}")
                 response = self.client.chat.completions.create(
                     model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": full_user_message}
-                    ],
+                    messages=messages,
                     temperature=temp,
                     max_tokens=tokens,
                     n=1
                 )
 
-            # Extract response content
-            content = response.choices[0].message.content.strip()
-            logger.info(f"Received response from GPT: {content[:100]}...")
+            prompts = self._parse_response(response.choices[0].message.content, prompt_count)
 
-            # Parse JSON response
-            try:
-                parsed_response = json.loads(content)
-
-                # Handle different JSON structures
-                if isinstance(parsed_response, list):
-                    prompts = parsed_response
-                elif isinstance(parsed_response, dict):
-                    # Try common keys
-                    if 'prompts' in parsed_response:
-                        prompts = parsed_response['prompts']
-                    elif 'episodes' in parsed_response:
-                        prompts = parsed_response['episodes']
-                    elif 'items' in parsed_response:
-                        prompts = parsed_response['items']
-                    else:
-                        # Take the first list value found
-                        prompts = next((v for v in parsed_response.values() if isinstance(v, list)), [])
-                else:
-                    raise ValueError(f"Unexpected response format: {type(parsed_response)}")
-
-                # Validate prompts
-                if not isinstance(prompts, list):
-                    raise ValueError("Response does not contain a list of prompts")
-
-                if len(prompts) != prompt_count:
-                    logger.warning(
-                        f"Expected {prompt_count} prompts, got {len(prompts)}. "
-                        f"Adjusting to match requested count."
-                    )
-                    # Pad or truncate to match expected count
-                    if len(prompts) < prompt_count:
-                        if len(prompts) > 0:
-                            # Pad with last prompt
-                            prompts.extend([prompts[-1]] * (prompt_count - len(prompts)))
-                        else:
-                            # No prompts at all - raise error
-                            raise ValueError("No valid prompts generated from response")
-                    else:
-                        prompts = prompts[:prompt_count]
+        except Exception as e:
+            logger.error(f"Error in generate_prompts: {e}")
+            raise
 
-                # Ensure all prompts are strings
-                prompts = [str(p).strip() for p in prompts if p]
+        self._cache_put(cache_key, prompts)
+        return list(prompts)
 
-                if not prompts:
-                    raise ValueError("No valid prompts generated")
+    async def generate_prompts_async(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        prompt_count: int,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> List[str]:
+        """
+        Async variant of generate_prompts using the AsyncOpenAI client.
+
+        Takes the same arguments, shares the same cache and raises the same errors.
+        Safe to await from any event loop: the API call itself always runs on
+        the generator's own loop (see _event_loop), which owns async_client.
+        """
+        self._validate_inputs(system_prompt, user_prompt, prompt_count)
+
+        temp = temperature if temperature is not None else self.temperature
+        tokens = max_tokens if max_tokens is not None else self.max_tokens
 
-                logger.info(f"Successfully generated {len(prompts)} prompts")
-                return prompts
+        cache_key = self._cache_key(system_prompt, user_prompt, prompt_count, temp, tokens)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info(f"Returning {len(cached)} cached prompts")
+            return cached
 
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response: {e}")
-                raise ValueError(f"Invalid JSON response from GPT: {content[:200]}")
+        messages = self._build_messages(system_prompt, user_prompt, prompt_count)
+        request = self._request_prompts(messages, prompt_count, temp, tokens)
+        loop = self._event_loop()
+        if asyncio.get_running_loop() is loop:
+            prompts = await request
+        else:
+            prompts = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(request, loop))
+
+        self._cache_put(cache_key, prompts)
+        return list(prompts)
+
+    async def _request_prompts(
+        self,
+        messages: List[Dict[str, str]],
+        prompt_count: int,
+        temperature: float,
+        max_tokens: int
+    ) -> List[str]:
+        """Ask the API for prompts; runs on _event_loop(), where async_client lives"""
+        try:
+            logger.info(f"Generating {prompt_count} prompts using {self.model}")
+
+            try:
+                response = await self.async_client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    n=1,
+                    response_format=PROMPTS_RESPONSE_FORMAT
+                )
+            except Exception as json_error:
+                logger.warning(f"Structured output not supported, falling back to text: {json_error}")
+                response = await self.async_client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    n=1
+                )
+
+            prompts = self._parse_response(response.choices[0].message.content, prompt_count)
 
         except Exception as e:
-            logger.error(f"Error in generate_prompts: {e}")
+            logger.error(f"Error in generate_prompts_async: {e}")
             raise
 
+        return prompts
+
+    def iter_prompts(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        prompt_count: int,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Stream prompts one at a time as GPT emits them.
+
+        Same arguments and result as generate_prompts, but the response is
+        requested with stream=True and each prompt is yielded as soon as its
+        array element is complete, so callers can start work on the first
+        prompt before the last one is written.
+
+        Yields:
+            Generated prompts, exactly prompt_count of them
+
+        Raises:
+            ValueError: If inputs are invalid or no prompts were produced
+            openai.OpenAIError: If API call fails
+        """
+        self._validate_inputs(system_prompt, user_prompt, prompt_count)
+
+        temp = temperature if temperature is not None else self.temperature
+        tokens = max_tokens if max_tokens is not None else self.max_tokens
+
+        cache_key = self._cache_key(system_prompt, user_prompt, prompt_count, temp, tokens)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info(f"Returning {len(cached)} cached prompts")
+            yield from cached
+            return
+
+        logger.info(f"Streaming {prompt_count} prompts using {self.model}")
+
+        # No structured response format here: it forces an object wrapper,
+        # while a bare array lets the first element arrive soonest
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=self._build_messages(system_prompt, user_prompt, prompt_count),
+            temperature=temp,
+            max_tokens=tokens,
+            n=1,
+            stream=True
+        )
+
+        parser = _PromptStreamParser()
+        prompts = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if not text:
+                continue
+            for prompt in parser.feed(text):
+                prompt = prompt.strip()
+                if prompt and len(prompts) < prompt_count:
+                    prompts.append(prompt)
+                    yield prompt
+
+        if not prompts:
+            raise ValueError("No valid prompts generated from response")
+
+        if len(prompts) < prompt_count:
+            logger.warning(
+                f"Expected {prompt_count} prompts, got {len(prompts)}. "
+                f"Padding with the last prompt."
+            )
+            while len(prompts) < prompt_count:
+                prompts.append(prompts[-1])
+                yield prompts[-1]
+
+        logger.info(f"Successfully streamed {len(prompts)} prompts")
+        self._cache_put(cache_key, prompts)
+
+    def generate_prompts_many(self, specs: List[Dict[str, Any]]) -> List[List[str]]:
+        """
+        Generate several prompt batches concurrently.
+
+        Args:
+            specs: One dict of generate_prompts keyword arguments per batch
+
+        Returns:
+            One list of prompts per spec, in the same order
+
+        Note:
+            Blocks until every batch is done, so call it from synchronous code
+            only; inside a running loop, gather generate_prompts_async instead.
+            Safe to call from several threads at once.
+        """
+        async def run_all():
+            return await asyncio.gather(
+                *(self.generate_prompts_async(**spec) for spec in specs)
+            )
+
+        return list(asyncio.run_coroutine_threadsafe(run_all(), self._event_loop()).result())
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        """The loop all async API calls run on, started in a daemon thread on first use"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name='prompt-generator-loop', daemon=True
+                ).start()
+            return self._loop
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """AsyncOpenAI client, created on first use; only use it on _event_loop()"""
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(api_key=self.api_key)
+        return self._async_client
+
+    def _cache_key(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        prompt_count: int,
+        temperature: float,
+        max_tokens: int
+    ) -> str:
+        """Digest of every input that affects the generated prompts"""
+        key = orjson.dumps([self.model, system_prompt, user_prompt, prompt_count, temperature, max_tokens])
+        return hashlib.blake2b(key, digest_size=16).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[List[str]]:
+        """Return a copy of the cached prompts for key, or None"""
+        with self._cache_lock:
+            prompts = self._cache.get(key)
+            if prompts is None:
+                return None
+            self._cache.move_to_end(key)
+            return list(prompts)
+
+    def _cache_put(self, key: str, prompts: List[str]):
+        """Cache prompts under key, evicting the least recently used entry"""
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = list(prompts)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _validate_inputs(system_prompt: str, user_prompt: str, prompt_count: int):
+        """Validate generate_prompts arguments"""
+        if not system_prompt or not system_prompt.strip():
+            raise ValueError("system_prompt cannot be empty")
+
+        if not user_prompt or not user_prompt.strip():
+            raise ValueError("user_prompt cannot be empty")
+
+        if prompt_count < 1:
+            raise ValueError("prompt_count must be at least 1")
+
+        if prompt_count > 50:
+            raise ValueError("prompt_count cannot exceed 50")
+
+    @staticmethod
+    def _build_messages(system_prompt: str, user_prompt: str, prompt_count: int) -> List[Dict[str, str]]:
+        """Build the chat messages, adding the JSON output instruction to the user prompt"""
+        full_user_message = f"""{user_prompt}
+
+Generate exactly {prompt_count} prompt(s). Return your response as a valid JSON array of strings.
+Format: ["prompt 1", "prompt 2", ...]
+
+Each prompt should be detailed, specific, and ready to use for video generation."""
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": full_user_message}
+        ]
+
+    @staticmethod
+    def _parse_response(content: str, prompt_count: int) -> List[str]:
+        """Extract exactly prompt_count prompts from a chat completion's message content"""
+        content = content.strip()
+        logger.info(f"Received response from GPT: {content[:100]}...")
+
+        # Parse JSON response
+        try:
+            parsed_response = orjson.loads(content)
+
+            # Accepted shapes: a bare array, or an object holding the array
+            # under one of PROMPT_LIST_KEYS (or, failing that, any list value)
+            if isinstance(parsed_response, list):
+                prompts = parsed_response
+            elif isinstance(parsed_response, dict):
+                key = next((k for k in PROMPT_LIST_KEYS if k in parsed_response), None)
+                if key is not None:
+                    prompts = parsed_response[key]
+                else:
+                    prompts = next((v for v in parsed_response.values() if isinstance(v, list)), [])
+            else:
+                raise ValueError(f"Unexpected response format: {type(parsed_response)}")
+
+            # Validate prompts
+            if not isinstance(prompts, list):
+                raise ValueError("Response does not contain a list of prompts")
+
+            if not all(isinstance(p, str) for p in prompts):
+                raise ValueError("Response prompts must all be strings")
+
+            if len(prompts) != prompt_count:
+                logger.warning(
+                    f"Expected {prompt_count} prompts, got {len(prompts)}. "
+                    f"Adjusting to match requested count."
+                )
+                # Pad or truncate to match expected count
+                if len(prompts) < prompt_count:
+                    if len(prompts) > 0:
+                        # Pad with last prompt
+                        prompts.extend([prompts[-1]] * (prompt_count - len(prompts)))
+                    else:
+                        # No prompts at all - raise error
+                        raise ValueError("No valid prompts generated from response")
+                else:
+                    prompts = prompts[:prompt_count]
+
+            # Drop empty prompts
+            prompts = [p.strip() for p in prompts if p]
+
+            if not prompts:
+                raise ValueError("No valid prompts generated")
+
+            logger.info(f"Successfully generated {len(prompts)} prompts")
+            return prompts
+
+        except orjson.JSONDecodeError as e:
+            logger.error(f"Failed to parse JSON response: {e}")
+            raise ValueError(f"Invalid JSON response from GPT: {content[:200]}")
+
     def generate_episode_prompts(
         self,
         outline: str,
@@ -8,7 +8,7 @@ import sys
 import uuid
 from pathlib import Path
 from media_manager import MediaManager
-from video_metadata import VideoMetadataExtractor
+from video_metadata import VideoMetadataExtractor, format_duration, format_file_size
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent))
@@ -33,7 +33,7 @@ def test_media_manager():
 
     if Path(test_video_path).exists():
         # Extract metadata
-        metadata_extractor = VideoMetadataExtractor()
+        metadata_extractor = VideoMetadataExtractor(cache=mm)
         video_metadata = metadata_extractor.extract_metadata(test_video_path)
 
         video_id = str(uuid.uuid4())
@@ -41,20 +41,20 @@ def test_media_manager():
             video_id=video_id,
             name='Test Video 1',
             file_path=test_video_path,
-            size_bytes=video_metadata['size_bytes'],
+            size_bytes=video_metadata.size_bytes,
             source_type='uploaded',
-            duration_seconds=video_metadata['duration_seconds'],
-            resolution=video_metadata['resolution'],
-            aspect_ratio=video_metadata['aspect_ratio'],
-            codec=video_metadata['codec'],
-            fps=video_metadata['fps'],
+            duration_seconds=video_metadata.duration_seconds,
+            resolution=video_metadata.resolution,
+            aspect_ratio=video_metadata.aspect_ratio,
+            codec=video_metadata.codec,
+            fps=video_metadata.fps,
             metadata={'test': True}
         )
 
         print(f"   ✓ Added video: {result['video_id']}")
-        print(f"   - Resolution: {video_metadata['resolution']}")
-        print(f"   - Duration: {metadata_extractor.format_duration(video_metadata['duration_seconds'])}")
-        print(f"   - Size: {metadata_extractor.format_file_size(video_metadata['size_bytes'])}")
+        print(f"   - Resolution: {video_metadata.resolution}")
+        print(f"   - Duration: {format_duration(video_metadata.duration_seconds)}")
+        print(f"   - Size: {format_file_size(video_metadata.size_bytes)}")
     else:
         print(f"   ⚠ Test video not found: {test_video_path}")
 
@@ -66,7 +66,7 @@ def test_media_manager():
             video_id=duplicate_id,
             name='Test Video 1 (Duplicate)',
             file_path=test_video_path,
-            size_bytes=video_metadata['size_bytes'],
+            size_bytes=video_metadata.size_bytes,
             source_type='uploaded'
         )
 
@@ -143,7 +143,7 @@ def test_media_manager():
     print("\n8. Testing statistics...")
     stats = mm.get_workflow_stats()
     print(f"   ✓ System Statistics:")
-    print(f"   - Total storage: {metadata_extractor.format_file_size(stats['total_storage_bytes'])}")
+    print(f"   - Total storage: {format_file_size(stats['total_storage_bytes'])}")
     print(f"   - Videos by source: {stats.get('videos_by_source', {})}")
     print(f"   - Workflows by status: {stats.get('workflows_by_status', {})}")
 
@@ -0,0 +1,577 @@
+"""
+Unit tests for MediaManager's SQLite layer
+
+Every test gets its own database and video directory under tmp_path, so
+these cover dedup, migrations and the trigger-kept counters without
+touching backend/media.db or needing real video files.
+"""
+
+import os
+import sqlite3
+
+import pytest
+
+import media_manager
+from media_manager import (
+    HASH_ALGO, PENDING_HASH_ALGO, QUICK_FP_SIZE, SCHEMA_VERSION, UNHASHED_ALGO, MediaManager
+)
+
+
+@pytest.fixture(autouse=True)
+def default_env(monkeypatch):
+    """Start each test from the default hashing and prefilter settings"""
+    for name in ('DEDUP_PREFILTER', 'DEDUP_HASH_ALGO', 'USE_PARALLEL_HASH', 'INDEX_VIDEO_CHUNKS'):
+        monkeypatch.delenv(name, raising=False)
+
+
+@pytest.fixture
+def open_manager(tmp_path):
+    """Open (or reopen) the test database; every manager is closed at teardown"""
+    managers = []
+
+    def _open():
+        mm = MediaManager(db_path=str(tmp_path / 'media.db'), video_dir=str(tmp_path / 'videos'))
+        managers.append(mm)
+        return mm
+
+    yield _open
+    for mm in managers:
+        try:
+            mm.close()
+        except sqlite3.ProgrammingError:
+            pass  # already closed by the test
+
+
+@pytest.fixture
+def mm(open_manager):
+    return open_manager()
+
+
+@pytest.fixture
+def make_file(tmp_path):
+    """Write a file under tmp_path/videos and return its path"""
+    def _make(name, content):
+        path = tmp_path / 'videos' / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(content)
+        return str(path)
+    return _make
+
+
+def record(video_id, file_path, source_type='uploaded', **extra):
+    """An add_videos_bulk record with the size taken from the file"""
+    return {
+        'video_id': video_id,
+        'name': f'{video_id}.mp4',
+        'file_path': file_path,
+        'size_bytes': os.path.getsize(file_path),
+        'source_type': source_type,
+        **extra
+    }
+
+
+def video_row(mm, video_id):
+    """The stored row itself, without alias resolution"""
+    row = mm._conn.execute('SELECT * FROM videos WHERE id = ?', (video_id,)).fetchone()
+    return dict(row) if row else None
+
+
+class TestMigration:
+    """A database written by the original schema is brought up to date once"""
+
+    @pytest.fixture
+    def baseline_db(self, tmp_path, make_file):
+        """The original layout: no hash_algo/hash_status/quick_fp, JSON text definitions"""
+        path = make_file('old.mp4', os.urandom(1500))
+        conn = sqlite3.connect(str(tmp_path / 'media.db'))
+        conn.executescript('''
+            CREATE TABLE videos (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                file_path TEXT NOT NULL UNIQUE,
+                file_hash TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                duration_seconds REAL,
+                resolution TEXT,
+                aspect_ratio TEXT,
+                codec TEXT,
+                fps REAL,
+                source_type TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                metadata JSON
+            );
+            CREATE INDEX idx_videos_hash ON videos(file_hash);
+            CREATE TABLE workflows (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                description TEXT,
+                status TEXT DEFAULT 'draft',
+                definition JSON NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_executed_at TIMESTAMP
+            );
+        ''')
+        conn.execute(
+            'INSERT INTO videos (id, name, file_path, file_hash, size_bytes, source_type) VALUES (?, ?, ?, ?, ?, ?)',
+            ('old', 'old.mp4', path, 'deadbeef', 1500, 'uploaded')
+        )
+        conn.execute(
+            'INSERT INTO workflows (id, name, status, definition) VALUES (?, ?, ?, ?)',
+            ('wf', 'Old workflow', 'active', '{"nodes": [{"id": "node1"}]}')
+        )
+        conn.commit()
+        conn.close()
+        return tmp_path / 'media.db'
+
+    def test_upgrades_baseline_database(self, baseline_db, open_manager):
+        mm = open_manager()
+
+        conn = mm._conn
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(videos)')}
+        assert {'hash_algo', 'hash_status', 'quick_fp'} <= columns
+
+        row = video_row(mm, 'old')
+        assert (row['hash_algo'], row['hash_status']) == (HASH_ALGO, 'ready')
+        assert conn.execute("SELECT typeof(definition) FROM workflows").fetchone()[0] == 'blob'
+        assert mm.get_workflow('wf')['definition'] == {'nodes': [{'id': 'node1'}]}
+
+        stats = mm.get_workflow_stats()
+        assert stats['videos_by_source'] == {'uploaded': {'count': 1, 'total_size': 1500}}
+        assert stats['workflows_by_status'] == {'active': 1}
+
+    def test_data_migration_runs_once(self, baseline_db, open_manager):
+        open_manager().close()
+        # Text written after the upgrade is not the migration's business
+        conn = sqlite3.connect(str(baseline_db))
+        conn.execute("UPDATE workflows SET definition = '{\"nodes\": []}'")
+        conn.commit()
+        conn.close()
+
+        mm = open_manager()
+
+        assert mm._conn.execute("SELECT typeof(definition) FROM workflows").fetchone()[0] == 'text'
+
+
+class TestDedupInsert:
+    """Duplicates are settled by the unique index in INSERT ... ON CONFLICT ... RETURNING"""
+
+    def test_unique_index_is_used(self, mm):
+        assert mm._hash_unique
+
+    def test_duplicate_of_stored_video(self, mm, make_file):
+        data = os.urandom(2048)
+        first = mm.add_video(**record('a', make_file('a.mp4', data)))
+        second = mm.add_video(**record('b', make_file('b.mp4', data)))
+
+        assert not first['is_duplicate']
+        assert first['hash_algo'] == HASH_ALGO
+        assert second == {
+            'video_id': 'a', 'is_duplicate': True, 'original_id': 'a', 'file_path': first['file_path']
+        }
+        assert video_row(mm, 'b') is None
+
+    def test_duplicates_within_one_batch(self, mm, make_file):
+        data = os.urandom(2048)
+        results = mm.add_videos_bulk([
+            record('a', make_file('a.mp4', data)),
+            record('b', make_file('b.mp4', data)),
+            record('c', make_file('c.mp4', os.urandom(2048))),
+            record('d', make_file('d.mp4', data)),
+        ])
+
+        assert [r['is_duplicate'] for r in results] == [False, True, False, True]
+        assert results[1]['original_id'] == 'a'
+        assert results[3]['original_id'] == 'a'
+        count = mm._conn.execute('SELECT COUNT(*) FROM videos').fetchone()[0]
+        assert count == 2
+
+    def test_trusted_unique_skips_hashing(self, mm, make_file, monkeypatch):
+        monkeypatch.setattr(mm, 'hash_files', lambda paths: paths and pytest.fail(f'hashed {paths}'))
+        result = mm.add_video(**record('gen', make_file('gen.mp4', b'x'), 'generated'), trusted_unique=True)
+
+        assert not result['is_duplicate']
+        assert result['hash_algo'] == media_manager.SYNTHETIC_HASH_ALGO
+
+
+class TestExecutionUpdates:
+    """Intermediate execution updates are queued, coalesced and flushed"""
+
+    @pytest.fixture
+    def execution(self, mm, monkeypatch):
+        # Keep the background writer from flushing on its own mid-test
+        monkeypatch.setattr(media_manager, 'EXECUTION_FLUSH_INTERVAL', 60)
+        mm.create_workflow('wf', 'Workflow', {'nodes': []})
+        return mm.create_workflow_execution('ex', 'wf')
+
+    @staticmethod
+    def stored(mm, execution_id):
+        row = mm._conn.execute(
+            'SELECT status, execution_data, completed_at FROM workflow_executions WHERE id = ?',
+            (execution_id,)
+        ).fetchone()
+        data = media_manager._loads(row[1]) if row[1] else None
+        return row[0], data, row[2]
+
+    def test_intermediate_updates_are_coalesced(self, mm, execution):
+        mm.update_workflow_execution(execution, 'running', execution_data={'step': 1})
+        mm.update_workflow_execution(execution, 'running', execution_data={'step': 2})
+
+        assert self.stored(mm, execution) == ('running', None, None)
+        assert mm._exec_write_queue.qsize() == 2
+
+        mm.flush_execution_updates()
+
+        assert mm._exec_write_queue.qsize() == 0
+        assert self.stored(mm, execution) == ('running', {'step': 2}, None)
+
+    def test_final_status_is_written_right_away(self, mm, execution):
+        mm.update_workflow_execution(execution, 'running', execution_data={'step': 1})
+        mm.update_workflow_execution(execution, 'completed', execution_data={'step': 3})
+
+        status, data, completed_at = self.stored(mm, execution)
+        assert (status, data) == ('completed', {'step': 3})
+        assert completed_at is not None
+
+    def test_close_flushes_pending_updates(self, open_manager, execution, mm):
+        mm.update_workflow_execution(execution, 'running', execution_data={'step': 1})
+        mm.close()
+
+        assert self.stored(open_manager(), execution) == ('running', {'step': 1}, None)
+
+
+class TestStats:
+    """video_stats and workflow_status_counts are kept by triggers"""
+
+    def test_counts_follow_inserts_and_deletes(self, mm, make_file):
+        mm.add_videos_bulk([
+            record('a', make_file('a.mp4', os.urandom(1000))),
+            record('b', make_file('b.mp4', os.urandom(3000))),
+            record('g', make_file('g.mp4', os.urandom(500)), 'generated'),
+        ])
+        mm.delete_video('b')
+
+        stats = mm.get_workflow_stats()
+        assert stats['videos_by_source'] == {
+            'uploaded': {'count': 1, 'total_size': 1000},
+            'generated': {'count': 1, 'total_size': 500},
+        }
+        assert stats['total_storage_bytes'] == 1500
+
+        mm.delete_video('g')
+        assert 'generated' not in mm.get_workflow_stats()['videos_by_source']
+
+    def test_workflow_status_changes(self, mm):
+        mm.create_workflow('w1', 'One', {'nodes': []})
+        mm.create_workflow('w2', 'Two', {'nodes': []})
+        mm.update_workflow('w2', status='active')
+
+        assert mm.get_workflow_stats()['workflows_by_status'] == {'draft': 1, 'active': 1}
+
+    def test_counts_survive_reopen(self, open_manager, make_file):
+        mm = open_manager()
+        mm.add_videos_bulk([
+            record('a', make_file('a.mp4', os.urandom(1000))),
+            record('b', make_file('b.mp4', os.urandom(2000))),
+        ])
+        mm.delete_video('a')
+        mm.create_workflow('w1', 'One', {'nodes': []})
+        before = mm.get_workflow_stats()
+        mm.close()
+
+        after = open_manager().get_workflow_stats()
+
+        assert after == before
+        assert after['videos_by_source'] == {'uploaded': {'count': 1, 'total_size': 2000}}
+
+
+class TestDeferredHash:
+    """defer_hash inserts first and settles dedup in the background"""
+
+    @pytest.fixture
+    def submitted(self, mm, monkeypatch):
+        """Deferred hashes are collected here instead of run by the worker"""
+        queued = []
+        monkeypatch.setattr(mm, '_submit_deferred_hash', lambda *args: queued.append(args))
+        return queued
+
+    def test_unique_file_becomes_ready(self, mm, make_file, submitted):
+        result = mm.add_video(**record('a', make_file('a.mp4', os.urandom(2048))), defer_hash=True)
+        assert result['hash_status'] == 'hashing'
+        assert video_row(mm, 'a')['hash_algo'] == PENDING_HASH_ALGO
+
+        mm._resolve_deferred_hash(*submitted[0])
+
+        row = video_row(mm, 'a')
+        assert row['hash_status'] == 'ready'
+        assert row['hash_algo'] == HASH_ALGO
+        assert row['file_hash'] == mm.calculate_file_hash(row['file_path'])
+
+    def test_duplicate_is_merged_into_original(self, mm, make_file, submitted):
+        data = os.urandom(2048)
+        mm.add_video(**record('orig', make_file('orig.mp4', data)))
+        mm.add_video(**record('late', make_file('late.mp4', data)), defer_hash=True)
+        mm.create_workflow('wf', 'Workflow', {'nodes': []})
+        mm.associate_video_with_workflow('wf', 'late', 'node1', 'VideoUpload', 'output')
+
+        mm._resolve_deferred_hash(*submitted[0])
+
+        assert video_row(mm, 'late') is None
+        alias = mm._conn.execute(
+            'SELECT video_id FROM video_aliases WHERE alias_id = ?', ('late',)
+        ).fetchone()
+        assert alias[0] == 'orig'
+        assert mm.get_video('late')['id'] == 'orig'
+        assert mm.get_videos_bulk(['late'])['late']['id'] == 'orig'
+        assert [v['id'] for v in mm.get_workflow('wf')['videos']] == ['orig']
+
+    def test_deleted_while_hashing(self, mm, make_file, submitted):
+        mm.add_video(**record('a', make_file('a.mp4', os.urandom(2048))), defer_hash=True)
+        mm.delete_video('a', delete_file=False)
+
+        mm._resolve_deferred_hash(*submitted[0])
+
+        assert video_row(mm, 'a') is None
+
+    def test_missing_file_marks_failed(self, mm, make_file, submitted):
+        path = make_file('a.mp4', os.urandom(2048))
+        mm.add_video(**record('a', path), defer_hash=True)
+        os.unlink(path)
+
+        mm._resolve_deferred_hash(*submitted[0])
+
+        assert video_row(mm, 'a')['hash_status'] == 'failed'
+
+    def test_resumed_after_reopen(self, open_manager, make_file, monkeypatch):
+        mm = open_manager()
+        monkeypatch.setattr(mm, '_submit_deferred_hash', lambda *args: None)
+        mm.add_video(**record('a', make_file('a.mp4', os.urandom(2048))), defer_hash=True)
+        mm.close()
+
+        reopened = open_manager()
+        reopened._hash_executor.shutdown(wait=True)
+
+        assert video_row(reopened, 'a')['hash_status'] == 'ready'
+
+
+class TestQuickFingerprintPrefilter:
+    """DEDUP_PREFILTER skips full hashes for files that cannot be duplicates"""
+
+    @pytest.fixture
+    def prefilter(self, monkeypatch):
+        monkeypatch.setenv('DEDUP_PREFILTER', '1')
+
+    def test_off_reads_no_quick_fingerprints(self, mm, make_file, monkeypatch):
+        monkeypatch.setattr(MediaManager, 'quick_fingerprint', staticmethod(
+            lambda path: pytest.fail(f'read quick fingerprint of {path}')
+        ))
+        result = mm.add_video(**record('a', make_file('a.mp4', os.urandom(QUICK_FP_SIZE * 2))))
+
+        assert result['hash_algo'] == HASH_ALGO
+        assert video_row(mm, 'a')['quick_fp'] is None
+
+    def test_unique_file_is_not_hashed(self, prefilter, mm, make_file):
+        result = mm.add_video(**record('a', make_file('a.mp4', os.urandom(QUICK_FP_SIZE * 2))))
+
+        assert result['hash_algo'] == UNHASHED_ALGO
+        assert video_row(mm, 'a')['quick_fp'] is not None
+
+    def test_matching_quick_fingerprint_upgrades_placeholder(self, prefilter, mm, make_file):
+        data = os.urandom(QUICK_FP_SIZE * 2)
+        # Same size and first 4 KB, different tail: both need a full hash
+        near = data[:QUICK_FP_SIZE] + os.urandom(QUICK_FP_SIZE)
+        mm.add_video(**record('a', make_file('a.mp4', data)))
+
+        near_result = mm.add_video(**record('near', make_file('near.mp4', near)))
+        copy_result = mm.add_video(**record('copy', make_file('copy.mp4', data)))
+
+        assert not near_result['is_duplicate']
+        assert near_result['hash_algo'] == HASH_ALGO
+        row = video_row(mm, 'a')
+        assert row['hash_algo'] == HASH_ALGO
+        assert row['file_hash'] == mm.calculate_file_hash(row['file_path'])
+        assert copy_result['is_duplicate']
+        assert copy_result['original_id'] == 'a'
+
+    def test_duplicates_within_one_batch(self, prefilter, mm, make_file):
+        data = os.urandom(QUICK_FP_SIZE * 2)
+        results = mm.add_videos_bulk([
+            record('a', make_file('a.mp4', data)),
+            record('b', make_file('b.mp4', data)),
+        ])
+
+        assert [r['is_duplicate'] for r in results] == [False, True]
+        assert results[0]['hash_algo'] == HASH_ALGO
+
+    def test_files_are_hashed_outside_the_lock(self, prefilter, mm, make_file, monkeypatch):
+        data = os.urandom(QUICK_FP_SIZE * 2)
+        mm.add_video(**record('a', make_file('a.mp4', data)))
+        hash_files = mm.hash_files
+
+        def unlocked_hash_files(paths):
+            assert not mm._lock._is_owned(), 'files hashed while holding the database lock'
+            return hash_files(paths)
+
+        monkeypatch.setattr(mm, 'hash_files', unlocked_hash_files)
+
+        assert mm.add_video(**record('b', make_file('b.mp4', data)))['is_duplicate']
+
+    def test_enabling_later_backfills_quick_fingerprints(self, open_manager, make_file, monkeypatch):
+        data = os.urandom(QUICK_FP_SIZE * 2)
+        mm = open_manager()
+        mm.add_video(**record('a', make_file('a.mp4', data)))
+        mm.close()
+
+        monkeypatch.setenv('DEDUP_PREFILTER', '1')
+        mm = open_manager()
+
+        assert video_row(mm, 'a')['quick_fp'] == MediaManager.quick_fingerprint(video_row(mm, 'a')['file_path'])
+        result = mm.add_video(**record('b', make_file('b.mp4', data)))
+        assert result['is_duplicate']
+        assert result['original_id'] == 'a'
+
+
+class TestJobs:
+    """Video service jobs are stored one row per job"""
+
+    def test_round_trip_and_order(self, mm):
+        mm.save_job('old', '2024-01-01T00:00:00', 'completed', {'id': 'old', 'status': 'completed'})
+        mm.save_job('new', '2024-02-01T00:00:00', 'processing', {'id': 'new', 'status': 'processing'})
+
+        assert mm.get_job('old') == {'id': 'old', 'status': 'completed'}
+        assert [job['id'] for job in mm.list_jobs()] == ['new', 'old']
+        assert mm.get_job('missing') is None
+
+    def test_save_overwrites(self, mm):
+        mm.save_job('j', '2024-01-01T00:00:00', 'processing', {'progress': 10})
+        mm.save_job('j', '2024-01-01T00:00:00', 'completed', {'progress': 100})
+
+        assert mm.list_jobs() == [{'progress': 100}]
+
+    def test_delete_jobs(self, mm):
+        for job_id in ('a', 'b', 'c'):
+            mm.save_job(job_id, '2024-01-01T00:00:00', 'completed', {'id': job_id})
+        mm.delete_jobs(['a', 'c'])
+        mm.delete_job('missing')
+
+        assert [job['id'] for job in mm.list_jobs()] == ['b']
+
+    def test_jobs_survive_reopen(self, open_manager):
+        mm = open_manager()
+        mm.save_job('j', '2024-01-01T00:00:00', 'completed', {'id': 'j'})
+        mm.close()
+
+        assert open_manager().get_job('j') == {'id': 'j'}
+
+
+class TestChunkIndex:
+    """INDEX_VIDEO_CHUNKS fingerprints chunks for find_similar_videos"""
+
+    BLOCK = 4096
+
+    @pytest.fixture
+    def indexing(self, monkeypatch):
+        monkeypatch.setenv('INDEX_VIDEO_CHUNKS', '1')
+        monkeypatch.setattr(media_manager, 'CHUNK_MIN_SIZE', self.BLOCK // 4)
+        monkeypatch.setattr(media_manager, 'CHUNK_AVG_SIZE', self.BLOCK)
+        monkeypatch.setattr(media_manager, 'CHUNK_MAX_SIZE', self.BLOCK * 4)
+
+    @pytest.fixture
+    def fixed(self, indexing, monkeypatch):
+        monkeypatch.setattr(media_manager, 'fastcdc', None)
+
+    @staticmethod
+    def chunk_rows(mm, video_id):
+        return mm._conn.execute(
+            'SELECT fp FROM video_chunks WHERE video_id = ? ORDER BY seq', (video_id,)
+        ).fetchall()
+
+    @staticmethod
+    def refcounts(mm):
+        return {row[0]: row[1] for row in mm._conn.execute('SELECT fp, refcount FROM chunks')}
+
+    def test_added_video_is_indexed(self, fixed, mm, make_file):
+        mm.add_video(**record('a', make_file('a.mp4', os.urandom(self.BLOCK * 4))))
+
+        assert len(self.chunk_rows(mm, 'a')) == 4
+        assert list(self.refcounts(mm).values()) == [1, 1, 1, 1]
+
+    def test_reindexing_replaces_chunks(self, fixed, mm, make_file):
+        path = make_file('a.mp4', os.urandom(self.BLOCK * 4))
+        mm.add_video(**record('a', path))
+        with open(path, 'r+b') as f:
+            f.write(os.urandom(self.BLOCK))
+
+        mm.index_video_chunks('a', path)
+
+        rows = self.chunk_rows(mm, 'a')
+        assert len(rows) == 4
+        # The overwritten first chunk is released, the rest counted once
+        assert self.refcounts(mm) == {row[0]: 1 for row in rows}
+
+    def test_delete_releases_chunks(self, fixed, mm, make_file):
+        data = os.urandom(self.BLOCK * 4)
+        mm.add_video(**record('a', make_file('a.mp4', data)))
+        mm.add_video(**record('b', make_file('b.mp4', data[:self.BLOCK * 2] + os.urandom(self.BLOCK * 2))))
+        assert sorted(self.refcounts(mm).values()) == [1, 1, 1, 1, 2, 2]
+
+        mm.delete_video('a')
+
+        assert self.chunk_rows(mm, 'a') == []
+        assert sorted(self.refcounts(mm).values()) == [1, 1, 1, 1]
+
+    def test_min_similarity(self, fixed, mm, make_file):
+        data = os.urandom(self.BLOCK * 4)
+        mm.add_video(**record('a', make_file('a.mp4', data)))
+        mm.add_video(**record('half', make_file('half.mp4', data[:self.BLOCK * 2] + os.urandom(self.BLOCK * 2))))
+        mm.add_video(**record('most', make_file('most.mp4', data[:self.BLOCK * 3] + os.urandom(self.BLOCK))))
+        mm.add_video(**record('other', make_file('other.mp4', os.urandom(self.BLOCK * 4))))
+
+        similar = mm.find_similar_videos('a', min_similarity=0.5)
+        assert [(v['video_id'], v['similarity']) for v in similar] == [('most', 0.75), ('half', 0.5)]
+        assert [v['video_id'] for v in mm.find_similar_videos('a', min_similarity=0.6)] == ['most']
+        assert mm.find_similar_videos('a', min_similarity=0.8) == []
+        assert mm.find_similar_videos('unindexed') == []
+
+    def test_fixed_chunking_misses_shifted_content(self, fixed, mm, make_file):
+        data = os.urandom(self.BLOCK * 8)
+        mm.add_video(**record('a', make_file('a.mp4', data)))
+        mm.add_video(**record('shifted', make_file('shifted.mp4', b'x' + data)))
+
+        assert mm.find_similar_videos('a', min_similarity=0.1) == []
+
+    def test_fastcdc_finds_shifted_content(self, indexing, mm, make_file):
+        pytest.importorskip('fastcdc')
+        data = os.urandom(self.BLOCK * 32)
+        mm.add_video(**record('a', make_file('a.mp4', data)))
+        mm.add_video(**record('shifted', make_file('shifted.mp4', b'x' + data)))
+
+        assert [v['video_id'] for v in mm.find_similar_videos('a', min_similarity=0.5)] == ['shifted']
+
+    def test_warns_without_fastcdc(self, fixed, open_manager, caplog):
+        with caplog.at_level('WARNING', logger='media_manager'):
+            open_manager()
+
+        assert 'fastcdc' in caplog.text
+
+    def test_index_from_other_chunker_is_dropped(self, fixed, open_manager, make_file, monkeypatch):
+        mm = open_manager()
+        mm.add_video(**record('a', make_file('a.mp4', os.urandom(self.BLOCK * 4))))
+        assert mm._conn.execute('SELECT chunker FROM chunk_index_info').fetchone()[0] == 'fixed'
+        mm.close()
+
+        monkeypatch.setattr(MediaManager, 'chunker', staticmethod(lambda: media_manager.FASTCDC_CHUNKER))
+        mm = open_manager()
+
+        assert mm._conn.execute('SELECT chunker FROM chunk_index_info').fetchone()[0] == 'fastcdc'
+        assert self.chunk_rows(mm, 'a') == []
+        assert self.refcounts(mm) == {}
+        assert video_row(mm, 'a') is not None
+
+    def test_same_chunker_keeps_index(self, fixed, open_manager, make_file):
+        mm = open_manager()
+        mm.add_video(**record('a', make_file('a.mp4', os.urandom(self.BLOCK * 4))))
+        mm.close()
+
+        assert len(self.chunk_rows(open_manager(), 'a')) == 4
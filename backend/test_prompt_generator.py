@@ -2,12 +2,20 @@
 Unit tests for PromptGenerator class
 """
 
+import asyncio
 import pytest
 import json
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
 from prompt_generator import PromptGenerator, create_prompt_generator
 
 
+# Shared by every test that does not define its own: each test installs its
+# own mock create(), and with the cache off no result carries over between tests
+@pytest.fixture(scope="module")
+def generator():
+    return PromptGenerator(api_key="test-key", cache_size=0)
+
+
 class TestPromptGeneratorInit:
     """Test PromptGenerator initialization"""
 
@@ -31,6 +39,14 @@ class TestPromptGeneratorInit:
         with pytest.raises(ValueError, match="OpenAI API key must be provided"):
             PromptGenerator()
 
+    def test_client_shared_per_api_key(self):
+        """Test that generators with the same key reuse one client"""
+        first = PromptGenerator(api_key="shared-key")
+        second = PromptGenerator(api_key="shared-key")
+        other = PromptGenerator(api_key="other-key")
+        assert first.client is second.client
+        assert first.client is not other.client
+
     def test_init_with_custom_params(self):
         """Test initialization with custom parameters"""
         generator = PromptGenerator(
@@ -47,10 +63,6 @@ class TestPromptGeneratorInit:
 class TestPromptGeneratorValidation:
     """Test input validation in generate_prompts"""
 
-    @pytest.fixture
-    def generator(self):
-        return PromptGenerator(api_key="test-key")
-
     def test_empty_system_prompt(self, generator):
         """Test validation fails with empty system prompt"""
         with pytest.raises(ValueError, match="system_prompt cannot be empty"):
@@ -80,42 +92,11 @@ class TestPromptGeneratorValidation:
 class TestPromptGeneratorGeneration:
     """Test prompt generation functionality"""
 
-    @pytest.fixture
-    def generator(self):
-        return PromptGenerator(api_key="test-key")
-
-    def test_generate_prompts_success_list_format(self, generator):
-        """Test successful prompt generation with direct list response"""
+    def test_generate_prompts_success(self, generator):
+        """Test that the API response content is parsed into prompts"""
         mock_response = Mock()
         mock_response.choices = [Mock()]
-        mock_response.choices[0].message.content = json.dumps([
-            "Episode 1: A hero emerges",
-            "Episode 2: The journey begins",
-            "Episode 3: Final confrontation"
-        ])
-        generator.client.chat.completions.create = Mock(return_value=mock_response)
-
-        prompts = generator.generate_prompts(
-            system_prompt="You are a director",
-            user_prompt="Generate episode prompts",
-            prompt_count=3
-        )
-
-        assert len(prompts) == 3
-        assert prompts[0] == "Episode 1: A hero emerges"
-        assert prompts[1] == "Episode 2: The journey begins"
-        assert prompts[2] == "Episode 3: Final confrontation"
-
-    def test_generate_prompts_success_dict_format(self, generator):
-        """Test successful prompt generation with dict response"""
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message.content = json.dumps({
-            "prompts": [
-                "Prompt 1",
-                "Prompt 2"
-            ]
-        })
+        mock_response.choices[0].message.content = json.dumps({"prompts": ["Prompt 1", "Prompt 2"]})
         generator.client.chat.completions.create = Mock(return_value=mock_response)
 
         prompts = generator.generate_prompts(
@@ -124,86 +105,26 @@ class TestPromptGeneratorGeneration:
             prompt_count=2
         )
 
-        assert len(prompts) == 2
-        assert prompts[0] == "Prompt 1"
-        assert prompts[1] == "Prompt 2"
+        assert prompts == ["Prompt 1", "Prompt 2"]
 
-    def test_generate_prompts_episodes_key(self, generator):
-        """Test prompt generation with 'episodes' key in response"""
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message.content = json.dumps({
-            "episodes": [
-                "Episode A",
-                "Episode B",
-                "Episode C"
-            ]
-        })
-        generator.client.chat.completions.create = Mock(return_value=mock_response)
-
-        prompts = generator.generate_prompts("sys", "user", 3)
-
-        assert len(prompts) == 3
-        assert "Episode A" in prompts
-
-    def test_generate_prompts_pads_if_fewer_returned(self, generator):
-        """Test that prompts are padded if fewer than requested are returned"""
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message.content = json.dumps([
-            "Prompt 1",
-            "Prompt 2"
-        ])
-        generator.client.chat.completions.create = Mock(return_value=mock_response)
-
-        prompts = generator.generate_prompts("sys", "user", 4)
-
-        assert len(prompts) == 4
-        # Should pad with last prompt
-        assert prompts[2] == "Prompt 2"
-        assert prompts[3] == "Prompt 2"
-
-    def test_generate_prompts_truncates_if_more_returned(self, generator):
-        """Test that prompts are truncated if more than requested are returned"""
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message.content = json.dumps([
-            "P1", "P2", "P3", "P4", "P5"
-        ])
-        generator.client.chat.completions.create = Mock(return_value=mock_response)
-
-        prompts = generator.generate_prompts("sys", "user", 3)
-
-        assert len(prompts) == 3
-        assert prompts == ["P1", "P2", "P3"]
-
-    def test_generate_prompts_custom_temperature(self, generator):
-        """Test that custom temperature is passed to API"""
+    @pytest.mark.parametrize("overrides,expected", [
+        ({"temperature": 0.9}, {"temperature": 0.9, "max_tokens": 2000}),
+        ({"max_tokens": 500}, {"temperature": 0.7, "max_tokens": 500}),
+        ({}, {"temperature": 0.7, "max_tokens": 2000}),
+    ], ids=["temperature", "max_tokens", "defaults"])
+    def test_generate_prompts_request_params(self, generator, overrides, expected):
+        """Test that overrides, or else the defaults, are passed to the API"""
         mock_response = Mock()
         mock_response.choices = [Mock()]
         mock_response.choices[0].message.content = json.dumps(["Prompt"])
         mock_create = Mock(return_value=mock_response)
         generator.client.chat.completions.create = mock_create
 
-        generator.generate_prompts("sys", "user", 1, temperature=0.9)
+        generator.generate_prompts("sys", "user", 1, **overrides)
 
-        # Check that temperature was passed
         call_args = mock_create.call_args
-        assert call_args[1]['temperature'] == 0.9
-
-    def test_generate_prompts_custom_max_tokens(self, generator):
-        """Test that custom max_tokens is passed to API"""
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message.content = json.dumps(["Prompt"])
-        mock_create = Mock(return_value=mock_response)
-        generator.client.chat.completions.create = mock_create
-
-        generator.generate_prompts("sys", "user", 1, max_tokens=500)
-
-        # Check that max_tokens was passed
-        call_args = mock_create.call_args
-        assert call_args[1]['max_tokens'] == 500
+        for name, value in expected.items():
+            assert call_args[1][name] == value
 
     def test_generate_prompts_api_error(self, generator):
         """Test handling of OpenAI API errors"""
@@ -212,36 +133,52 @@ class TestPromptGeneratorGeneration:
         with pytest.raises(Exception):
             generator.generate_prompts("sys", "user", 2)
 
-    def test_generate_prompts_invalid_json(self, generator):
-        """Test handling of invalid JSON response"""
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message.content = "Not valid JSON!"
-        generator.client.chat.completions.create = Mock(return_value=mock_response)
-
-        with pytest.raises(ValueError, match="Invalid JSON response"):
-            generator.generate_prompts("sys", "user", 2)
-
-    def test_generate_prompts_unexpected_format(self, generator):
-        """Test handling of unexpected response format"""
+    def test_generate_prompts_requests_structured_output(self, generator):
+        """Test that the prompt list schema is sent as the response format"""
         mock_response = Mock()
         mock_response.choices = [Mock()]
-        mock_response.choices[0].message.content = json.dumps({
-            "unexpected_key": "value"
-        })
-        generator.client.chat.completions.create = Mock(return_value=mock_response)
+        mock_response.choices[0].message.content = json.dumps({"prompts": ["Prompt"]})
+        mock_create = Mock(return_value=mock_response)
+        generator.client.chat.completions.create = mock_create
 
-        with pytest.raises(ValueError, match="No valid prompts generated"):
-            generator.generate_prompts("sys", "user", 2)
+        generator.generate_prompts("sys", "user", 1)
+
+        response_format = mock_create.call_args[1]['response_format']
+        assert response_format['type'] == "json_schema"
+
+
+class TestParseResponse:
+    """Test response parsing directly on message content"""
+
+    @pytest.mark.parametrize("content,prompt_count,expected", [
+        ('["Episode 1", "Episode 2", "Episode 3"]', 3, ["Episode 1", "Episode 2", "Episode 3"]),
+        ('{"prompts": ["Prompt 1", "Prompt 2"]}', 2, ["Prompt 1", "Prompt 2"]),
+        ('{"episodes": ["Episode A", "Episode B", "Episode C"]}', 3, ["Episode A", "Episode B", "Episode C"]),
+        ('{"scenes": ["Scene"], "note": "x"}', 1, ["Scene"]),
+        ('["Prompt 1", "Prompt 2"]', 4, ["Prompt 1", "Prompt 2", "Prompt 2", "Prompt 2"]),
+        ('["P1", "P2", "P3", "P4", "P5"]', 3, ["P1", "P2", "P3"]),
+        ('  [" Padded "]  ', 1, ["Padded"]),
+    ], ids=["list", "dict", "episodes_key", "any_list_value", "pads", "truncates", "strips"])
+    def test_valid_content(self, content, prompt_count, expected):
+        """Test each accepted response shape and the count adjustment"""
+        assert PromptGenerator._parse_response(content, prompt_count) == expected
+
+    @pytest.mark.parametrize("content,match", [
+        ("Not valid JSON!", "Invalid JSON response"),
+        ('{"unexpected_key": "value"}', "No valid prompts generated"),
+        ('[]', "No valid prompts generated"),
+        ('"just a string"', "Unexpected response format"),
+        ('{"prompts": ["Prompt 1", {"scene": "Prompt 2"}]}', "must all be strings"),
+    ], ids=["invalid_json", "no_list", "empty_list", "scalar", "non_string_items"])
+    def test_invalid_content(self, content, match):
+        """Test that unusable responses raise ValueError"""
+        with pytest.raises(ValueError, match=match):
+            PromptGenerator._parse_response(content, 2)
 
 
 class TestGenerateEpisodePrompts:
     """Test generate_episode_prompts convenience method"""
 
-    @pytest.fixture
-    def generator(self):
-        return PromptGenerator(api_key="test-key")
-
     def test_generate_episode_prompts_success(self, generator):
         """Test successful episode prompt generation"""
         mock_response = Mock()
@@ -281,6 +218,184 @@ class TestGenerateEpisodePrompts:
         assert call_args[1]['temperature'] == 0.3
 
 
+class TestPromptCache:
+    """Test the exact-match prompt cache"""
+
+    @pytest.fixture
+    def generator(self):
+        return PromptGenerator(api_key="test-key")
+
+    def _mock_response(self, prompts):
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message.content = json.dumps(prompts)
+        return mock_response
+
+    def test_repeated_request_uses_cache(self, generator):
+        """Test that an identical request does not call the API again"""
+        mock_create = Mock(return_value=self._mock_response(["P1", "P2"]))
+        generator.client.chat.completions.create = mock_create
+
+        first = generator.generate_prompts("sys", "user", 2)
+        second = generator.generate_prompts("sys", "user", 2)
+
+        assert first == second == ["P1", "P2"]
+        assert mock_create.call_count == 1
+
+    def test_different_temperature_misses_cache(self, generator):
+        """Test that changing any request input bypasses the cache"""
+        mock_create = Mock(return_value=self._mock_response(["P1"]))
+        generator.client.chat.completions.create = mock_create
+
+        generator.generate_prompts("sys", "user", 1, temperature=0.2)
+        generator.generate_prompts("sys", "user", 1, temperature=0.9)
+
+        assert mock_create.call_count == 2
+
+    def test_cache_disabled(self):
+        """Test that cache_size=0 always calls the API"""
+        generator = PromptGenerator(api_key="test-key", cache_size=0)
+        mock_create = Mock(return_value=self._mock_response(["P1"]))
+        generator.client.chat.completions.create = mock_create
+
+        generator.generate_prompts("sys", "user", 1)
+        generator.generate_prompts("sys", "user", 1)
+
+        assert mock_create.call_count == 2
+
+
+class TestIterPrompts:
+    """Test streaming prompt generation"""
+
+    @pytest.fixture
+    def generator(self):
+        return PromptGenerator(api_key="test-key")
+
+    def _mock_stream(self, text, piece_size=3):
+        chunks = []
+        for i in range(0, len(text), piece_size):
+            chunk = Mock()
+            chunk.choices = [Mock()]
+            chunk.choices[0].delta.content = text[i:i + piece_size]
+            chunks.append(chunk)
+        return iter(chunks)
+
+    def test_yields_prompts_from_split_chunks(self, generator):
+        """Test that prompts split across chunks are reassembled in order"""
+        content = json.dumps({"prompts": ["Scene \"one\"", "Scene two", "Scene three"]})
+        mock_create = Mock(return_value=self._mock_stream(content))
+        generator.client.chat.completions.create = mock_create
+
+        prompts = list(generator.iter_prompts("sys", "user", 3))
+
+        assert prompts == ['Scene "one"', "Scene two", "Scene three"]
+        assert mock_create.call_args[1]['stream'] is True
+
+    def test_first_prompt_available_before_stream_ends(self, generator):
+        """Test that the first prompt is yielded before later chunks are consumed"""
+        content = json.dumps(["First", "Second"])
+        stream = self._mock_stream(content, piece_size=1)
+        generator.client.chat.completions.create = Mock(return_value=stream)
+
+        prompts = generator.iter_prompts("sys", "user", 2)
+
+        assert next(prompts) == "First"
+        assert len(list(stream)) > 0  # rest of the stream not read yet
+
+    def test_pads_and_caches(self, generator):
+        """Test padding to prompt_count and reuse of the result from cache"""
+        mock_create = Mock(return_value=self._mock_stream(json.dumps(["Only"])))
+        generator.client.chat.completions.create = mock_create
+
+        assert list(generator.iter_prompts("sys", "user", 3)) == ["Only", "Only", "Only"]
+        assert generator.generate_prompts("sys", "user", 3) == ["Only", "Only", "Only"]
+        assert mock_create.call_count == 1
+
+    def test_no_prompts_raises(self, generator):
+        """Test that a response without prompts raises ValueError"""
+        generator.client.chat.completions.create = Mock(return_value=self._mock_stream("[]"))
+
+        with pytest.raises(ValueError, match="No valid prompts generated"):
+            list(generator.iter_prompts("sys", "user", 2))
+
+
+class TestGeneratePromptsMany:
+    """Test concurrent generation of several prompt batches"""
+
+    def test_results_in_spec_order(self):
+        """Test that each spec gets its own prompts, in order"""
+        generator = PromptGenerator(api_key="test-key")
+
+        async def fake_create(**kwargs):
+            user_message = kwargs['messages'][1]['content']
+            mock_response = Mock()
+            mock_response.choices = [Mock()]
+            mock_response.choices[0].message.content = json.dumps([user_message.split('\n')[0]])
+            return mock_response
+
+        generator.async_client.chat.completions.create = AsyncMock(side_effect=fake_create)
+
+        results = generator.generate_prompts_many([
+            {"system_prompt": "sys", "user_prompt": "first", "prompt_count": 1},
+            {"system_prompt": "sys", "user_prompt": "second", "prompt_count": 1},
+        ])
+
+        assert results == [["first"], ["second"]]
+        assert generator.async_client.chat.completions.create.call_count == 2
+
+    def test_repeated_calls_share_one_loop(self):
+        """Test that later calls run on the same event loop as the first"""
+        generator = PromptGenerator(api_key="test-key")
+        loops = []
+
+        async def fake_create(**kwargs):
+            loops.append(asyncio.get_running_loop())
+            mock_response = Mock()
+            mock_response.choices = [Mock()]
+            mock_response.choices[0].message.content = json.dumps(["prompt"])
+            return mock_response
+
+        generator.async_client.chat.completions.create = AsyncMock(side_effect=fake_create)
+
+        for user_prompt in ("first", "second"):
+            generator.generate_prompts_many([
+                {"system_prompt": "sys", "user_prompt": user_prompt, "prompt_count": 1}
+            ])
+
+        assert len(loops) == 2
+        assert loops[0] is loops[1]
+
+    def test_async_calls_from_other_loops_use_generator_loop(self):
+        """Test that awaiting from a caller's own loop still calls the API on the generator's loop"""
+        generator = PromptGenerator(api_key="test-key", cache_size=0)
+        loops = []
+
+        async def fake_create(**kwargs):
+            loops.append(asyncio.get_running_loop())
+            mock_response = Mock()
+            mock_response.choices = [Mock()]
+            mock_response.choices[0].message.content = json.dumps(["prompt"])
+            return mock_response
+
+        generator.async_client.chat.completions.create = AsyncMock(side_effect=fake_create)
+
+        async def caller():
+            return await asyncio.gather(*(
+                generator.generate_prompts_async("sys", user_prompt, 1)
+                for user_prompt in ("first", "second")
+            ))
+
+        # Each asyncio.run is a new loop, as in separate request handlers
+        assert asyncio.run(caller()) == [["prompt"], ["prompt"]]
+        assert asyncio.run(caller()) == [["prompt"], ["prompt"]]
+        generator.generate_prompts_many([
+            {"system_prompt": "sys", "user_prompt": "third", "prompt_count": 1}
+        ])
+
+        assert len(loops) == 5
+        assert all(loop is generator._event_loop() for loop in loops)
+
+
 class TestFactoryFunction:
     """Test create_prompt_generator factory function"""
 
@@ -0,0 +1,238 @@
+"""
+Flask test-client tests for the job endpoints
+
+No provider is called: generation jobs run a stand-in for
+_generate_video_async, and other jobs are registered directly.
+"""
+
+import threading
+import time
+import uuid
+
+import orjson
+import pytest
+
+import video_service
+from media_manager import MediaManager
+from video_service import VideoGenerationJob
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    mm = MediaManager(db_path=str(tmp_path / 'media.db'), video_dir=str(tmp_path / 'videos'))
+    monkeypatch.setattr(video_service, 'media_manager', mm)
+    monkeypatch.setattr(video_service, 'jobs', {})
+    monkeypatch.setattr(video_service, '_list_jobs_cache', (None, None, None))
+    yield video_service.app.test_client()
+    mm.close()
+
+
+def make_job(prompt='A serene mountain landscape'):
+    """Register a pending job as generate_video would"""
+    job = VideoGenerationJob(str(uuid.uuid4()), prompt, 'google', {})
+    video_service._register_job(job)
+    return job
+
+
+class TestJobEvents:
+    """GET /api/videos/<job_id>/events streams one SSE frame per update"""
+
+    @staticmethod
+    def frames(client, job):
+        response = client.get(f'/api/videos/{job.job_id}/events', buffered=False)
+        assert response.mimetype == 'text/event-stream'
+        return iter(response.response)
+
+    @staticmethod
+    def data(frame):
+        assert frame.startswith(b'data: ') and frame.endswith(b'\n\n')
+        return orjson.loads(frame[len(b'data: '):])
+
+    def test_streams_updates_until_finished(self, client):
+        job = make_job()
+        frames = self.frames(client, job)
+
+        assert self.data(next(frames))['status'] == 'pending'
+        job.update(status='processing', progress=50)
+        assert self.data(next(frames))['progress'] == 50
+        job.update(status='completed', progress=100)
+        assert self.data(next(frames))['status'] == 'completed'
+        assert next(frames, None) is None
+
+    def test_finished_job_sends_one_frame(self, client):
+        job = make_job()
+        job.update(status='failed', error='boom')
+
+        frames = list(self.frames(client, job))
+
+        assert [self.data(frame)['error'] for frame in frames] == ['boom']
+
+    def test_keepalive_then_end_when_deleted(self, client, monkeypatch):
+        monkeypatch.setattr(video_service, 'SSE_KEEPALIVE_SECONDS', 0.01)
+        job = make_job()
+        frames = self.frames(client, job)
+        next(frames)
+
+        assert next(frames) == b': keepalive\n\n'
+        client.delete(f'/api/videos/{job.job_id}')
+        assert next(frames, None) is None
+
+    def test_unknown_job(self, client):
+        assert client.get(f'/api/videos/{uuid.uuid4()}/events').status_code == 404
+
+
+class TestJobStatus:
+    """GET /api/videos/<job_id>/status answers 304 while the ETag still matches"""
+
+    def test_not_modified_until_updated(self, client):
+        job = make_job()
+        url = f'/api/videos/{job.job_id}/status'
+
+        first = client.get(url)
+        etag = first.headers['ETag']
+        assert first.status_code == 200
+        assert first.json['status'] == 'pending'
+        assert first.headers['Cache-Control'] == 'no-cache'
+
+        unchanged = client.get(url, headers={'If-None-Match': etag})
+        assert unchanged.status_code == 304
+        assert unchanged.data == b''
+        assert unchanged.headers['ETag'] == etag
+
+        job.update(progress=50)
+        changed = client.get(url, headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.json['progress'] == 50
+        assert changed.headers['ETag'] != etag
+
+    def test_job_known_only_to_the_database(self, client):
+        job = make_job()
+        video_service.jobs.clear()
+
+        response = client.get(f'/api/videos/{job.job_id}/status')
+
+        assert response.status_code == 200
+        assert response.json['id'] == job.job_id
+
+    def test_unknown_job(self, client):
+        assert client.get(f'/api/videos/{uuid.uuid4()}/status').status_code == 404
+
+
+class TestGenerationCoalescing:
+    """Identical generation requests join the job already in flight"""
+
+    @pytest.fixture
+    def release(self, monkeypatch):
+        """Generations run until this event is set (at teardown at the latest)"""
+        release = threading.Event()
+
+        def fake_generate(job_id):
+            release.wait(5)
+            job = video_service.jobs.get(job_id)
+            if job:
+                job.update(status='completed', progress=100)
+
+        monkeypatch.setattr(video_service, '_generate_video_async', fake_generate)
+        monkeypatch.setattr(video_service, '_inflight_generations', {})
+        yield release
+        release.set()
+
+    @staticmethod
+    def generate(client, prompt='A cat', settings=None):
+        return client.post('/api/videos/generate', json={
+            'prompt': prompt, 'provider': 'google', 'settings': settings or {'model': 'veo', 'aspect_ratio': '9:16'}
+        })
+
+    @staticmethod
+    def wait_until_released(job_id):
+        video_service.jobs[job_id].future.result(timeout=5)
+        # Done callbacks run on the worker just after the result is set
+        for _ in range(500):
+            if not video_service._inflight_generations:
+                return
+            time.sleep(0.01)
+
+    def test_identical_request_joins_job(self, client, release):
+        first = self.generate(client)
+        # Same settings in another key order
+        second = self.generate(client, settings={'aspect_ratio': '9:16', 'model': 'veo'})
+
+        assert first.status_code == second.status_code == 202
+        assert second.json['job_id'] == first.json['job_id']
+        assert len(video_service.jobs) == 1
+        assert len(video_service._inflight_generations) == 1
+
+    def test_different_request_gets_own_job(self, client, release):
+        first = self.generate(client)
+        other_prompt = self.generate(client, prompt='A dog')
+        other_settings = self.generate(client, settings={'model': 'veo', 'aspect_ratio': '16:9'})
+
+        ids = {r.json['job_id'] for r in (first, other_prompt, other_settings)}
+        assert len(ids) == 3
+
+    def test_finished_job_releases_key(self, client, release):
+        first = self.generate(client).json['job_id']
+
+        release.set()
+        self.wait_until_released(first)
+
+        assert video_service._inflight_generations == {}
+        assert self.generate(client).json['job_id'] != first
+
+    def test_joined_response_is_marked(self, client, release):
+        first = self.generate(client)
+        second = self.generate(client)
+
+        assert 'coalesced' not in first.json
+        assert second.json['coalesced'] is True
+        assert second.json['status'] in ('pending', 'processing')
+
+    def test_deleted_job_is_not_joined(self, client, release):
+        first = self.generate(client).json['job_id']
+        client.delete(f'/api/videos/{first}')
+
+        assert self.generate(client).json['job_id'] != first
+
+
+class TestListJobs:
+    """GET /api/videos/list returns jobs newest first, optionally one page"""
+
+    @pytest.fixture
+    def job_ids(self, client):
+        # Newest first, as the list returns them
+        return [make_job(f'prompt {idx}').job_id for idx in range(5)][::-1]
+
+    @staticmethod
+    def ids(response):
+        return [job['id'] for job in response.json['jobs']]
+
+    def test_newest_first(self, client, job_ids):
+        response = client.get('/api/videos/list')
+
+        assert self.ids(response) == job_ids
+        assert response.json['total'] == 5
+
+    @pytest.mark.parametrize("query,start,end", [
+        ('limit=2', 0, 2),
+        ('limit=2&offset=2', 2, 4),
+        ('offset=3', 3, None),
+        ('limit=10&offset=4', 4, None),
+        ('limit=0', 0, 0),
+        ('offset=-3&limit=1', 0, 1),
+    ])
+    def test_pages(self, client, job_ids, query, start, end):
+        response = client.get(f'/api/videos/list?{query}')
+
+        assert self.ids(response) == job_ids[start:end]
+        assert response.json['total'] == 5
+
+    def test_cached_body_follows_changes(self, client, job_ids):
+        assert self.ids(client.get('/api/videos/list')) == job_ids
+
+        newest = make_job('newest')
+        video_service.jobs[job_ids[0]].update(status='failed')
+        client.delete(f'/api/videos/{job_ids[-1]}')
+
+        response = client.get('/api/videos/list')
+        assert self.ids(response) == [newest.job_id] + job_ids[:-1]
+        assert response.json['jobs'][1]['status'] == 'failed'
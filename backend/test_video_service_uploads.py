@@ -0,0 +1,209 @@
+"""
+Flask test-client tests for the resumable upload endpoints
+
+Uploads never reach a provider, so conftest.py's stand-in for the
+ai-short-drama video_generator module is enough to import video_service.
+Uploads land in tmp_path and are recorded in a MediaManager of their own.
+"""
+
+import hashlib
+import os
+import time
+
+import pytest
+
+import video_service
+from media_manager import MediaManager
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    mm = MediaManager(db_path=str(tmp_path / 'media.db'), video_dir=str(tmp_path / 'videos'))
+    monkeypatch.setattr(video_service, 'VIDEO_DIR', tmp_path / 'videos')
+    monkeypatch.setattr(video_service, 'media_manager', mm)
+    monkeypatch.setattr(video_service, 'metadata_extractor', video_service.VideoMetadataExtractor(cache=mm))
+    monkeypatch.setattr(video_service, 'jobs', {})
+    monkeypatch.setattr(video_service, 'upload_sessions', {})
+    # Small blocks so even these test files are read and written in pieces
+    monkeypatch.setattr(video_service, 'UPLOAD_CHUNK_SIZE', 7)
+    yield video_service.app.test_client()
+    mm.close()
+
+
+DATA = os.urandom(40)
+
+
+def init(client, size=len(DATA), filename='clip.mp4'):
+    response = client.post('/api/videos/upload/init', json={'filename': filename, 'size': size})
+    assert response.status_code == 201
+    return response.json['upload_id']
+
+
+def put(client, upload_id, start, end, data=DATA, size=len(DATA)):
+    """PUT data[start:end] (end exclusive) with the matching Content-Range"""
+    return client.put(
+        f'/api/videos/upload/{upload_id}',
+        data=data[start:end],
+        headers={'Content-Range': f'bytes {start}-{end - 1}/{size}'}
+    )
+
+
+class TestInit:
+    def test_starts_at_offset_zero(self, client):
+        response = client.post('/api/videos/upload/init', json={'size': len(DATA)})
+
+        assert response.status_code == 201
+        assert response.json['offset'] == 0
+        assert response.headers['Upload-Offset'] == '0'
+
+    @pytest.mark.parametrize("size", [None, 0, -1, "40"])
+    def test_rejects_bad_size(self, client, size):
+        assert client.post('/api/videos/upload/init', json={'size': size}).status_code == 400
+
+    def test_rejects_too_large(self, client):
+        size = video_service.app.config['MAX_CONTENT_LENGTH'] + 1
+        assert client.post('/api/videos/upload/init', json={'size': size}).status_code == 413
+
+
+class TestPutChunk:
+    def test_resume_offset(self, client):
+        upload_id = init(client)
+
+        response = put(client, upload_id, 0, 15)
+        assert response.json['offset'] == 15
+        assert client.head(f'/api/videos/upload/{upload_id}').headers['Upload-Offset'] == '15'
+
+        # A later chunk does not move the offset until the gap is filled
+        assert put(client, upload_id, 25, 40).json['offset'] == 15
+        assert put(client, upload_id, 15, 25).json['offset'] == 40
+
+    @pytest.mark.parametrize("content_range", [
+        None,
+        'bytes 10-5/40',     # end before start
+        'bytes 30-45/40',    # past the end of the file
+        'items 0-9/40',
+        'bytes 0-9/*',
+    ])
+    def test_bad_content_range(self, client, content_range):
+        upload_id = init(client)
+        headers = {'Content-Range': content_range} if content_range else {}
+
+        response = client.put(f'/api/videos/upload/{upload_id}', data=DATA[:10], headers=headers)
+
+        assert response.status_code == 416
+
+    def test_size_mismatch(self, client):
+        upload_id = init(client)
+
+        response = put(client, upload_id, 0, 10, size=len(DATA) + 1)
+
+        assert response.status_code == 416
+        assert client.get(f'/api/videos/upload/{upload_id}').json['offset'] == 0
+
+    def test_short_body_keeps_what_arrived(self, client):
+        upload_id = init(client)
+
+        response = client.put(
+            f'/api/videos/upload/{upload_id}',
+            data=DATA[:12],
+            headers={'Content-Range': f'bytes 0-19/{len(DATA)}'}
+        )
+
+        assert response.json['offset'] == 12
+
+    def test_unknown_upload(self, client):
+        assert put(client, '00000000-0000-4000-8000-000000000000', 0, 10).status_code == 404
+
+
+class TestComplete:
+    def test_out_of_order_chunks(self, client, tmp_path):
+        upload_id = init(client)
+        for start, end in [(30, 40), (0, 10), (20, 30), (10, 20)]:
+            assert put(client, upload_id, start, end).status_code == 200
+
+        response = client.post(f'/api/videos/upload/{upload_id}/complete')
+
+        assert response.status_code == 200
+        assert response.json['job_id'] == upload_id
+        assert not response.json['is_duplicate']
+        stored = tmp_path / 'videos' / f'{upload_id}.mp4'
+        assert stored.read_bytes() == DATA
+        video = video_service.media_manager.get_video(upload_id)
+        assert video['file_hash'] == hashlib.sha256(DATA).hexdigest()
+        assert not video_service._upload_part_path(upload_id).exists()
+
+    def test_incomplete_upload_is_409(self, client):
+        upload_id = init(client)
+        put(client, upload_id, 0, 30)
+
+        response = client.post(f'/api/videos/upload/{upload_id}/complete')
+
+        assert response.status_code == 409
+        assert response.headers['Upload-Offset'] == '30'
+
+    def test_waits_for_writes_in_flight(self, client):
+        upload_id = init(client)
+        put(client, upload_id, 0, len(DATA))
+        video_service.upload_sessions[upload_id].writers = 1
+
+        assert client.post(f'/api/videos/upload/{upload_id}/complete').status_code == 409
+
+        video_service.upload_sessions[upload_id].writers = 0
+        assert client.post(f'/api/videos/upload/{upload_id}/complete').status_code == 200
+
+    def test_second_complete_is_404(self, client):
+        upload_id = init(client)
+        put(client, upload_id, 0, len(DATA))
+
+        assert client.post(f'/api/videos/upload/{upload_id}/complete').status_code == 200
+        assert client.post(f'/api/videos/upload/{upload_id}/complete').status_code == 404
+        assert put(client, upload_id, 0, 10).status_code == 404
+
+    def test_duplicate_content(self, client, tmp_path):
+        first = init(client)
+        put(client, first, 0, len(DATA))
+        client.post(f'/api/videos/upload/{first}/complete')
+
+        second = init(client)
+        put(client, second, 0, len(DATA))
+        response = client.post(f'/api/videos/upload/{second}/complete')
+
+        assert response.status_code == 200
+        assert response.json['is_duplicate']
+        assert response.json['job_id'] == first
+        assert not (tmp_path / 'videos' / f'{second}.mp4').exists()
+        assert not video_service._upload_part_path(second).exists()
+
+
+class TestExpiry:
+    @staticmethod
+    def make_stale(upload_id):
+        """Pretend the upload's last write is older than the TTL"""
+        video_service.upload_sessions[upload_id].updated_at = (
+            time.monotonic() - video_service.UPLOAD_SESSION_TTL_SECONDS - 1
+        )
+
+    @pytest.mark.parametrize("sweep", [
+        lambda client, other: put(client, other, 0, 10),
+        lambda client, other: client.post(f'/api/videos/upload/{other}/complete'),
+    ], ids=['put', 'complete'])
+    def test_swept_by_other_requests(self, client, sweep):
+        # Both started first: init sweeps too, and must not be what drops it
+        stale, other = init(client), init(client)
+        put(client, stale, 0, 10)
+        self.make_stale(stale)
+
+        sweep(client, other)
+
+        assert stale not in video_service.upload_sessions
+        assert not video_service._upload_part_path(stale).exists()
+        assert put(client, stale, 10, 20).status_code == 404
+
+    def test_writes_in_flight_are_kept(self, client):
+        upload_id = init(client)
+        self.make_stale(upload_id)
+        video_service.upload_sessions[upload_id].writers = 1
+
+        video_service._expire_upload_sessions()
+
+        assert upload_id in video_service.upload_sessions
@@ -0,0 +1,328 @@
+"""
+Unit tests for VideoStitcher
+
+ffmpeg is never run: run_ffmpeg and ffprobe are replaced with fakes that
+record the command lines, so these run without the ffmpeg binary.
+"""
+
+import sys
+from fractions import Fraction
+
+import pytest
+
+import video_stitcher
+from video_stitcher import VideoStitcher, frame_rate, parse_bitrate, run_ffmpeg
+
+
+def make_probe(codec="h264", width=1280, height=720, pix_fmt="yuv420p", audio="aac"):
+    """ffprobe output for one input with a video and (optionally) an audio stream"""
+    streams = [{
+        'codec_type': 'video', 'codec_name': codec, 'width': width, 'height': height,
+        'r_frame_rate': '30/1', 'pix_fmt': pix_fmt, 'sample_aspect_ratio': '1:1'
+    }]
+    if audio:
+        streams.append({
+            'codec_type': 'audio', 'codec_name': audio,
+            'sample_rate': '48000', 'channel_layout': 'stereo'
+        })
+    return {'format': {'duration': '2.0', 'size': '1000'}, 'streams': streams}
+
+
+@pytest.fixture
+def ffmpeg_calls(monkeypatch):
+    """Command lines passed to run_ffmpeg; each run creates its output files"""
+    calls = []
+
+    def fake_run(stream, **kwargs):
+        args = stream.compile()
+        calls.append(args)
+        # Inputs are empty files too, so touching them changes nothing
+        for arg in args:
+            if arg.endswith(('.mp4', '.nut')):
+                open(arg, 'wb').close()
+
+    monkeypatch.setattr(video_stitcher, 'run_ffmpeg', fake_run)
+    monkeypatch.setattr(video_stitcher, 'detect_hw_encoder', lambda: None)
+    return calls
+
+
+@pytest.fixture
+def stitcher(tmp_path):
+    return VideoStitcher(output_dir=str(tmp_path / "out"), temp_dir=str(tmp_path))
+
+
+def make_inputs(tmp_path, stitcher, probes):
+    """Input files in tmp_path whose probes (and the output's) are probes"""
+    paths = []
+    for idx, _ in enumerate(probes):
+        path = tmp_path / f"in{idx}.mp4"
+        path.write_bytes(b"")
+        paths.append(str(path))
+    by_path = dict(zip(paths, probes))
+    stitcher._probe = lambda path: by_path.get(path, probes[0])
+    return paths
+
+
+class TestCopyDecision:
+    """When stitch_videos copies streams instead of re-encoding"""
+
+    def test_matching_inputs_are_copied(self, tmp_path, stitcher, ffmpeg_calls):
+        inputs = make_inputs(tmp_path, stitcher, [make_probe(), make_probe()])
+        result = stitcher.stitch_videos(inputs)
+        assert result['copy_mode'] is True
+        assert len(ffmpeg_calls) == 1
+        assert '-c' in ffmpeg_calls[0] and 'copy' in ffmpeg_calls[0]
+
+    def test_other_codec_is_reencoded(self, tmp_path, stitcher, ffmpeg_calls):
+        inputs = make_inputs(tmp_path, stitcher, [make_probe("hevc"), make_probe("hevc")])
+        result = stitcher.stitch_videos(inputs, normalize=False)
+        assert result['copy_mode'] is False
+        assert 'libx264' in ffmpeg_calls[0]
+
+    def test_requested_quality_is_reencoded(self, tmp_path, stitcher, ffmpeg_calls):
+        inputs = make_inputs(tmp_path, stitcher, [make_probe(), make_probe()])
+        result = stitcher.stitch_videos(inputs, normalize=False, quality=20)
+        assert result['copy_mode'] is False
+        assert '20' in ffmpeg_calls[0]
+
+    def test_failed_copy_falls_back_to_reencode(self, tmp_path, stitcher, ffmpeg_calls, monkeypatch):
+        inputs = make_inputs(tmp_path, stitcher, [make_probe(), make_probe()])
+        recorder = video_stitcher.run_ffmpeg
+
+        def copy_fails(stream, stdin_data=None, **kwargs):
+            # The concat of the inputs fails; the one of the segments does not
+            if 'copy' in stream.compile() and b'.nut' not in stdin_data:
+                raise video_stitcher.ffmpeg.Error('ffmpeg', b'', b'copy failed')
+            recorder(stream, stdin_data=stdin_data, **kwargs)
+
+        monkeypatch.setattr(video_stitcher, 'run_ffmpeg', copy_fails)
+        result = stitcher.stitch_videos(inputs)
+        assert result['copy_mode'] is False
+        # One segment encode per input, then the segment concat
+        assert len(ffmpeg_calls) == 3
+
+    @pytest.mark.parametrize("video_codec,audio_codec", [
+        ("libx264", "aac"), ("libx264", "libopus"), ("libx264", "libmp3lame"), ("libvpx-vp9", "libopus"),
+    ])
+    def test_normalized_concat_works_for_any_codec(
+        self, tmp_path, stitcher, ffmpeg_calls, video_codec, audio_codec
+    ):
+        inputs = make_inputs(tmp_path, stitcher, [make_probe(), make_probe(width=640)])
+        result = stitcher.stitch_videos(inputs, video_codec=video_codec, audio_codec=audio_codec)
+        assert result['copy_mode'] is False
+
+        *encodes, concat = ffmpeg_calls
+        for args in encodes:
+            assert args[args.index('-f') + 1] == 'nut'
+            assert args[args.index('-acodec') + 1] == audio_codec
+        # Segments are joined as they are: no AAC-only bitstream filter
+        assert 'copy' in concat
+        assert not any('bsf' in arg or 'aac_adtstoasc' in arg for arg in concat)
+
+    def test_copy_mode_true_rejects_mismatched_inputs(self, tmp_path, stitcher, ffmpeg_calls):
+        inputs = make_inputs(tmp_path, stitcher, [make_probe(), make_probe(width=640)])
+        with pytest.raises(ValueError, match="in1.mp4"):
+            stitcher.stitch_videos(inputs, normalize=False, copy_mode=True)
+        assert ffmpeg_calls == []
+
+    def test_copy_mode_false_reencodes_mismatched_inputs(self, tmp_path, stitcher, ffmpeg_calls):
+        inputs = make_inputs(tmp_path, stitcher, [make_probe(), make_probe(width=640)])
+        result = stitcher.stitch_videos(inputs, normalize=False, copy_mode=False)
+        assert result['copy_mode'] is False
+        assert len(ffmpeg_calls) == 1
+        assert 'libx264' in ffmpeg_calls[0]
+
+
+class FakeStream:
+    """Stands in for an ffmpeg-python stream: 'ffmpeg' is a Python one-liner"""
+
+    def __init__(self, script):
+        self.args = [sys.executable, '-c', script]
+
+    def global_args(self, *args):
+        # Passed on as the script's argv, which it ignores
+        self.args = self.args + list(args)
+        return self
+
+    def compile(self):
+        return self.args
+
+
+class TestRunFfmpeg:
+    """run_ffmpeg against fake processes"""
+
+    def test_reports_progress(self):
+        script = (
+            "import sys, time\n"
+            "e = sys.stderr.buffer\n"
+            "e.write(b'out_time_us=N/A\\nprogress=continue\\nout_time_us=1500000\\n'); e.flush()\n"
+            "time.sleep(0.05)\n"
+            "e.write(b'out_ti'); e.flush()\n"
+            "time.sleep(0.05)\n"
+            "e.write(b'me_us=3000000\\nprogress=end\\n')\n"
+        )
+        seen = []
+        run_ffmpeg(FakeStream(script), on_progress=seen.append)
+        assert seen == [1.5, 3.0]
+
+    def test_progress_callback_errors_do_not_stop_the_run(self):
+        script = "import sys; sys.stderr.write('out_time_us=1000000\\n' * 1000)"
+
+        def broken(seconds):
+            raise ZeroDivisionError
+
+        run_ffmpeg(FakeStream(script), on_progress=broken)
+
+    def test_passes_stdin_data(self):
+        script = "import sys; sys.exit(0 if sys.stdin.buffer.read() == b'list' else 1)"
+        run_ffmpeg(FakeStream(script), stdin_data=b'list')
+
+    def test_error_carries_stderr_tail(self):
+        script = "import sys; sys.stderr.write('bad input\\n'); sys.exit(1)"
+        with pytest.raises(video_stitcher.ffmpeg.Error) as excinfo:
+            run_ffmpeg(FakeStream(script))
+        assert excinfo.value.stderr == b'bad input\n'
+
+    def test_stderr_tail_is_bounded(self):
+        limit = video_stitcher.STDERR_CHUNK_SIZE * video_stitcher.STDERR_TAIL_CHUNKS
+        script = (
+            "import sys\n"
+            f"sys.stderr.write('x' * {limit * 4})\n"
+            "sys.stderr.write('last words')\n"
+            "sys.exit(1)\n"
+        )
+        with pytest.raises(video_stitcher.ffmpeg.Error) as excinfo:
+            run_ffmpeg(FakeStream(script))
+        assert len(excinfo.value.stderr) <= limit
+        assert excinfo.value.stderr.endswith(b'last words')
+
+    def test_stitch_error_survives_a_split_character(self, tmp_path, stitcher, monkeypatch):
+        # Over a tail's worth of 3-byte characters: the kept tail starts mid-character
+        limit = video_stitcher.STDERR_CHUNK_SIZE * video_stitcher.STDERR_TAIL_CHUNKS
+        script = (
+            "import sys\n"
+            f"sys.stderr.buffer.write('\u20ac'.encode() * {limit // 3 + 1000})\n"
+            "sys.stderr.buffer.write('\u00e9pisode.mp4: Invalid data'.encode())\n"
+            "sys.exit(1)\n"
+        )
+        inputs = make_inputs(tmp_path, stitcher, [make_probe(), make_probe()])
+        monkeypatch.setattr(video_stitcher, 'detect_hw_encoder', lambda: None)
+        monkeypatch.setattr(
+            video_stitcher, 'run_ffmpeg',
+            lambda stream, **kwargs: run_ffmpeg(FakeStream(script), **kwargs)
+        )
+
+        with pytest.raises(RuntimeError) as excinfo:
+            stitcher.stitch_videos(inputs, normalize=False, copy_mode=True)
+
+        message = str(excinfo.value)
+        assert message.endswith('\u00e9pisode.mp4: Invalid data')
+        assert len(message.encode()) <= video_stitcher.ERROR_MESSAGE_BYTES + 100
+
+
+class TestHelpers:
+    """Module-level parsing helpers"""
+
+    @pytest.mark.parametrize("rate,expected", [
+        ('30/1', Fraction(30)),
+        ('30000/1001', Fraction(30000, 1001)),
+        ('25', Fraction(25)),
+        ('0/0', None),
+        ('', None),
+        ('abc', None),
+    ])
+    def test_frame_rate(self, rate, expected):
+        assert frame_rate({'r_frame_rate': rate}) == expected
+
+    @pytest.mark.parametrize("bitrate,expected", [
+        ('4M', 4000000),
+        ('2500k', 2500000),
+        ('1.5m', 1500000),
+        ('800000', 800000),
+    ])
+    def test_parse_bitrate(self, bitrate, expected):
+        assert parse_bitrate(bitrate) == expected
+
+    @pytest.mark.parametrize("bitrate", ['', 'fast', '0', '-1M', 'M'])
+    def test_parse_bitrate_invalid(self, bitrate):
+        with pytest.raises(ValueError, match="Invalid bitrate"):
+            parse_bitrate(bitrate)
+
+    def test_concat_list_escapes_quotes(self, monkeypatch):
+        monkeypatch.chdir('/')
+        listing = VideoStitcher._concat_list(["/videos/it's.mp4", "clips/a b.mp4"])
+        assert listing == b"file '/videos/it'\\''s.mp4'\nfile '/clips/a b.mp4'\n"
+
+
+class TestEncoderArgs:
+    """_encoder_args rate control per encoder, and quality validation"""
+
+    @pytest.fixture
+    def hw_encoder(self, monkeypatch):
+        def use(encoder):
+            monkeypatch.setattr(video_stitcher, 'detect_hw_encoder', lambda: encoder)
+        return use
+
+    def test_software_crf(self, hw_encoder):
+        hw_encoder(None)
+        assert VideoStitcher._encoder_args('libx264', 'fast', 'auto') == {
+            'vcodec': 'libx264', 'preset': 'fast', 'crf': video_stitcher.DEFAULT_QUALITY
+        }
+        assert VideoStitcher._encoder_args('libx265', 'slow', 28)['crf'] == 28
+
+    def test_software_without_crf(self, hw_encoder):
+        hw_encoder(None)
+        assert VideoStitcher._encoder_args('libvpx', 'fast', 23) == {'vcodec': 'libvpx', 'preset': 'fast'}
+
+    def test_bitrate_sets_vbv(self, hw_encoder):
+        hw_encoder(None)
+        args = VideoStitcher._encoder_args('libx264', 'fast', '4M')
+        assert (args['b:v'], args['maxrate'], args['bufsize']) == (4000000, 4000000, 8000000)
+        assert 'crf' not in args
+
+    def test_nvenc(self, hw_encoder):
+        hw_encoder('h264_nvenc')
+        assert VideoStitcher._encoder_args('libx264', 'fast', 23) == {
+            'vcodec': 'h264_nvenc', 'preset': 'p3', 'rc': 'vbr', 'cq': 23, 'b:v': 0
+        }
+        assert VideoStitcher._encoder_args('libx264', 'fast', '2M')['rc'] == 'cbr'
+
+    def test_qsv(self, hw_encoder):
+        hw_encoder('h264_qsv')
+        assert VideoStitcher._encoder_args('libx264', 'ultrafast', 23) == {
+            'vcodec': 'h264_qsv', 'preset': 'veryfast', 'pix_fmt': 'nv12', 'global_quality': 23
+        }
+
+    def test_other_codecs_skip_hw_encoder(self, hw_encoder):
+        hw_encoder('h264_nvenc')
+        assert VideoStitcher._encoder_args('libx265', 'fast', 23)['vcodec'] == 'libx265'
+
+    @pytest.mark.parametrize("quality,match", [
+        (True, "Invalid quality"),
+        (52, "Invalid quality"),
+        (-1, "Invalid quality"),
+        (23.5, "Invalid quality"),
+        ('high', "Invalid bitrate"),
+    ])
+    def test_invalid_quality(self, tmp_path, stitcher, ffmpeg_calls, quality, match):
+        inputs = make_inputs(tmp_path, stitcher, [make_probe()])
+        with pytest.raises(ValueError, match=match):
+            stitcher.stitch_videos(inputs, quality=quality)
+        assert ffmpeg_calls == []
+
+
+class TestRenditions:
+    """extra_renditions"""
+
+    def test_repeated_sizes_are_encoded_once(self, tmp_path, stitcher, ffmpeg_calls):
+        inputs = make_inputs(tmp_path, stitcher, [make_probe(), make_probe()])
+        result = stitcher.stitch_videos(inputs, extra_renditions=[(854, 480), [854, 480], (640, 360)])
+        assert [r['resolution'] for r in result['renditions']] == ['854x480', '640x360']
+        args = ffmpeg_calls[-1]
+        outputs = [arg for prev, arg in zip(args, args[1:]) if arg.endswith('.mp4') and prev != '-i']
+        assert len(outputs) == len(set(outputs)) == 2
+
+    def test_odd_size_is_rejected(self, tmp_path, stitcher, ffmpeg_calls):
+        inputs = make_inputs(tmp_path, stitcher, [make_probe()])
+        with pytest.raises(ValueError, match="853x480"):
+            stitcher.stitch_videos(inputs, extra_renditions=[(853, 480)])
@@ -2,47 +2,136 @@
 """
 End-to-end test for video stitcher
 Tests the VideoStitcher class directly and via API
+
+The two stitches are independent, so they run at the same time. Under pytest
+each one is skipped when its prerequisite (ffmpeg, or the API server on
+localhost:5001) is missing; run as a script it prints a report instead.
 """
 
-import os
+import shutil
 import sys
-import requests
-import json
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-# Test 1: Direct VideoStitcher class test
-print("=" * 60)
-print("TEST 1: Direct VideoStitcher Class")
-print("=" * 60)
+import pytest
 
-try:
-    from video_stitcher import VideoStitcher
+BACKEND_DIR = Path(__file__).resolve().parent
+VIDEOS_DIR = BACKEND_DIR / "videos"
+SERVER_URL = "http://localhost:5001"
 
-    # Get some video files to stitch
-    videos_dir = Path("videos")
-    video_files = list(videos_dir.glob("*.mp4"))[:3]  # Use first 3 videos
+pytestmark = pytest.mark.slow
 
-    if len(video_files) < 2:
-        print("ERROR: Need at least 2 videos to test stitching")
-        sys.exit(1)
 
-    print(f"\nFound {len(video_files)} videos to stitch:")
-    for i, video in enumerate(video_files, 1):
-        size_mb = video.stat().st_size / (1024 * 1024)
-        print(f"  {i}. {video.name} ({size_mb:.1f} MB)")
+def find_test_videos():
+    """Up to 3 input videos, ignoring outputs of earlier runs"""
+    videos = [v for v in VIDEOS_DIR.glob("*.mp4") if not v.name.startswith("test_")]
+    return videos[:3]
+
 
-    # Initialize stitcher
-    print("\nInitializing VideoStitcher...")
-    stitcher = VideoStitcher(output_dir="videos")
+def run_direct_test(video_files):
+    """Stitch with the VideoStitcher class; returns its result dict"""
+    if shutil.which("ffmpeg") is None:
+        pytest.skip("ffmpeg is not installed")
+    pytest.importorskip("ffmpeg")
+    from video_stitcher import VideoStitcher
+
+    stitcher = VideoStitcher(output_dir=str(VIDEOS_DIR))
 
     # Test with normalization
-    print("\nStitching videos with normalization...")
-    result = stitcher.stitch_videos(
+    return stitcher.stitch_videos(
         input_videos=[str(v) for v in video_files],
         normalize=True,
         output_filename="test_stitched_normalized.mp4"
     )
 
+
+def run_api_test(video_files):
+    """Stitch through the running API server and download the result"""
+    requests = pytest.importorskip("requests")
+
+    # Check if server is running
+    try:
+        response = requests.get(f"{SERVER_URL}/health", timeout=2)
+    except requests.exceptions.ConnectionError:
+        pytest.skip(f"API server not running at {SERVER_URL} (cd backend && python3 video_service.py)")
+    assert response.status_code == 200, "Server not healthy"
+
+    # Use filenames directly (they're in the videos directory)
+    payload = {
+        "video_ids": [v.name for v in video_files],
+        "normalize": True,
+        "target_resolution": "1280x720"
+    }
+
+    response = requests.post(
+        f"{SERVER_URL}/api/videos/stitch",
+        json=payload,
+        timeout=120  # Stitching can take time
+    )
+    assert response.status_code == 200, f"API stitching failed: {response.text}"
+    data = response.json()
+
+    # Try to download the result, streaming it to disk rather than holding
+    # the whole video in memory
+    test_output = Path("test_downloaded_stitched.mp4")
+    with requests.get(f"{SERVER_URL}{data['video_url']}", stream=True, timeout=30) as dl_response:
+        dl_response.raise_for_status()
+        with open(test_output, 'wb') as f:
+            for chunk in dl_response.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+
+    data['downloaded_to'] = str(test_output)
+    data['downloaded_size'] = test_output.stat().st_size
+    return data
+
+
+@pytest.fixture(scope="module")
+def video_files():
+    files = find_test_videos()
+    if len(files) < 2:
+        pytest.skip("Need at least 2 videos in backend/videos to test stitching")
+    return files
+
+
+@pytest.fixture(scope="module")
+def stitch_runs(video_files):
+    """Start both stitches at once; each test waits for its own"""
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        yield {
+            'direct': pool.submit(run_direct_test, video_files),
+            'api': pool.submit(run_api_test, video_files)
+        }
+
+
+def test_direct_stitch(stitch_runs, video_files):
+    result = stitch_runs['direct'].result()
+    assert result['input_count'] == len(video_files)
+    assert result['duration'] > 0
+
+
+def test_api_stitch(stitch_runs, video_files):
+    data = stitch_runs['api'].result()
+    assert data['input_count'] == len(video_files)
+    assert data['downloaded_size'] > 0
+
+
+def _report(title, future, describe):
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
+    try:
+        result = future.result()
+    except pytest.skip.Exception as e:
+        print(f"\n⏭️  Skipped: {e}")
+    except BaseException as e:
+        print(f"\n❌ Failed: {e}")
+        traceback.print_exception(e)
+    else:
+        describe(result)
+
+
+def _describe_direct(result):
     print("\n✅ Stitching successful!")
     print(f"  Output: {result['filename']}")
     print(f"  Duration: {result['duration']:.1f}s")
@@ -51,92 +140,41 @@ try:
     print(f"  Codec: {result['codec']}")
     print(f"  Input count: {result['input_count']}")
 
-except Exception as e:
-    print(f"\n❌ Direct test failed: {e}")
-    import traceback
-    traceback.print_exc()
 
-# Test 2: API endpoint test
-print("\n" + "=" * 60)
-print("TEST 2: API Endpoint")
-print("=" * 60)
+def _describe_api(data):
+    print("\n✅ API stitching successful!")
+    print(f"  Job ID: {data['job_id']}")
+    print(f"  Output: {data['filename']}")
+    print(f"  Duration: {data['duration']:.1f}s")
+    print(f"  Size: {data['size'] / (1024*1024):.1f} MB")
+    print(f"  Resolution: {data['resolution']}")
+    print(f"  Input count: {data['input_count']}")
+    print(f"  Video URL: {data['video_url']}")
+    print(f"✅ Downloaded to: {data['downloaded_to']} ({data['downloaded_size'] / (1024*1024):.1f} MB)")
 
-try:
-    # Check if server is running
-    health_url = "http://localhost:5001/health"
-    print(f"\nChecking server health: {health_url}")
-    response = requests.get(health_url, timeout=5)
 
-    if response.status_code != 200:
-        print("❌ Server not healthy")
+def main():
+    video_files = find_test_videos()
+    if len(video_files) < 2:
+        print("ERROR: Need at least 2 videos to test stitching")
         sys.exit(1)
 
-    print("✅ Server is running")
-
-    # Test stitch endpoint
-    stitch_url = "http://localhost:5001/api/videos/stitch"
-
-    # Use filenames directly (they're in the videos directory)
-    video_filenames = [v.name for v in video_files[:3]]
-
-    print(f"\nSending stitch request to: {stitch_url}")
-    print(f"Video IDs: {video_filenames}")
+    print(f"Found {len(video_files)} videos to stitch:")
+    for i, video in enumerate(video_files, 1):
+        size_mb = video.stat().st_size / (1024 * 1024)
+        print(f"  {i}. {video.name} ({size_mb:.1f} MB)")
 
-    payload = {
-        "video_ids": video_filenames,
-        "normalize": True,
-        "target_resolution": "1280x720"
-    }
+    print("\nRunning direct and API stitches in parallel...")
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        direct = pool.submit(run_direct_test, video_files)
+        api = pool.submit(run_api_test, video_files)
+        _report("TEST 1: Direct VideoStitcher Class", direct, _describe_direct)
+        _report("TEST 2: API Endpoint", api, _describe_api)
 
-    response = requests.post(
-        stitch_url,
-        json=payload,
-        headers={"Content-Type": "application/json"},
-        timeout=120  # Stitching can take time
-    )
+    print("\n" + "=" * 60)
+    print("END-TO-END TESTING COMPLETE")
+    print("=" * 60)
 
-    print(f"\nResponse status: {response.status_code}")
-
-    if response.status_code == 200:
-        data = response.json()
-        print("\n✅ API stitching successful!")
-        print(f"  Job ID: {data['job_id']}")
-        print(f"  Output: {data['filename']}")
-        print(f"  Duration: {data['duration']:.1f}s")
-        print(f"  Size: {data['size'] / (1024*1024):.1f} MB")
-        print(f"  Resolution: {data['resolution']}")
-        print(f"  Input count: {data['input_count']}")
-        print(f"  Video URL: {data['video_url']}")
-
-        # Try to download the result
-        download_url = f"http://localhost:5001{data['video_url']}"
-        print(f"\nDownloading stitched video from: {download_url}")
-
-        dl_response = requests.get(download_url, timeout=30)
-        if dl_response.status_code == 200:
-            test_output = Path("test_downloaded_stitched.mp4")
-            test_output.write_bytes(dl_response.content)
-            print(f"✅ Downloaded to: {test_output}")
-            print(f"  Size: {len(dl_response.content) / (1024*1024):.1f} MB")
-        else:
-            print(f"❌ Download failed: {dl_response.status_code}")
 
-    else:
-        print(f"\n❌ API stitching failed")
-        try:
-            error_data = response.json()
-            print(f"  Error: {error_data.get('error', 'Unknown error')}")
-        except:
-            print(f"  Response: {response.text}")
-
-except requests.exceptions.ConnectionError:
-    print("\n❌ Cannot connect to server. Make sure video_service.py is running:")
-    print("  cd backend && python3 video_service.py")
-except Exception as e:
-    print(f"\n❌ API test failed: {e}")
-    import traceback
-    traceback.print_exc()
-
-print("\n" + "=" * 60)
-print("END-TO-END TESTING COMPLETE")
-print("=" * 60)
+if __name__ == '__main__':
+    main()
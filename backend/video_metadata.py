@@ -3,140 +3,392 @@
 Video Metadata Extractor - Uses FFprobe to extract video information
 """
 
+import asyncio
+import os
 import subprocess
-import json
 import logging
+from dataclasses import dataclass
+from math import gcd
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+
+import orjson
+
+try:
+    import av
+except ImportError:
+    av = None
 
 logger = logging.getLogger(__name__)
 
+# Only the fields read below are requested; full -show_format/-show_streams
+# output carries every tag of every stream and is many times larger
+FFPROBE_CMD = [
+    'ffprobe',
+    '-v', 'quiet',
+    '-print_format', 'json',
+    '-show_entries', 'format=duration,bit_rate:stream=codec_type,codec_name,width,height,r_frame_rate'
+]
+
+# Aspect ratios of the resolutions the providers and stitcher produce, so
+# the usual case is a dict hit; anything else is reduced with gcd
+COMMON_ASPECT_RATIOS = {
+    (1280, 720): '16:9', (720, 1280): '9:16',
+    (1920, 1080): '16:9', (1080, 1920): '9:16',
+    (2560, 1440): '16:9', (1440, 2560): '9:16',
+    (3840, 2160): '16:9', (2160, 3840): '9:16',
+    (1024, 576): '16:9', (576, 1024): '9:16',
+    (1792, 1024): '7:4', (1024, 1792): '4:7',
+    (1080, 1080): '1:1', (720, 720): '1:1', (1024, 1024): '1:1',
+    (1080, 1350): '4:5',
+    (640, 480): '4:3', (1440, 1080): '4:3',
+    (480, 640): '3:4', (1080, 1440): '3:4',
+}
+
+
+@dataclass(slots=True, frozen=True)
+class VideoMeta:
+    """Metadata for one video file; fields ffprobe could not fill in are None"""
+    size_bytes: int
+    duration_seconds: Optional[float] = None
+    resolution: Optional[str] = None
+    aspect_ratio: Optional[str] = None
+    codec: Optional[str] = None
+    fps: Optional[float] = None
+    bitrate: Optional[int] = None
+    audio_codec: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The metadata as a plain dict"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    # Mapping-style access, for callers written against the old dict result
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+
+
+def _aspect_ratio(width: int, height: int) -> Optional[str]:
+    """Reduced W:H ratio, or None if either side is zero"""
+    aspect_ratio = COMMON_ASPECT_RATIOS.get((width, height))
+    if aspect_ratio is None:
+        gcd_val = gcd(width, height)
+        if gcd_val:
+            aspect_ratio = f"{width // gcd_val}:{height // gcd_val}"
+    return aspect_ratio
+
+
+# Frame rates the providers actually produce, keyed by ffprobe's r_frame_rate
+COMMON_FRAME_RATES = {
+    rate: round(num / den, 2)
+    for rate, num, den in (
+        ('24000/1001', 24000, 1001), ('24/1', 24, 1), ('25/1', 25, 1),
+        ('30000/1001', 30000, 1001), ('30/1', 30, 1),
+        ('60000/1001', 60000, 1001), ('60/1', 60, 1),
+    )
+}
+
+
+def _parse_frame_rate(rate: str) -> Optional[float]:
+    """Frames per second from a 'num/den' string, or None if unparseable"""
+    fps = COMMON_FRAME_RATES.get(rate)
+    if fps is None:
+        i = rate.find('/')
+        try:
+            den = int(rate[i + 1:])
+            if i > 0 and den > 0:
+                fps = round(int(rate[:i]) / den, 2)
+        except ValueError:
+            pass
+    return fps
+
+
+def format_duration(seconds: float) -> str:
+    """Format duration in human-readable format (HH:MM:SS)"""
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+
+    if hours > 0:
+        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+    else:
+        return f"{minutes:02d}:{secs:02d}"
+
+
+SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
+
+def format_file_size(bytes_size: int) -> str:
+    """Format file size in human-readable format"""
+    # Each unit is 2**10 of the previous one, so the bit length picks it directly
+    idx = min((max(int(bytes_size), 1).bit_length() - 1) // 10, len(SIZE_UNITS) - 1)
+    return f"{bytes_size / (1 << (idx * 10)):.2f} {SIZE_UNITS[idx]}"
+
 
 class VideoMetadataExtractor:
-    """Extract metadata from video files using FFprobe"""
+    """
+    Extract metadata from video files using FFprobe
 
-    @staticmethod
-    def extract_metadata(video_path: str) -> Dict[str, Any]:
+    When PyAV is installed files are read in-process through libavformat
+    instead, falling back to ffprobe for anything PyAV cannot open.
+
+    Attributes:
+        cache: Optional MediaManager used to persist probe results, so a file
+            that has not changed since it was last probed skips ffprobe
+    """
+
+    __slots__ = ('cache',)
+
+    def __init__(self, cache=None):
+        self.cache = cache
+
+    def extract_metadata(self, video_path: str) -> VideoMeta:
         """
         Extract comprehensive metadata from video file
 
         Returns:
-            Dict with keys: duration, resolution, aspect_ratio, codec, fps, size_bytes
+            VideoMeta with duration, resolution, aspect_ratio, codec, fps, size_bytes
+        """
+        return self.batch_extract([video_path])[str(video_path)]
+
+    def batch_extract(self, video_paths: List[str]) -> Dict[str, VideoMeta]:
+        """
+        Extract metadata for several files, probing only uncached ones
+
+        All cache lookups are done in a single query, and the files that
+        still need probing are probed concurrently (one ffprobe process per
+        file, at most os.cpu_count() at a time).
+
+        Returns:
+            Metadata by input path
+        """
+        files = []
+        for video_path in video_paths:
+            abs_path = os.path.abspath(video_path)
+            try:
+                st = os.stat(abs_path)
+            except FileNotFoundError:
+                raise FileNotFoundError(f"Video file not found: {video_path}")
+            files.append((abs_path, st.st_size, st.st_mtime_ns))
+
+        cached = self.cache.get_cached_video_metadata(files) if self.cache else {}
+
+        # Each uncached file is probed once, however often it was passed in
+        to_probe = {f[0]: f for f in files if f[0] not in cached}
+        # PyAV reads are in-process and cheap, so only ffprobe runs are parallelized
+        if len(to_probe) > 1 and av is None:
+            probed = asyncio.run(self._probe_many([(path, size) for path, size, _ in to_probe.values()]))
+        else:
+            probed = [self._probe(Path(path), size) for path, size, _ in to_probe.values()]
+
+        for (abs_path, size, mtime_ns), (metadata, complete) in zip(to_probe.values(), probed):
+            # Partial results (ffprobe failed) are not cached
+            if complete and self.cache:
+                self.cache.cache_video_metadata(abs_path, size, mtime_ns, metadata)
+            cached[abs_path] = metadata
+
+        # The cache holds plain dicts; VideoMeta is immutable, so repeated
+        # paths can share one instance
+        results = {abs_path: VideoMeta(**metadata) for abs_path, metadata in cached.items()}
+        return {
+            str(video_path): results[abs_path]
+            for video_path, (abs_path, _, _) in zip(video_paths, files)
+        }
+
+    def metadata_from_probe(self, video_path: str, probe_data: Dict[str, Any]) -> VideoMeta:
         """
-        video_path = Path(video_path)
+        Build (and cache) metadata from ffprobe JSON the caller already has
 
-        if not video_path.exists():
-            raise FileNotFoundError(f"Video file not found: {video_path}")
+        For files whose producer just probed them, e.g. VideoStitcher's
+        output, so they are not probed a second time.
+        """
+        abs_path = os.path.abspath(video_path)
+        st = os.stat(abs_path)
+        metadata = self._empty_metadata(st.st_size)
+        self._fill_from_probe(probe_data, metadata)
+        if self.cache:
+            self.cache.cache_video_metadata(abs_path, st.st_size, st.st_mtime_ns, metadata)
+        return VideoMeta(**metadata)
 
-        metadata = {
+    @staticmethod
+    def _empty_metadata(size_bytes: int) -> Dict[str, Any]:
+        """Metadata with only the file size filled in"""
+        return {
             'duration_seconds': None,
             'resolution': None,
             'aspect_ratio': None,
             'codec': None,
             'fps': None,
-            'size_bytes': video_path.stat().st_size,
+            'size_bytes': size_bytes,
             'bitrate': None,
             'audio_codec': None
         }
 
+    @staticmethod
+    def _probe(video_path: Path, size_bytes: int) -> tuple:
+        """
+        Read a file's metadata with PyAV, or ffprobe if PyAV is unavailable
+
+        Returns:
+            (metadata, complete) - complete is False if ffprobe failed and
+            only the partial metadata could be filled in
+        """
+        metadata = VideoMetadataExtractor._empty_metadata(size_bytes)
+
+        if av is not None:
+            try:
+                VideoMetadataExtractor._read_av(video_path, metadata)
+                logger.debug(f"Extracted metadata for {video_path.name}: {metadata}")
+                return metadata, True
+            except Exception as e:
+                logger.debug(f"PyAV could not read {video_path}, falling back to ffprobe: {e}")
+                metadata = VideoMetadataExtractor._empty_metadata(size_bytes)
+
         try:
             # Use ffprobe to get video information
-            cmd = [
-                'ffprobe',
-                '-v', 'quiet',
-                '-print_format', 'json',
-                '-show_format',
-                '-show_streams',
-                str(video_path)
-            ]
-
             result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
+                FFPROBE_CMD + [str(video_path)],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 check=True
             )
 
-            probe_data = json.loads(result.stdout)
-
-            # Extract format information
-            if 'format' in probe_data:
-                fmt = probe_data['format']
-                if 'duration' in fmt:
-                    metadata['duration_seconds'] = float(fmt['duration'])
-                if 'bit_rate' in fmt:
-                    metadata['bitrate'] = int(fmt['bit_rate'])
-
-            # Extract video stream information
-            if 'streams' in probe_data:
-                for stream in probe_data['streams']:
-                    if stream.get('codec_type') == 'video':
-                        # Video codec
-                        if 'codec_name' in stream:
-                            metadata['codec'] = stream['codec_name']
-
-                        # Resolution
-                        if 'width' in stream and 'height' in stream:
-                            width = stream['width']
-                            height = stream['height']
-                            metadata['resolution'] = f"{width}x{height}"
-
-                            # Calculate aspect ratio
-                            gcd_val = VideoMetadataExtractor._gcd(width, height)
-                            aspect_w = width // gcd_val
-                            aspect_h = height // gcd_val
-                            metadata['aspect_ratio'] = f"{aspect_w}:{aspect_h}"
-
-                        # FPS
-                        if 'r_frame_rate' in stream:
-                            try:
-                                num, den = map(int, stream['r_frame_rate'].split('/'))
-                                if den > 0:
-                                    metadata['fps'] = round(num / den, 2)
-                            except (ValueError, ZeroDivisionError):
-                                pass
-
-                    elif stream.get('codec_type') == 'audio':
-                        # Audio codec
-                        if 'codec_name' in stream:
-                            metadata['audio_codec'] = stream['codec_name']
+            VideoMetadataExtractor._parse_probe_output(result.stdout, metadata)
 
             logger.debug(f"Extracted metadata for {video_path.name}: {metadata}")
-            return metadata
+            return metadata, True
 
         except subprocess.CalledProcessError as e:
-            logger.error(f"FFprobe failed for {video_path}: {e.stderr}")
+            logger.error(f"FFprobe failed for {video_path}: {e.stderr.decode('utf-8', 'replace').strip()}")
             # Return partial metadata
-            return metadata
+            return metadata, False
 
         except Exception as e:
             logger.error(f"Failed to extract metadata for {video_path}: {e}")
-            return metadata
+            return metadata, False
 
     @staticmethod
-    def _gcd(a: int, b: int) -> int:
-        """Calculate greatest common divisor"""
-        while b:
-            a, b = b, a % b
-        return a
+    async def _probe_many(files: List[tuple]) -> List[tuple]:
+        """Probe (path, size) pairs concurrently; results in input order"""
+        semaphore = asyncio.Semaphore(min(os.cpu_count() or 1, len(files)))
+        return await asyncio.gather(*(
+            VideoMetadataExtractor._probe_async(Path(path), size, semaphore)
+            for path, size in files
+        ))
 
     @staticmethod
-    def format_duration(seconds: float) -> str:
-        """Format duration in human-readable format (HH:MM:SS)"""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-
-        if hours > 0:
-            return f"{hours:02d}:{minutes:02d}:{secs:02d}"
-        else:
-            return f"{minutes:02d}:{secs:02d}"
+    async def _probe_async(video_path: Path, size_bytes: int, semaphore: asyncio.Semaphore) -> tuple:
+        """Async variant of _probe, run under the caller's concurrency limit"""
+        metadata = VideoMetadataExtractor._empty_metadata(size_bytes)
+
+        try:
+            async with semaphore:
+                proc = await asyncio.create_subprocess_exec(
+                    *FFPROBE_CMD, str(video_path),
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                stdout, stderr = await proc.communicate()
+
+            if proc.returncode != 0:
+                logger.error(f"FFprobe failed for {video_path}: {stderr.decode('utf-8', 'replace').strip()}")
+                return metadata, False
+
+            VideoMetadataExtractor._parse_probe_output(stdout, metadata)
+
+            logger.debug(f"Extracted metadata for {video_path.name}: {metadata}")
+            return metadata, True
+
+        except Exception as e:
+            logger.error(f"Failed to extract metadata for {video_path}: {e}")
+            return metadata, False
 
     @staticmethod
-    def format_file_size(bytes_size: int) -> str:
-        """Format file size in human-readable format"""
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if bytes_size < 1024.0:
-                return f"{bytes_size:.2f} {unit}"
-            bytes_size /= 1024.0
-        return f"{bytes_size:.2f} PB"
+    def _read_av(video_path: Path, metadata: Dict[str, Any]):
+        """Fill metadata in place by opening the container with PyAV"""
+        with av.open(str(video_path), metadata_errors='ignore') as container:
+            if container.duration is not None:
+                metadata['duration_seconds'] = container.duration / av.time_base
+            if container.bit_rate:
+                metadata['bitrate'] = container.bit_rate
+
+            video = next(iter(container.streams.video), None)
+            audio = next(iter(container.streams.audio), None)
+
+            if video:
+                metadata['codec'] = video.codec_context.name
+
+                width = video.codec_context.width
+                height = video.codec_context.height
+                if width and height:
+                    metadata['resolution'] = f"{width}x{height}"
+                    metadata['aspect_ratio'] = _aspect_ratio(width, height)
+
+                rate = video.average_rate
+                if rate and rate.denominator > 0:
+                    metadata['fps'] = round(rate.numerator / rate.denominator, 2)
+
+            if audio:
+                metadata['audio_codec'] = audio.codec_context.name
+
+    @staticmethod
+    def _parse_probe_output(output: bytes, metadata: Dict[str, Any]):
+        """Fill metadata in place from ffprobe's JSON output"""
+        VideoMetadataExtractor._fill_from_probe(orjson.loads(output), metadata)
+
+    @staticmethod
+    def _fill_from_probe(probe_data: Dict[str, Any], metadata: Dict[str, Any]):
+        """Fill metadata in place from parsed ffprobe JSON"""
+        # Extract format information
+        if 'format' in probe_data:
+            fmt = probe_data['format']
+            if 'duration' in fmt:
+                metadata['duration_seconds'] = float(fmt['duration'])
+            if 'bit_rate' in fmt:
+                metadata['bitrate'] = int(fmt['bit_rate'])
+
+        # First video and first audio stream
+        streams = probe_data.get('streams', [])
+        video = next((st for st in streams if st.get('codec_type') == 'video'), None)
+        audio = next((st for st in streams if st.get('codec_type') == 'audio'), None)
+
+        if video:
+            # Video codec
+            if 'codec_name' in video:
+                metadata['codec'] = video['codec_name']
+
+            # Resolution
+            if 'width' in video and 'height' in video:
+                width = video['width']
+                height = video['height']
+                metadata['resolution'] = f"{width}x{height}"
+
+                # Calculate aspect ratio
+                metadata['aspect_ratio'] = _aspect_ratio(width, height)
+
+            # FPS
+            if 'r_frame_rate' in video:
+                metadata['fps'] = _parse_frame_rate(video['r_frame_rate'])
+
+        if audio and 'codec_name' in audio:
+            # Audio codec
+            metadata['audio_codec'] = audio['codec_name']
+
+    # Kept on the class for existing callers
+    format_duration = staticmethod(format_duration)
+    format_file_size = staticmethod(format_file_size)
+
+
+# Shared uncached extractor behind the module-level extract_metadata
+_default_extractor = VideoMetadataExtractor()
+
+
+def extract_metadata(video_path: str) -> VideoMeta:
+    """Extract metadata for one file without a persistent cache"""
+    return _default_extractor.extract_metadata(video_path)
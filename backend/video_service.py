@@ -4,19 +4,32 @@ Video Generation Service - Flask Backend
 Wraps the video_generator.py implementation for web API access
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+from werkzeug.http import parse_content_range_header
+from werkzeug.routing import BaseConverter
+import atexit
 import os
+import queue
 import sys
+import threading
 import time
 import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 import logging
 
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from openai import OpenAI
+
 # Import video generator from ai-short-drama project
 sys.path.insert(0, '/Users/junmingz/claude_projects/ai-short-drama')
-from video_generator import VideoGenerator, download_video, download_with_curl
+from video_generator import VideoGenerator, download_openai_video, download_video, download_with_curl
 
 # Import prompt generator
 from prompt_generator import PromptGenerator
@@ -26,33 +39,160 @@ from video_stitcher import VideoStitcher
 
 # Import media manager
 from media_manager import MediaManager
-from video_metadata import VideoMetadataExtractor
+from video_metadata import VideoMeta, VideoMetadataExtractor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _dumps(obj) -> bytes:
+    """Serialize obj to JSON bytes (orjson; datetimes and UUIDs handled natively)"""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+class OrjsonProvider(JSONProvider):
+    """Back jsonify() and request.get_json() with orjson"""
+
+    def dumps(self, obj, **kwargs):
+        return _dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand the bytes straight to the response, skipping the str round trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(_dumps(obj), mimetype='application/json')
+
+
+class JobIdConverter(BaseConverter):
+    """Match only job ids (uuid4 strings), so other paths 404 at routing"""
+    regex = r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+app.url_map.converters['job_id'] = JobIdConverter
 CORS(app)  # Enable CORS for web client
 
+
+@app.errorhandler(404)
+def not_found(e):
+    return jsonify({'error': 'Not found'}), 404
+
+# Larger request bodies are refused with 413 before anything is read
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_BYTES', 2 * 1024 ** 3))
+
+# Uploads are copied to VIDEO_DIR (and hashed) in blocks this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 # Video storage directory
 VIDEO_DIR = Path(__file__).parent / 'videos'
 VIDEO_DIR.mkdir(exist_ok=True)
 
+# When nginx fronts the service, set this to its internal location for VIDEO_DIR
+# (e.g. /internal/videos/) and downloads are handed off via X-Accel-Redirect
+ACCEL_REDIRECT_PREFIX = os.environ.get('ACCEL_REDIRECT_PREFIX')
+
+# Behind Apache mod_xsendfile (or lighttpd), hand downloads off via X-Sendfile
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+
 # Initialize Media Manager
 media_manager = MediaManager(
     db_path=str(Path(__file__).parent / 'media.db'),
     video_dir=str(VIDEO_DIR)
 )
-metadata_extractor = VideoMetadataExtractor()
+metadata_extractor = VideoMetadataExtractor(cache=media_manager)
+# Shared across stitches, so its ffprobe cache carries over between requests
+video_stitcher = VideoStitcher(output_dir=str(VIDEO_DIR))
+
+# Shared prompt generator, so its response cache outlives a single request
+_prompt_generator = None
+_prompt_generator_lock = threading.Lock()
+
+
+def get_prompt_generator() -> PromptGenerator:
+    """Return the shared PromptGenerator, creating it on first use"""
+    global _prompt_generator
+    with _prompt_generator_lock:
+        if _prompt_generator is None:
+            # Will use OPENAI_API_KEY from env; raises ValueError if missing
+            _prompt_generator = PromptGenerator()
+        return _prompt_generator
+
+
+# Idle VideoGenerators per provider, reused across jobs so SDK clients and
+# their connection pools are not rebuilt each time. An instance is not known
+# to be safe to share between threads, so a job checks one out for itself.
+_generator_pools = {}
+_generator_pools_lock = threading.Lock()
 
-# In-memory job tracking (legacy - will be replaced by MediaManager)
+
+def _checkout_generator(provider):
+    """Take an idle VideoGenerator for provider, or create one"""
+    with _generator_pools_lock:
+        pool = _generator_pools.setdefault(provider, queue.SimpleQueue())
+    try:
+        return pool.get_nowait()
+    except queue.Empty:
+        return VideoGenerator(provider=provider)
+
+
+def _return_generator(provider, generator):
+    """Put a generator back for the next job"""
+    _generator_pools[provider].put(generator)
+
+# Live jobs, keyed by id; every change is also written to media_manager so
+# the list survives a restart (see _restore_jobs)
 jobs = {}
+# Serializes changes to `jobs`. Readers take no lock: a single get, or
+# list(jobs.values()), is atomic on the dict, so polls never wait on each other.
+_jobs_lock = threading.Lock()
+
+# Bumped whenever `jobs` or a job in it changes; list_jobs caches its body on it
+_jobs_version = 0
+_jobs_version_lock = threading.Lock()
+_list_jobs_cache = (None, None, None)
+
+
+def _jobs_changed():
+    global _jobs_version
+    with _jobs_version_lock:
+        _jobs_version += 1
+
+# Generation jobs run on a fixed pool rather than one new thread per request;
+# each worker mostly waits on the provider, hence more workers than cores
+VIDEO_WORKERS = int(os.environ.get('VIDEO_WORKERS', min(32, (os.cpu_count() or 1) * 5)))
+generation_executor = ThreadPoolExecutor(max_workers=VIDEO_WORKERS, thread_name_prefix='vidgen')
+atexit.register(generation_executor.shutdown, wait=False)
+
+# Generations still queued or running, keyed on their (prompt, provider,
+# settings), so a resubmitted request joins the existing job
+_inflight_generations = {}
+_inflight_lock = threading.Lock()
+
+# Finished jobs older than JOB_TTL_HOURS are dropped from the job list; their
+# video files belong to the media library and are kept. Unset keeps jobs forever.
+JOB_TTL_HOURS = float(os.environ['JOB_TTL_HOURS']) if os.environ.get('JOB_TTL_HOURS') else None
+JOB_EVICTION_INTERVAL = 300  # seconds
+
+# Stitches are ffmpeg encodes (child processes, not Python work), so a thread
+# per stitch is enough; the pool only caps concurrent encodes at the core count
+STITCH_WORKERS = int(os.environ.get('STITCH_WORKERS', os.cpu_count() or 1))
+stitch_executor = ThreadPoolExecutor(max_workers=STITCH_WORKERS, thread_name_prefix='stitch')
+atexit.register(stitch_executor.shutdown, wait=False)
 
 
 class VideoGenerationJob:
     """Track video generation job status"""
 
+    # Fixed attributes, so the job list costs no per-job __dict__
+    __slots__ = (
+        'job_id', 'prompt', 'provider', 'settings', 'status', 'progress', 'error',
+        'video_id', 'video_path', 'video_url', 'created_at', 'completed_at',
+        'future', 'version', '_changed', '_snapshot'
+    )
+
     def __init__(self, job_id, prompt, provider, settings):
         self.job_id = job_id
         self.prompt = prompt
@@ -66,21 +206,218 @@ class VideoGenerationJob:
         self.video_url = None
         self.created_at = datetime.utcnow().isoformat()
         self.completed_at = None
+        self.future = None  # Set while the job is queued or running on generation_executor
+        self.version = 0  # Bumped by update()
+        # Guards the fields while they change and while they are read, so a
+        # reader never sees e.g. 'completed' without its video_url
+        self._changed = threading.Condition(threading.RLock())
+        self._snapshot = None
+
+    def update(self, **fields):
+        """Apply field changes as one step, then wake waiters and persist"""
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+        _persist_job(self)
+        _jobs_changed()
+
+    def wait_for_change(self, since, timeout):
+        """Block until version moves past `since` or timeout expires; returns the version"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != since, timeout)
+            return self.version
+
+    def snapshot(self):
+        """to_dict(), rebuilt only when the job has changed since the last call"""
+        with self._changed:
+            cached = self._snapshot
+            if cached is None or cached[0] != self.version:
+                cached = self._snapshot = (self.version, self.to_dict())
+            return cached[1]
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a job from to_record()"""
+        job = cls(data['id'], data['prompt'], data['provider'], data['settings'])
+        for field in ('status', 'progress', 'error', 'video_id', 'video_path',
+                      'video_url', 'created_at', 'completed_at'):
+            setattr(job, field, data.get(field))
+        return job
 
     def to_dict(self):
-        return {
-            'id': self.job_id,
-            'prompt': self.prompt,
-            'provider': self.provider,
-            'settings': self.settings,
-            'status': self.status,
-            'progress': self.progress,
-            'error': self.error,
-            'video_id': self.video_id,
-            'video_url': self.video_url,
-            'created_at': self.created_at,
-            'completed_at': self.completed_at
-        }
+        with self._changed:
+            return {
+                'id': self.job_id,
+                'prompt': self.prompt,
+                'provider': self.provider,
+                'settings': self.settings,
+                'status': self.status,
+                'progress': self.progress,
+                'error': self.error,
+                'video_id': self.video_id,
+                'video_url': self.video_url,
+                'created_at': self.created_at,
+                'completed_at': self.completed_at
+            }
+
+    def to_record(self):
+        """to_dict() plus the fields only needed to restore the job after a restart"""
+        with self._changed:
+            return {**self.to_dict(), 'video_path': self.video_path}
+
+
+# Statuses after which a job never changes again
+TERMINAL_STATUSES = ('completed', 'failed')
+
+
+def _persist_job(job):
+    """Write a job's current state to the media database"""
+    record = job.to_record()
+    try:
+        media_manager.save_job(job.job_id, record['created_at'], record['status'], record)
+    except Exception as e:
+        logger.error(f"Job {job.job_id}: Failed to persist - {str(e)}")
+
+
+def _find_stored_job(job_id):
+    """Load a job this process is not tracking (e.g. one another worker created)"""
+    data = media_manager.get_job(job_id)
+    return VideoGenerationJob.from_dict(data) if data else None
+
+
+def _register_job(job):
+    """Start tracking a new job"""
+    with _jobs_lock:
+        jobs[job.job_id] = job
+    _persist_job(job)
+    _jobs_changed()
+
+
+def _restore_jobs():
+    """Load jobs saved by an earlier run; ones cut off mid-generation are marked failed"""
+    # Oldest first, so `jobs` keeps the creation order list_jobs relies on
+    for data in reversed(media_manager.list_jobs()):
+        job = VideoGenerationJob.from_dict(data)
+        if job.status not in TERMINAL_STATUSES:
+            job.status = 'failed'
+            job.error = 'Interrupted by server restart'
+            _persist_job(job)
+        jobs[job.job_id] = job
+    if jobs:
+        logger.info(f"Restored {len(jobs)} jobs")
+
+
+_restore_jobs()
+
+
+def _evict_expired_jobs():
+    """Drop finished jobs that completed more than JOB_TTL_HOURS ago"""
+    cutoff = (datetime.utcnow() - timedelta(hours=JOB_TTL_HOURS)).isoformat()
+    expired = [
+        job for job in list(jobs.values())
+        if job.status in TERMINAL_STATUSES and (job.completed_at or job.created_at) < cutoff
+    ]
+    if not expired:
+        return
+
+    with _jobs_lock:
+        # Skip a job re-registered under the same id since the scan
+        expired = [job for job in expired if jobs.get(job.job_id) is job]
+        for job in expired:
+            del jobs[job.job_id]
+    media_manager.delete_jobs([job.job_id for job in expired])
+    _jobs_changed()
+    logger.info(f"Evicted {len(expired)} jobs older than {JOB_TTL_HOURS}h")
+
+
+def _run_job_eviction():
+    """Background loop: evict expired jobs every JOB_EVICTION_INTERVAL seconds"""
+    while True:
+        time.sleep(JOB_EVICTION_INTERVAL)
+        try:
+            _evict_expired_jobs()
+        except Exception as e:
+            logger.error(f"Job eviction failed: {str(e)}")
+
+
+if JOB_TTL_HOURS:
+    threading.Thread(target=_run_job_eviction, name='job-eviction', daemon=True).start()
+
+# Idle event streams send a comment this often so proxies keep them open
+SSE_KEEPALIVE_SECONDS = 30
+
+
+def _job_events(job):
+    """Yield an SSE frame per job update until the job finishes or is deleted"""
+    version = None
+    while True:
+        current = job.wait_for_change(version, SSE_KEEPALIVE_SECONDS)
+        if current == version:
+            if jobs.get(job.job_id) is not job:
+                return
+            yield b': keepalive\n\n'
+            continue
+        version = current
+        state = job.snapshot()
+        yield b'data: ' + _dumps(state) + b'\n\n'
+        if state['status'] in TERMINAL_STATUSES:
+            return
+
+
+# Provider downloads are written as they arrive; past ~100 KiB larger chunks
+# stop paying off, so 256 KiB keeps syscalls low without holding much in RAM
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# Shared by provider downloads, so keep-alive connections (and their TLS
+# sessions) carry over from one job to the next instead of a new handshake each
+download_session = requests.Session()
+download_session.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32))
+
+
+def _stream_to_file(chunks, path):
+    """Write an iterable of byte chunks to path, removing the partial file on failure"""
+    try:
+        with open(path, 'wb', buffering=0) as f:
+            for chunk in chunks:
+                f.write(chunk)
+        return True
+    except Exception as e:
+        logger.error(f"Download to {path} failed: {str(e)}")
+        Path(path).unlink(missing_ok=True)
+        return False
+
+
+@lru_cache(maxsize=1)
+def _get_openai_client():
+    # Will use OPENAI_API_KEY from env
+    return OpenAI()
+
+
+def _stream_openai_video(video_id, path):
+    """Stream a finished OpenAI video to path"""
+    client = _get_openai_client()
+    if not hasattr(client, 'videos'):
+        # SDK predates the videos API - fall back to the whole-file helper
+        return download_openai_video(video_id, path)
+
+    def chunks():
+        with client.with_streaming_response.videos.download_content(video_id) as response:
+            yield from response.iter_bytes(DOWNLOAD_CHUNK_SIZE)
+
+    return _stream_to_file(chunks(), path)
+
+
+def _stream_url(url, path):
+    """Stream a Google video URI to path"""
+    def chunks():
+        headers = {'x-goog-api-key': os.environ.get('GEMINI_API_KEY', '')}
+        with download_session.get(url, headers=headers, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            yield from response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+
+    return _stream_to_file(chunks(), path)
 
 
 @app.route('/health', methods=['GET'])
@@ -118,17 +455,32 @@ def generate_video():
         if not prompt:
             return jsonify({'error': 'Prompt is required'}), 400
 
-        # Create job
-        job_id = str(uuid.uuid4())
-        job = VideoGenerationJob(job_id, prompt, provider, settings)
-        jobs[job_id] = job
+        request_key = orjson.dumps([prompt, provider, settings], option=orjson.OPT_SORT_KEYS)
+
+        with _inflight_lock:
+            existing = _inflight_generations.get(request_key)
+            if (existing is not None and existing.status not in TERMINAL_STATUSES
+                    and jobs.get(existing.job_id) is existing):
+                logger.info(f"Joining in-flight job {existing.job_id} for identical request")
+                return jsonify({
+                    'job_id': existing.job_id,
+                    'status': existing.status,
+                    'coalesced': True,
+                    'message': 'Identical video generation already in progress'
+                }), 202
+
+            # Create job
+            job_id = str(uuid.uuid4())
+            job = VideoGenerationJob(job_id, prompt, provider, settings)
+            _register_job(job)
+            _inflight_generations[request_key] = job
 
         logger.info(f"Created job {job_id} for prompt: {prompt[:50]}...")
 
         # Start generation in background (in production, use Celery/RQ)
-        import threading
-        thread = threading.Thread(target=_generate_video_async, args=(job_id,))
-        thread.start()
+        job.future = generation_executor.submit(_generate_video_async, job_id)
+        # Also runs if delete_job cancels the job before it starts
+        job.future.add_done_callback(lambda future: _release_inflight(request_key, job))
 
         return jsonify({
             'job_id': job_id,
@@ -141,6 +493,13 @@ def generate_video():
         return jsonify({'error': str(e)}), 500
 
 
+def _release_inflight(request_key, job):
+    """Stop routing identical requests to a job that has finished"""
+    with _inflight_lock:
+        if _inflight_generations.get(request_key) is job:
+            del _inflight_generations[request_key]
+
+
 def _generate_video_async(job_id):
     """Background task to generate video"""
     job = jobs.get(job_id)
@@ -148,27 +507,27 @@ def _generate_video_async(job_id):
         return
 
     try:
-        job.status = 'processing'
-        job.progress = 10
+        job.update(status='processing', progress=10)
 
         # Initialize video generator
         logger.info(f"Job {job_id}: Initializing {job.provider} generator")
-        generator = VideoGenerator(provider=job.provider)
+        generator = _checkout_generator(job.provider)
 
-        job.progress = 20
+        job.update(progress=20)
 
         # Generate video
         logger.info(f"Job {job_id}: Starting generation")
-        result = generator.generate(job.prompt, **job.settings)
+        try:
+            result = generator.generate(job.prompt, **job.settings)
+        finally:
+            _return_generator(job.provider, generator)
 
         if not result['success']:
-            job.status = 'failed'
-            job.error = result.get('error', 'Unknown error')
+            job.update(status='failed', error=result.get('error', 'Unknown error'))
             logger.error(f"Job {job_id}: Generation failed - {job.error}")
             return
 
-        job.progress = 80
-        job.video_id = result.get('job_id') or result.get('operation_name')
+        job.update(progress=80, video_id=result.get('job_id') or result.get('operation_name'))
 
         # Download video
         logger.info(f"Job {job_id}: Downloading video")
@@ -179,19 +538,25 @@ def _generate_video_async(job_id):
 
         if job.provider == 'openai':
             # OpenAI download
-            from video_generator import download_openai_video
-            download_success = download_openai_video(job.video_id, str(video_path))
+            download_success = _stream_openai_video(job.video_id, str(video_path))
 
         elif job.provider == 'google':
             # Google download
             if result.get('video_object'):
                 download_success = download_video(result['video_object'], str(video_path))
             elif result.get('video_uri'):
-                download_success = download_with_curl(result['video_uri'], str(video_path))
+                # curl remains the fallback if the streamed request is refused
+                download_success = (_stream_url(result['video_uri'], str(video_path))
+                                    or download_with_curl(result['video_uri'], str(video_path)))
 
-        if not download_success or not video_path.exists():
-            job.status = 'failed'
-            job.error = 'Failed to download video'
+        try:
+            # One stat both confirms the download and sizes it for the fallback below
+            video_size = video_path.stat().st_size if download_success else None
+        except FileNotFoundError:
+            video_size = None
+
+        if video_size is None:
+            job.update(status='failed', error='Failed to download video')
             logger.error(f"Job {job_id}: Download failed")
             return
 
@@ -200,40 +565,32 @@ def _generate_video_async(job_id):
             video_metadata = metadata_extractor.extract_metadata(str(video_path))
         except Exception as e:
             logger.warning(f"Job {job_id}: Failed to extract metadata - {str(e)}")
-            video_metadata = {
-                'size_bytes': video_path.stat().st_size,
-                'duration_seconds': None,
-                'resolution': None,
-                'aspect_ratio': None,
-                'codec': None,
-                'fps': None
-            }
+            video_metadata = VideoMeta(size_bytes=video_size)
 
-        # Add to media manager
+        # Add to media manager, with its generation details in the same transaction
         try:
-            result = media_manager.add_video(
+            result = media_manager.add_generated_video(
                 video_id=job_id,
                 name=f"Generated: {job.prompt[:50]}",
                 file_path=str(video_path),
-                size_bytes=video_metadata['size_bytes'],
+                size_bytes=video_metadata.size_bytes,
                 source_type='generated',
-                duration_seconds=video_metadata.get('duration_seconds'),
-                resolution=video_metadata.get('resolution'),
-                aspect_ratio=video_metadata.get('aspect_ratio'),
-                codec=video_metadata.get('codec'),
-                fps=video_metadata.get('fps')
-            )
-
-            # Add generation details
-            media_manager.add_generation_details(
-                video_id=job_id,
-                provider=job.provider,
-                prompt=job.prompt,
-                model=job.settings.get('model'),
-                generation_params=job.settings,
-                job_id=job.video_id,
-                status='completed',
-                completed_at=datetime.utcnow().isoformat()
+                duration_seconds=video_metadata.duration_seconds,
+                resolution=video_metadata.resolution,
+                aspect_ratio=video_metadata.aspect_ratio,
+                codec=video_metadata.codec,
+                fps=video_metadata.fps,
+                # Freshly generated file under a new job id - nothing to dedupe against
+                trusted_unique=True,
+                generation={
+                    'provider': job.provider,
+                    'prompt': job.prompt,
+                    'model': job.settings.get('model'),
+                    'generation_params': job.settings,
+                    'job_id': job.video_id,
+                    'status': 'completed',
+                    'completed_at': datetime.utcnow().isoformat()
+                }
             )
 
             logger.info(f"Job {job_id}: Added to MediaManager (duplicate: {result.get('is_duplicate', False)})")
@@ -241,35 +598,64 @@ def _generate_video_async(job_id):
             logger.error(f"Job {job_id}: Failed to add to MediaManager - {str(e)}")
 
         # Success
-        job.status = 'completed'
-        job.progress = 100
-        job.video_path = str(video_path)
-        job.video_url = f"/api/videos/{job_id}/download"
-        job.completed_at = datetime.utcnow().isoformat()
+        job.update(
+            status='completed',
+            progress=100,
+            video_path=str(video_path),
+            video_url=f"/api/videos/{job_id}/download",
+            completed_at=datetime.utcnow().isoformat()
+        )
 
         logger.info(f"Job {job_id}: Completed successfully")
 
     except Exception as e:
-        job.status = 'failed'
-        job.error = str(e)
+        job.update(status='failed', error=str(e))
         logger.error(f"Job {job_id}: Exception - {str(e)}")
 
 
-@app.route('/api/videos/<job_id>/status', methods=['GET'])
+@app.route('/api/videos/<job_id:job_id>/status', methods=['GET'])
 def get_job_status(job_id):
     """Get status of a video generation job"""
     job = jobs.get(job_id)
 
     if not job:
+        # Created by another server process: answer from its stored state
+        stored = _find_stored_job(job_id)
+        if stored:
+            return jsonify(stored.to_dict())
         return jsonify({'error': 'Job not found'}), 404
 
-    return jsonify(job.to_dict())
+    # The job version changes with every update, so pollers that send back
+    # the ETag get an empty 304 until something actually happens
+    etag = f'{job_id}-{job.version}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(job.snapshot())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/api/videos/<job_id:job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """Push job status as Server-Sent Events instead of being polled"""
+    job = jobs.get(job_id)
+
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return Response(
+        stream_with_context(_job_events(job)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 
-@app.route('/api/videos/<job_id>/download', methods=['GET'])
+@app.route('/api/videos/<job_id:job_id>/download', methods=['GET'])
 def download_video_file(job_id):
     """Download the generated video file"""
-    job = jobs.get(job_id)
+    job = jobs.get(job_id) or _find_stored_job(job_id)
 
     if not job:
         return jsonify({'error': 'Job not found'}), 404
@@ -277,34 +663,99 @@ def download_video_file(job_id):
     if job.status != 'completed':
         return jsonify({'error': f'Job status: {job.status}'}), 400
 
-    if not job.video_path or not Path(job.video_path).exists():
+    if not job.video_path:
         return jsonify({'error': 'Video file not found'}), 404
 
-    return send_file(
-        job.video_path,
-        mimetype='video/mp4',
-        as_attachment=True,
-        download_name=f'video_{job_id}.mp4'
-    )
+    download_name = f'video_{job_id}.mp4'
+
+    if ACCEL_REDIRECT_PREFIX:
+        if not Path(job.video_path).exists():
+            return jsonify({'error': 'Video file not found'}), 404
+        # nginx serves the bytes (with range support) straight from disk
+        return Response(headers={
+            'X-Accel-Redirect': f'{ACCEL_REDIRECT_PREFIX.rstrip("/")}/{Path(job.video_path).name}',
+            'Content-Type': 'video/mp4',
+            'Content-Disposition': f'attachment; filename="{download_name}"'
+        })
+
+    if app.config['USE_X_SENDFILE']:
+        if not Path(job.video_path).exists():
+            return jsonify({'error': 'Video file not found'}), 404
+        # Given a path, send_file only sets X-Sendfile and the front end serves the bytes
+        return send_file(
+            job.video_path,
+            mimetype='video/mp4',
+            as_attachment=True,
+            download_name=download_name,
+            max_age=3600
+        )
+
+    try:
+        video_file = open(job.video_path, 'rb')
+    except FileNotFoundError:
+        return jsonify({'error': 'Video file not found'}), 404
+
+    try:
+        st = os.fstat(video_file.fileno())
+        if hasattr(os, 'posix_fadvise'):
+            # Read straight through with a large readahead window, and don't
+            # let one big download push the database out of the page cache
+            os.posix_fadvise(video_file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(video_file.fileno(), 0, 0, os.POSIX_FADV_NOREUSE)
+        response = send_file(
+            video_file,
+            mimetype='video/mp4',
+            as_attachment=True,
+            download_name=download_name,
+            last_modified=st.st_mtime,
+            max_age=3600
+        )
+    except Exception:
+        video_file.close()
+        raise
+
+    # send_file cannot size a file object, so answer Range requests here; a
+    # seeking player then does not restart the transfer from byte 0
+    response.content_length = st.st_size
+    response.set_etag(f'{st.st_mtime_ns}-{st.st_size}')
+    return response.make_conditional(request, accept_ranges=True, complete_length=st.st_size)
 
 
 @app.route('/api/videos/list', methods=['GET'])
 def list_jobs():
-    """List all video generation jobs"""
-    # Sort by created_at descending
-    sorted_jobs = sorted(
-        jobs.values(),
-        key=lambda j: j.created_at,
-        reverse=True
-    )
+    """
+    List video generation jobs, newest first
 
-    return jsonify({
-        'jobs': [job.to_dict() for job in sorted_jobs],
-        'total': len(jobs)
-    })
+    Query params:
+        limit: Return at most this many jobs (default: all)
+        offset: Skip this many of the newest jobs (default: 0)
+    """
+    global _list_jobs_cache
+    version, snapshots, body = _list_jobs_cache
+
+    if version != _jobs_version:
+        # Read the version first so a change made while building forces a rebuild
+        version = _jobs_version
+        # Newest first - jobs are inserted as they are created, so no sort is needed
+        snapshots = [job.snapshot() for job in reversed(list(jobs.values()))]
+        body = _dumps({'jobs': snapshots, 'total': len(snapshots)})
+        _list_jobs_cache = (version, snapshots, body)
+
+    limit = request.args.get('limit', type=int)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    if limit is not None or offset:
+        end = offset + max(limit, 0) if limit is not None else None
+        body = _dumps({
+            'jobs': snapshots[offset:end],
+            'total': len(snapshots),
+            'offset': offset,
+            'limit': limit
+        })
+
+    return Response(body, mimetype='application/json')
 
 
-@app.route('/api/videos/<job_id>', methods=['DELETE'])
+@app.route('/api/videos/<job_id:job_id>', methods=['DELETE'])
 def delete_job(job_id):
     """Delete a job and its video file"""
     job = jobs.get(job_id)
@@ -312,79 +763,72 @@ def delete_job(job_id):
     if not job:
         return jsonify({'error': 'Job not found'}), 404
 
+    # A job still waiting for a worker never starts; a running one is left to finish
+    if job.future is not None:
+        job.future.cancel()
+
     # Delete video file if exists
     if job.video_path and Path(job.video_path).exists():
         Path(job.video_path).unlink()
 
-    # Remove from jobs
-    del jobs[job_id]
+    # Remove from jobs (eviction may have got there first)
+    with _jobs_lock:
+        jobs.pop(job_id, None)
+    media_manager.delete_job(job_id)
+    _jobs_changed()
 
     return jsonify({'message': 'Job deleted successfully'})
 
 
-@app.route('/api/videos/upload', methods=['POST'])
-def upload_video():
-    """
-    Upload a video file temporarily for use in stitching
+def _upload_part_path(job_id):
+    """Where an upload is written until it is complete (same filesystem as VIDEO_DIR, so it can be renamed)"""
+    return VIDEO_DIR / f".{job_id}.mp4.part"
 
-    Expects multipart/form-data with a 'video' file field
 
-    Response:
-    {
-        "success": true,
-        "job_id": "uploaded_job_id",
-        "filename": "uploaded_video.mp4",
-        "size": 12345678
-    }
+def _store_upload(job_id, tmp_path, file_hash, original_name):
     """
-    try:
-        # Check if video file is present
-        if 'video' not in request.files:
-            return jsonify({'error': 'No video file provided'}), 400
-
-        video_file = request.files['video']
-
-        if video_file.filename == '':
-            return jsonify({'error': 'No video file selected'}), 400
-
-        # Generate job ID for this upload
-        job_id = str(uuid.uuid4())
-
-        # Save video to disk
-        video_filename = f"{job_id}.mp4"
-        video_path = VIDEO_DIR / video_filename
-        video_file.save(str(video_path))
-
-        # Get file size
-        file_size = video_path.stat().st_size
+    Move a fully received upload into VIDEO_DIR (or drop it for an existing
+    duplicate), record it and return the upload response
+    """
+    video_filename = f"{job_id}.mp4"
+    video_path = VIDEO_DIR / video_filename
+    file_size = tmp_path.stat().st_size
+
+    result = {}
+    duplicate = media_manager.find_duplicate_video(file_hash, media_manager.hash_algo)
+    if duplicate:
+        # Same content is already stored: drop the upload and use the existing video
+        tmp_path.unlink()
+        logger.info(f"Duplicate video detected, using existing ID: {duplicate['id']}")
+        result = {'is_duplicate': True, 'original_id': duplicate['id']}
+        job_id = duplicate['id']
+        video_path = Path(duplicate['file_path'])
+    else:
+        os.replace(tmp_path, video_path)
+        # The dedup check in add_video then finds the hash memoized
+        # instead of reading the whole file back
+        media_manager.remember_file_hash(str(video_path), file_hash)
 
         # Extract metadata
         try:
             video_metadata = metadata_extractor.extract_metadata(str(video_path))
         except Exception as e:
             logger.warning(f"Failed to extract metadata for uploaded video - {str(e)}")
-            video_metadata = {
-                'size_bytes': file_size,
-                'duration_seconds': None,
-                'resolution': None,
-                'aspect_ratio': None,
-                'codec': None,
-                'fps': None
-            }
+            video_metadata = VideoMeta(size_bytes=file_size)
 
         # Add to media manager with deduplication
         try:
             result = media_manager.add_video(
                 video_id=job_id,
-                name=video_file.filename or "Uploaded video",
+                name=original_name or "Uploaded video",
                 file_path=str(video_path),
-                size_bytes=video_metadata['size_bytes'],
+                size_bytes=video_metadata.size_bytes,
                 source_type='uploaded',
-                duration_seconds=video_metadata.get('duration_seconds'),
-                resolution=video_metadata.get('resolution'),
-                aspect_ratio=video_metadata.get('aspect_ratio'),
-                codec=video_metadata.get('codec'),
-                fps=video_metadata.get('fps')
+                duration_seconds=video_metadata.duration_seconds,
+                resolution=video_metadata.resolution,
+                aspect_ratio=video_metadata.aspect_ratio,
+                codec=video_metadata.codec,
+                fps=video_metadata.fps
             )
 
             # If duplicate detected, use the existing video ID
@@ -406,36 +850,294 @@ def upload_video():
         except Exception as e:
             logger.error(f"Failed to add uploaded video to MediaManager - {str(e)}")
 
-        # Create a job entry for the uploaded video
-        uploaded_job = VideoGenerationJob(
-            job_id,
-            "Uploaded video",
-            "upload",
-            {}
-        )
-        uploaded_job.status = 'completed'
-        uploaded_job.progress = 100
-        uploaded_job.video_path = str(video_path)
-        uploaded_job.video_url = f"/api/videos/{job_id}/download"
-        uploaded_job.completed_at = datetime.utcnow().isoformat()
+    # Create a job entry for the uploaded video
+    uploaded_job = VideoGenerationJob(
+        job_id,
+        "Uploaded video",
+        "upload",
+        {}
+    )
+    uploaded_job.status = 'completed'
+    uploaded_job.progress = 100
+    uploaded_job.video_path = str(video_path)
+    uploaded_job.video_url = f"/api/videos/{job_id}/download"
+    uploaded_job.completed_at = datetime.utcnow().isoformat()
 
-        jobs[job_id] = uploaded_job
+    _register_job(uploaded_job)
 
-        logger.info(f"Video upload processed: {video_filename} ({file_size} bytes)")
+    logger.info(f"Video upload processed: {video_filename} ({file_size} bytes)")
 
-        return jsonify({
-            'success': True,
-            'job_id': job_id,
-            'filename': video_path.name,
-            'size': file_size,
-            'is_duplicate': result.get('is_duplicate', False) if 'result' in locals() else False
-        })
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'filename': video_path.name,
+        'size': file_size,
+        'is_duplicate': result.get('is_duplicate', False)
+    })
+
+
+@app.route('/api/videos/upload', methods=['POST'])
+def upload_video():
+    """
+    Upload a video file temporarily for use in stitching
+
+    Expects multipart/form-data with a 'video' file field
+
+    Response:
+    {
+        "success": true,
+        "job_id": "uploaded_job_id",
+        "filename": "uploaded_video.mp4",
+        "size": 12345678
+    }
+    """
+    try:
+        # Check if video file is present
+        if 'video' not in request.files:
+            return jsonify({'error': 'No video file provided'}), 400
+
+        video_file = request.files['video']
+
+        if video_file.filename == '':
+            return jsonify({'error': 'No video file selected'}), 400
+
+        # Generate job ID for this upload
+        job_id = str(uuid.uuid4())
+
+        # Save video to disk under a temporary name, hashing while copying,
+        # so a duplicate is recognised before it is moved into place
+        tmp_path = _upload_part_path(job_id)
+        hasher = media_manager.content_hasher()
+        try:
+            with open(tmp_path, 'wb', buffering=0) as out:
+                while chunk := video_file.stream.read(UPLOAD_CHUNK_SIZE):
+                    out.write(chunk)
+                    hasher.update(chunk)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        file_hash = hasher.hexdigest()
+
+        return _store_upload(job_id, tmp_path, file_hash, video_file.filename)
 
     except Exception as e:
         logger.error(f"Failed to upload video: {str(e)}")
         return jsonify({'error': str(e), 'success': False}), 500
 
 
+class UploadSession:
+    """A resumable upload: which byte ranges of the .part file have arrived"""
+
+    def __init__(self, upload_id, filename, size):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.size = size
+        self.path = _upload_part_path(upload_id)
+        # Received [start, end) ranges, sorted and merged
+        self.ranges = []
+        self.completing = False
+        # PUTs still writing; guarded by _upload_sessions_lock, like completing
+        self.writers = 0
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def offset(self):
+        """Length of the contiguous prefix received so far, i.e. where to resume"""
+        return self.ranges[0][1] if self.ranges and self.ranges[0][0] == 0 else 0
+
+    def add_range(self, start, end):
+        """Record bytes [start, end) as received"""
+        with self.lock:
+            merged = []
+            for r_start, r_end in sorted(self.ranges + [[start, end]]):
+                if merged and r_start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], r_end)
+                else:
+                    merged.append([r_start, r_end])
+            self.ranges = merged
+            self.updated_at = time.monotonic()
+
+
+# Resumable uploads in progress, keyed by upload id (which becomes the job id).
+# Sessions idle longer than this are dropped with their partial file; every
+# init, PUT and complete sweeps for them.
+upload_sessions = {}
+_upload_sessions_lock = threading.Lock()
+UPLOAD_SESSION_TTL_SECONDS = float(os.environ.get('UPLOAD_SESSION_TTL_HOURS', 24)) * 3600
+
+
+def _expire_upload_sessions():
+    """Drop upload sessions nobody has written to within the TTL"""
+    cutoff = time.monotonic() - UPLOAD_SESSION_TTL_SECONDS
+    with _upload_sessions_lock:
+        expired = [
+            session for session in upload_sessions.values()
+            if session.updated_at < cutoff and not session.completing and not session.writers
+        ]
+        for session in expired:
+            del upload_sessions[session.upload_id]
+    for session in expired:
+        session.path.unlink(missing_ok=True)
+        logger.info(f"Upload {session.upload_id} expired")
+
+
+def _upload_progress(session, status=200):
+    """Response telling the client where to resume"""
+    response = jsonify({
+        'upload_id': session.upload_id,
+        'offset': session.offset,
+        'size': session.size
+    })
+    response.status_code = status
+    response.headers['Upload-Offset'] = str(session.offset)
+    return response
+
+
+@app.route('/api/videos/upload/init', methods=['POST'])
+def init_upload():
+    """
+    Start a resumable upload
+
+    Request body:
+    {
+        "filename": "clip.mp4",  // Optional
+        "size": 12345678  // Total size in bytes
+    }
+
+    Response (201): {"upload_id": "...", "offset": 0, "size": 12345678}
+    Send the bytes with PUT /api/videos/upload/<upload_id> and a
+    "Content-Range: bytes start-end/size" header, in any order and in
+    parallel; then POST /api/videos/upload/<upload_id>/complete.
+    """
+    try:
+        data = request.get_json() or {}
+        size = data.get('size')
+        if not isinstance(size, int) or size <= 0:
+            return jsonify({'error': 'size must be a positive integer'}), 400
+        if size > app.config['MAX_CONTENT_LENGTH']:
+            return jsonify({'error': 'File too large'}), 413
+
+        _expire_upload_sessions()
+
+        session = UploadSession(str(uuid.uuid4()), data.get('filename'), size)
+        # Preallocate (sparsely) so chunks can be written at any offset
+        with open(session.path, 'wb') as f:
+            f.truncate(size)
+        with _upload_sessions_lock:
+            upload_sessions[session.upload_id] = session
+
+        logger.info(f"Upload {session.upload_id} started ({size} bytes)")
+        return _upload_progress(session, 201)
+
+    except Exception as e:
+        logger.error(f"Failed to start upload: {str(e)}")
+        return jsonify({'error': str(e), 'success': False}), 500
+
+
+@app.route('/api/videos/upload/<job_id:upload_id>', methods=['HEAD', 'GET'])
+def get_upload(upload_id):
+    """Where to resume an upload (also in the Upload-Offset header)"""
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    return _upload_progress(session)
+
+
+@app.route('/api/videos/upload/<job_id:upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    """
+    Write one chunk of a resumable upload
+
+    Headers:
+        Content-Range: bytes start-end/size (end inclusive)
+
+    A dropped connection keeps whatever arrived; the response's offset
+    (and Upload-Offset header) is where the client should resume.
+    """
+    _expire_upload_sessions()
+    content_range = parse_content_range_header(request.headers.get('Content-Range'))
+
+    # Checked and registered under the lock complete_upload takes, so it
+    # never hashes the file while a chunk is still being written
+    with _upload_sessions_lock:
+        session = upload_sessions.get(upload_id)
+        if session is None or session.completing:
+            return jsonify({'error': 'Upload not found'}), 404
+        # werkzeug accepts an end past the total, which would grow the file
+        if (content_range is None or content_range.units != 'bytes'
+                or content_range.length != session.size or content_range.stop > session.size):
+            return jsonify({'error': f'Content-Range must be bytes start-end/{session.size}'}), 416
+        session.writers += 1
+
+    start, stop = content_range.start, content_range.stop
+    position = start
+    try:
+        fd = os.open(session.path, os.O_WRONLY)
+        try:
+            while position < stop:
+                chunk = request.stream.read(min(UPLOAD_CHUNK_SIZE, stop - position))
+                if not chunk:
+                    break
+                os.pwrite(fd, chunk, position)
+                position += len(chunk)
+        finally:
+            os.close(fd)
+    except Exception as e:
+        logger.error(f"Upload {upload_id}: failed to write chunk - {str(e)}")
+    finally:
+        if position > start:
+            session.add_range(start, position)
+        with _upload_sessions_lock:
+            session.writers -= 1
+
+    return _upload_progress(session)
+
+
+@app.route('/api/videos/upload/<job_id:upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    """
+    Finish a resumable upload once every byte has arrived
+
+    Response: same as POST /api/videos/upload. 409 (with the resume offset)
+    while bytes are missing or a chunk is still being written.
+    """
+    _expire_upload_sessions()
+
+    with _upload_sessions_lock:
+        session = upload_sessions.get(upload_id)
+        if session is None or session.completing:
+            return jsonify({'error': 'Upload not found'}), 404
+        if session.writers or session.offset < session.size:
+            return _upload_progress(session, 409)
+        session.completing = True
+
+    try:
+        # Chunks may have arrived out of order, so hash the finished file
+        hasher = media_manager.content_hasher()
+        with open(session.path, 'rb', buffering=0) as f:
+            while chunk := f.read(UPLOAD_CHUNK_SIZE):
+                hasher.update(chunk)
+        file_hash = hasher.hexdigest()
+    except Exception as e:
+        # Nothing was moved yet, so the client may retry the completion
+        logger.error(f"Failed to complete upload {upload_id}: {str(e)}")
+        with _upload_sessions_lock:
+            session.completing = False
+            session.updated_at = time.monotonic()
+        return jsonify({'error': str(e), 'success': False}), 500
+
+    with _upload_sessions_lock:
+        del upload_sessions[upload_id]
+
+    try:
+        return _store_upload(upload_id, session.path, file_hash, session.filename)
+    except Exception as e:
+        logger.error(f"Failed to complete upload {upload_id}: {str(e)}")
+        session.path.unlink(missing_ok=True)
+        return jsonify({'error': str(e), 'success': False}), 500
+
+
 @app.route('/api/prompts/generate', methods=['POST'])
 def generate_prompts():
     """
@@ -447,7 +1149,8 @@ def generate_prompts():
         "user_prompt": "Generate prompts for...",
         "prompt_count": 5,
         "temperature": 0.7,  // optional
-        "max_tokens": 2000   // optional
+        "max_tokens": 2000,  // optional
+        "stream": false      // optional
     }
 
     Response:
@@ -456,6 +1159,11 @@ def generate_prompts():
         "count": 5,
         "success": true
     }
+
+    With "stream": true the response is NDJSON instead: one {"prompt": ...}
+    line per prompt as soon as it is generated, then a final
+    {"success": true, "count": N} line ({"success": false, "error": ...}
+    if generation fails part-way).
     """
     try:
         data = request.get_json()
@@ -479,8 +1187,33 @@ def generate_prompts():
 
         logger.info(f"Generating {prompt_count} prompts with GPT")
 
-        # Initialize prompt generator (will use OPENAI_API_KEY from env)
-        generator = PromptGenerator()
+        generator = get_prompt_generator()
+
+        if data.get('stream'):
+            prompt_iter = generator.iter_prompts(
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                prompt_count=prompt_count,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            # Pull the first prompt before responding so validation and API
+            # errors still map to a 400/500 status
+            first_prompt = next(prompt_iter)
+
+            def generate_lines():
+                yield _dumps({'prompt': first_prompt}) + b'\n'
+                count = 1
+                try:
+                    for prompt in prompt_iter:
+                        count += 1
+                        yield _dumps({'prompt': prompt}) + b'\n'
+                    yield _dumps({'success': True, 'count': count}) + b'\n'
+                except Exception as e:
+                    logger.error(f"Failed to stream prompts: {str(e)}")
+                    yield _dumps({'success': False, 'error': str(e)}) + b'\n'
+
+            return Response(stream_with_context(generate_lines()), mimetype='application/x-ndjson')
 
         # Generate prompts
         prompts = generator.generate_prompts(
@@ -509,6 +1242,59 @@ def generate_prompts():
         return jsonify({'error': str(e), 'success': False}), 500
 
 
+# Keys of a /api/prompts/generate-batch entry passed to the generator
+PROMPT_SPEC_KEYS = ('system_prompt', 'user_prompt', 'prompt_count', 'temperature', 'max_tokens')
+
+
+@app.route('/api/prompts/generate-batch', methods=['POST'])
+def generate_prompts_batch():
+    """
+    Generate several independent prompt sets, with the GPT calls made concurrently
+
+    Request body:
+    {
+        "requests": [
+            {"system_prompt": "...", "user_prompt": "...", "prompt_count": 5},
+            ...
+        ]  // Each entry takes the /api/prompts/generate fields (without "stream"); max 20
+    }
+
+    Response:
+    {
+        "results": [{"prompts": [...], "count": 5}, ...],  // In request order
+        "success": true
+    }
+    """
+    try:
+        data = request.get_json()
+        specs = data.get('requests')
+
+        if not specs or not isinstance(specs, list) or not all(isinstance(spec, dict) for spec in specs):
+            return jsonify({'error': 'requests is required and must be a non-empty list of objects'}), 400
+        if len(specs) > 20:
+            return jsonify({'error': 'Too many requests (max 20)'}), 400
+
+        logger.info(f"Generating {len(specs)} prompt sets with GPT")
+
+        generator = get_prompt_generator()
+        results = generator.generate_prompts_many([
+            {key: spec.get(key) for key in PROMPT_SPEC_KEYS} for spec in specs
+        ])
+
+        return jsonify({
+            'success': True,
+            'results': [{'prompts': prompts, 'count': len(prompts)} for prompts in results]
+        })
+
+    except ValueError as e:
+        logger.error(f"Validation error: {str(e)}")
+        return jsonify({'error': str(e), 'success': False}), 400
+
+    except Exception as e:
+        logger.error(f"Failed to generate prompt batch: {str(e)}")
+        return jsonify({'error': str(e), 'success': False}), 500
+
+
 @app.route('/api/prompts/generate-episodes', methods=['POST'])
 def generate_episode_prompts():
     """
@@ -546,8 +1332,7 @@ def generate_episode_prompts():
 
         logger.info(f"Generating {episode_count} episode prompts")
 
-        # Initialize prompt generator
-        generator = PromptGenerator()
+        generator = get_prompt_generator()
 
         # Generate episode prompts using convenience method
         prompts = generator.generate_episode_prompts(
@@ -573,6 +1358,161 @@ def generate_episode_prompts():
         return jsonify({'error': str(e), 'success': False}), 500
 
 
+# Listing of VIDEO_DIR shared by requests within VIDEO_DIR_SNAPSHOT_SECONDS.
+# A file created since is simply not in it and gets stat()ed instead.
+VIDEO_DIR_SNAPSHOT_SECONDS = 1.0
+_video_dir_snapshot = (0.0, {})
+_video_dir_snapshot_lock = threading.Lock()
+
+
+def _video_dir_entries():
+    """Files in VIDEO_DIR by name -> path, from one scandir at most every VIDEO_DIR_SNAPSHOT_SECONDS"""
+    global _video_dir_snapshot
+    with _video_dir_snapshot_lock:
+        taken_at, entries = _video_dir_snapshot
+        if time.monotonic() - taken_at >= VIDEO_DIR_SNAPSHOT_SECONDS:
+            taken_at = time.monotonic()
+            with os.scandir(VIDEO_DIR) as it:
+                entries = {entry.name: entry.path for entry in it if entry.is_file()}
+            _video_dir_snapshot = (taken_at, entries)
+        return entries
+
+
+def _parse_renditions(value):
+    """extra_renditions from a request body ("1280x720" or [1280, 720] each) as (width, height) pairs"""
+    sizes = []
+    for size in value or []:
+        try:
+            width, height = size.split('x') if isinstance(size, str) else size
+            sizes.append((int(width), int(height)))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid rendition size: {size}")
+    return sizes
+
+
+def _rendition_summaries(result):
+    """The client-facing part of each rendition in a _run_stitch result"""
+    return [
+        {key: rendition[key] for key in ('video_id', 'filename', 'resolution', 'size')}
+        for rendition in result['renditions']
+    ]
+
+
+def _run_stitch(stitched_job_id, video_paths, video_ids, normalize, target_resolution,
+                extra_renditions=None, progress_callback=None):
+    """
+    Stitch on a stitch_executor worker and record the output (and each extra
+    rendition, under its own video_id); returns the stitcher result
+    """
+    # The stitcher copies the streams itself when the inputs already match
+    # (and falls back to re-encoding if that fails)
+    result = video_stitcher.stitch_videos(
+        input_videos=video_paths,
+        normalize=normalize,
+        target_resolution=target_resolution,
+        extra_renditions=extra_renditions,
+        progress_callback=progress_callback
+    )
+
+    # Metadata for the stitched video, from the probe the stitcher already ran
+    stitched_path = result['output_path']
+    try:
+        video_metadata = metadata_extractor.metadata_from_probe(stitched_path, result['probe'])
+    except Exception as e:
+        logger.warning(f"Failed to extract metadata for stitched video - {str(e)}")
+        video_metadata = VideoMeta(
+            size_bytes=Path(stitched_path).stat().st_size,
+            duration_seconds=result.get('duration'),
+            resolution=result.get('resolution'),
+            codec=result.get('codec')
+        )
+
+    # Add to media manager
+    try:
+        mm_result = media_manager.add_video(
+            video_id=stitched_job_id,
+            name=f"Stitched video from {len(video_paths)} inputs",
+            file_path=stitched_path,
+            size_bytes=video_metadata.size_bytes,
+            source_type='stitched',
+            duration_seconds=video_metadata.duration_seconds,
+            resolution=video_metadata.resolution,
+            aspect_ratio=video_metadata.aspect_ratio,
+            codec=video_metadata.codec,
+            fps=video_metadata.fps,
+            metadata={
+                'input_count': len(video_paths),
+                'input_video_ids': video_ids,
+                'normalize': normalize,
+                'target_resolution': target_resolution,
+                'copy_mode': result['copy_mode']
+            },
+            # Don't hold the response while a long output is hashed
+            defer_hash=True
+        )
+        logger.info(f"Stitched video added to MediaManager: {stitched_job_id}")
+    except Exception as e:
+        logger.error(f"Failed to add stitched video to MediaManager - {str(e)}")
+
+    for rendition in result['renditions']:
+        rendition['video_id'] = str(uuid.uuid4())
+    if result['renditions']:
+        try:
+            media_manager.add_videos_bulk([
+                {
+                    'video_id': rendition['video_id'],
+                    'name': f"Stitched video from {len(video_paths)} inputs ({rendition['resolution']})",
+                    'file_path': rendition['output_path'],
+                    'size_bytes': rendition['size'],
+                    'source_type': 'stitched',
+                    'duration_seconds': video_metadata.duration_seconds,
+                    'resolution': rendition['resolution'],
+                    'metadata': {'rendition_of': stitched_job_id},
+                    'defer_hash': True
+                }
+                for rendition in result['renditions']
+            ])
+        except Exception as e:
+            logger.error(f"Failed to add stitched renditions to MediaManager - {str(e)}")
+
+    return result
+
+
+def _stitch_progress(job):
+    """progress_callback for an async stitch: moves job.progress by whole percents, up to 99"""
+    lock = threading.Lock()
+
+    def report(fraction):
+        percent = min(int(fraction * 100), 99)
+        # Each update is persisted and broadcast, so skip the ones that change nothing.
+        # Segments report from several threads; the lock keeps progress from going back.
+        with lock:
+            if percent > (job.progress or 0):
+                job.update(progress=percent)
+    return report
+
+
+def _finish_stitch_job(job, future):
+    """Done callback for an async stitch: move its job to completed or failed"""
+    try:
+        result = future.result()
+    except Exception as e:
+        job.update(status='failed', error=str(e))
+        logger.error(f"Job {job.job_id}: Stitching failed - {str(e)}")
+        return
+
+    job.update(
+        status='completed',
+        progress=100,
+        # Clients find the extra renditions in the job's settings
+        settings={**job.settings, 'renditions': _rendition_summaries(result)},
+        video_path=result['output_path'],
+        video_url=f"/api/videos/{job.job_id}/download",
+        completed_at=datetime.utcnow().isoformat()
+    )
+    logger.info(f"Successfully stitched videos: {result['output_path']}")
+
+
 @app.route('/api/videos/stitch', methods=['POST'])
 def stitch_videos():
     """
@@ -582,7 +1522,9 @@ def stitch_videos():
     {
         "video_ids": ["job_id1", "job_id2", "job_id3"],  // List of job IDs or file paths
         "normalize": true,  // Optional, default: true
-        "target_resolution": "1920x1080"  // Optional
+        "target_resolution": "1920x1080",  // Optional
+        "extra_renditions": ["1280x720", "854x480"],  // Optional; more sizes, each added to the library
+        "async": false  // Optional; true returns 202 right away, follow the job via /status or /events
     }
 
     Response:
@@ -593,14 +1535,19 @@ def stitch_videos():
         "duration": 30.5,
         "size": 12345678,
         "resolution": "1920x1080",
-        "input_count": 3
+        "input_count": 3,
+        "renditions": [{"video_id": "...", "filename": "...", "resolution": "1280x720", "size": 4567890}]
     }
+
+    An async job lists its renditions under settings.renditions once completed.
     """
     try:
         data = request.get_json()
         video_ids = data.get('video_ids', [])
         normalize = data.get('normalize', True)
         target_resolution = data.get('target_resolution')
+        extra_renditions = _parse_renditions(data.get('extra_renditions'))
+        run_async = data.get('async', False)
 
         # Validate input
         if not video_ids or len(video_ids) == 0:
@@ -611,76 +1558,78 @@ def stitch_videos():
 
         logger.info(f"Stitching {len(video_ids)} videos together")
 
-        # Resolve video paths from job IDs
+        # Resolve video paths from job IDs. One directory listing answers
+        # every id that lives in VIDEO_DIR; only other paths are stat()ed.
+        dir_entries = _video_dir_entries()
+
+        def in_video_dir(path):
+            return Path(path).parent == VIDEO_DIR and Path(path).name in dir_entries
+
+        # Ids that are neither live jobs nor filenames come from the library
+        # in one query
+        stored = media_manager.get_videos_bulk(
+            [video_id for video_id in video_ids if video_id not in jobs and video_id not in dir_entries]
+        )
+
         video_paths = []
+        missing = []
         for video_id in video_ids:
             # Check if it's a job ID
             job = jobs.get(video_id)
-            if job and job.video_path and Path(job.video_path).exists():
+            stored_video = stored.get(video_id)
+            if job and job.video_path and (in_video_dir(job.video_path) or Path(job.video_path).exists()):
                 video_paths.append(job.video_path)
+            # Check if it's a filename in VIDEO_DIR
+            elif video_id in dir_entries:
+                video_paths.append(dir_entries[video_id])
+            # Check if it's a video in the library
+            elif stored_video and (in_video_dir(stored_video['file_path']) or Path(stored_video['file_path']).exists()):
+                video_paths.append(stored_video['file_path'])
             # Check if it's a direct file path
             elif Path(video_id).exists():
                 video_paths.append(str(video_id))
-            # Check if it's a filename in VIDEO_DIR
+            # Check if it's a relative path below VIDEO_DIR
             elif (VIDEO_DIR / video_id).exists():
                 video_paths.append(str(VIDEO_DIR / video_id))
             else:
-                return jsonify({'error': f'Video not found: {video_id}'}), 404
+                missing.append(video_id)
+
+        if missing:
+            return jsonify({'error': f"Video not found: {', '.join(missing)}", 'missing': missing}), 404
 
         if len(video_paths) == 0:
             return jsonify({'error': 'No valid video files found'}), 400
 
-        # Initialize video stitcher
-        stitcher = VideoStitcher(output_dir=str(VIDEO_DIR))
-
-        # Stitch videos
-        result = stitcher.stitch_videos(
-            input_videos=video_paths,
-            normalize=normalize,
-            target_resolution=target_resolution
-        )
-
-        # Extract metadata for the stitched video
-        stitched_path = result['output_path']
-        try:
-            video_metadata = metadata_extractor.extract_metadata(stitched_path)
-        except Exception as e:
-            logger.warning(f"Failed to extract metadata for stitched video - {str(e)}")
-            video_metadata = {
-                'size_bytes': Path(stitched_path).stat().st_size,
-                'duration_seconds': result.get('duration'),
-                'resolution': result.get('resolution'),
-                'aspect_ratio': None,
-                'codec': result.get('codec'),
-                'fps': None
-            }
-
         # Create a job entry for the stitched video
         stitched_job_id = str(uuid.uuid4())
+        stitch_args = (stitched_job_id, video_paths, video_ids, normalize, target_resolution, extra_renditions)
+
+        if run_async:
+            stitched_job = VideoGenerationJob(
+                stitched_job_id,
+                f"Stitched video from {len(video_paths)} inputs",
+                "stitcher",
+                {"input_count": len(video_paths)}
+            )
+            stitched_job.status = 'processing'
+            _register_job(stitched_job)
 
-        # Add to media manager
-        try:
-            mm_result = media_manager.add_video(
-                video_id=stitched_job_id,
-                name=f"Stitched video from {len(video_paths)} inputs",
-                file_path=stitched_path,
-                size_bytes=video_metadata['size_bytes'],
-                source_type='stitched',
-                duration_seconds=video_metadata.get('duration_seconds'),
-                resolution=video_metadata.get('resolution'),
-                aspect_ratio=video_metadata.get('aspect_ratio'),
-                codec=video_metadata.get('codec'),
-                fps=video_metadata.get('fps'),
-                metadata={
-                    'input_count': len(video_paths),
-                    'input_video_ids': video_ids,
-                    'normalize': normalize,
-                    'target_resolution': target_resolution
-                }
+            stitched_job.future = stitch_executor.submit(
+                _run_stitch, *stitch_args, progress_callback=_stitch_progress(stitched_job)
             )
-            logger.info(f"Stitched video added to MediaManager: {stitched_job_id}")
-        except Exception as e:
-            logger.error(f"Failed to add stitched video to MediaManager - {str(e)}")
+            stitched_job.future.add_done_callback(
+                lambda future: _finish_stitch_job(stitched_job, future)
+            )
+
+            return jsonify({
+                'success': True,
+                'job_id': stitched_job_id,
+                'status': 'processing',
+                'status_url': f"/api/videos/{stitched_job_id}/status",
+                'events_url': f"/api/videos/{stitched_job_id}/events"
+            }), 202
+
+        result = stitch_executor.submit(_run_stitch, *stitch_args).result()
 
         # Create legacy job entry
         stitched_job = VideoGenerationJob(
@@ -695,7 +1644,7 @@ def stitch_videos():
         stitched_job.video_url = f"/api/videos/{stitched_job_id}/download"
         stitched_job.completed_at = datetime.utcnow().isoformat()
 
-        jobs[stitched_job_id] = stitched_job
+        _register_job(stitched_job)
 
         logger.info(f"Successfully stitched videos: {result['output_path']}")
 
@@ -709,6 +1658,7 @@ def stitch_videos():
             'resolution': result['resolution'],
             'codec': result['codec'],
             'input_count': result['input_count'],
+            'renditions': _rendition_summaries(result),
             'video_url': stitched_job.video_url
         })
 
@@ -817,8 +1767,13 @@ def list_workflows():
     """List all workflows with optional status filter"""
     try:
         status = request.args.get('status')  # Optional filter: 'draft' or 'saved'
+        summary = request.args.get('summary', '').lower() in ('1', 'true', 'yes')
 
-        workflows = media_manager.list_workflows(status=status)
+        # Summary listings skip the (potentially large) workflow definitions
+        if summary:
+            workflows = media_manager.list_workflows_summary(status=status)
+        else:
+            workflows = media_manager.list_workflows(status=status)
 
         return jsonify({
             'success': True,
@@ -945,4 +1900,6 @@ def associate_workflow_video(workflow_id):
 if __name__ == '__main__':
     logger.info("Starting Video Generation Service...")
     logger.info(f"Video storage directory: {VIDEO_DIR}")
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    # Development server; for anything else use gunicorn -c gunicorn.conf.py video_service:app
+    debug = os.environ.get('FLASK_DEBUG', '').lower() in ('1', 'true', 'yes')
+    app.run(host='0.0.0.0', port=5001, debug=debug, threaded=True)
@@ -4,15 +4,230 @@ Concatenates multiple video files into a single output video using ffmpeg.
 """
 
 import os
+import asyncio
 import logging
+import collections
+import subprocess
 import tempfile
+import threading
 import uuid
-from typing import List, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 import ffmpeg
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Stream properties that must match across inputs for a stream-copy concat
+VIDEO_COPY_KEYS = ('codec_name', 'width', 'height', 'r_frame_rate', 'pix_fmt')
+AUDIO_COPY_KEYS = ('codec_name', 'sample_rate', 'channel_layout')
+
+# codec_name that ffprobe reports for a stream made by each encoder; other
+# encoders are assumed to share their codec's name (e.g. 'aac')
+ENCODER_CODECS = {
+    'libx264': 'h264', 'h264_nvenc': 'h264', 'h264_qsv': 'h264', 'h264_videotoolbox': 'h264',
+    'libx265': 'hevc', 'libvpx': 'vp8', 'libvpx-vp9': 'vp9', 'libaom-av1': 'av1',
+    'libsvtav1': 'av1', 'libopus': 'opus', 'libmp3lame': 'mp3', 'libvorbis': 'vorbis'
+}
+
+# ffprobe results kept per stitcher, keyed by (path, mtime, size)
+PROBE_CACHE_SIZE = 256
+
+# MP4 muxer options per streaming_mode. 'faststart' rewrites the finished
+# file once to put the index (moov) first, for progressive download;
+# 'fragmented' writes it up front (no rewrite pass) for HLS/DASH-style
+# delivery, at the cost of seeking in plain players; 'none' leaves it at the end.
+STREAMING_MODES = {
+    'faststart': {'movflags': 'faststart'},
+    'fragmented': {'movflags': 'frag_keyframe+empty_moov+default_base_moof', 'frag_duration': 2000000},
+    'none': {}
+}
+
+# Hardware H.264 encoders tried in place of libx264, in order of preference.
+# STITCH_HW_ENCODER=none keeps libx264; naming one of these forces it.
+HW_ENCODERS = ('h264_nvenc', 'h264_qsv', 'h264_videotoolbox')
+
+# libx264 preset -> NVENC preset (p1 fastest .. p7 slowest)
+NVENC_PRESETS = {
+    'ultrafast': 'p1', 'superfast': 'p1', 'veryfast': 'p2', 'faster': 'p3',
+    'fast': 'p3', 'medium': 'p4', 'slow': 'p5', 'slower': 'p6', 'veryslow': 'p7'
+}
+# QSV takes the libx264 names from veryfast up
+QSV_PRESETS = {'ultrafast': 'veryfast', 'superfast': 'veryfast'}
+
+# Constant-quality level used for quality='auto' (CRF for x264/x265, CQ for NVENC)
+DEFAULT_QUALITY = 23
+BITRATE_SUFFIXES = {'k': 1000, 'm': 1000000}
+
+# How much of ffmpeg's stderr is kept for error messages: the last
+# STDERR_TAIL_CHUNKS reads of up to STDERR_CHUNK_SIZE bytes each (~1MB)
+STDERR_CHUNK_SIZE = 1 << 16
+STDERR_TAIL_CHUNKS = 16
+# ...of which the last this many bytes go into logs and RuntimeError messages
+ERROR_MESSAGE_BYTES = 4096
+
+
+def ffmpeg_error_message(error: ffmpeg.Error) -> str:
+    """
+    The end of a failed run's stderr as text. The tail may start partway
+    through a UTF-8 character (paths are often non-ASCII), so bad bytes are
+    replaced rather than raised on.
+    """
+    if not error.stderr:
+        return str(error)
+    return error.stderr[-ERROR_MESSAGE_BYTES:].decode(errors='replace')
+
+
+def frame_rate(stream: Dict[str, Any]) -> Optional[Fraction]:
+    """A video stream's r_frame_rate as an exact fraction (e.g. 30000/1001), or None if unknown"""
+    try:
+        rate = Fraction(stream.get('r_frame_rate', ''))
+    except (ValueError, ZeroDivisionError):
+        return None
+    return rate or None
+
+
+def run_ffmpeg(
+    stream,
+    stdin_data: Optional[bytes] = None,
+    on_progress: Optional[Callable[[float], None]] = None
+):
+    """
+    Run an ffmpeg-python stream, feeding it stdin_data on stdin.
+
+    Unlike stream.run(capture_stderr=True), stderr is drained as it is
+    written and only its tail is kept, so a long job's progress output
+    neither grows in memory nor fills the pipe. With on_progress, ffmpeg
+    also reports its output position there (-progress), and on_progress
+    is called from the draining thread with the seconds written so far.
+
+    Raises:
+        ffmpeg.Error: On a nonzero exit, with the stderr tail as e.stderr
+    """
+    if on_progress is not None:
+        stream = stream.global_args('-progress', 'pipe:2', '-nostats')
+    args = stream.compile()
+    proc = subprocess.Popen(
+        args,
+        stdin=subprocess.PIPE if stdin_data is not None else subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE
+    )
+    # Read in chunks rather than lines: progress updates end in \r, not \n
+    tail = collections.deque(maxlen=STDERR_TAIL_CHUNKS)
+
+    def drain():
+        partial = b''
+        for chunk in iter(lambda: proc.stderr.read1(STDERR_CHUNK_SIZE), b''):
+            tail.append(chunk)
+            if on_progress is None:
+                continue
+            *lines, partial = (partial + chunk).split(b'\n')
+            for line in lines:
+                if line.startswith(b'out_time_us='):
+                    report_progress(line[len(b'out_time_us='):])
+
+    def report_progress(value):
+        try:
+            seconds = int(value) / 1000000
+        except ValueError:
+            # N/A until the first frame is written
+            return
+        try:
+            on_progress(max(seconds, 0.0))
+        except Exception as e:
+            # Keep draining, or ffmpeg would block on a full pipe
+            logger.warning(f"Progress callback failed: {e}")
+
+    drainer = threading.Thread(target=drain, daemon=True)
+    drainer.start()
+    try:
+        if stdin_data is not None:
+            try:
+                proc.stdin.write(stdin_data)
+                proc.stdin.close()
+            except BrokenPipeError:
+                # ffmpeg exited early; its exit code and stderr say why
+                pass
+        retcode = proc.wait()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        drainer.join()
+        proc.stderr.close()
+    if retcode:
+        raise ffmpeg.Error(args[0], b'', b''.join(tail))
+
+
+def parse_bitrate(bitrate: str) -> int:
+    """A bitrate such as '4M', '2500k' or '800000' in bits per second"""
+    text = bitrate.strip().lower()
+    scale = BITRATE_SUFFIXES.get(text[-1:], 1)
+    if scale != 1:
+        text = text[:-1]
+    try:
+        value = int(float(text) * scale)
+    except ValueError:
+        value = 0
+    if value <= 0:
+        raise ValueError(f"Invalid bitrate: {bitrate}")
+    return value
+
+
+@lru_cache(maxsize=1)
+def ffmpeg_encoders() -> frozenset:
+    """Names of the encoders ffmpeg was built with (empty if it can't run). Listed once per process."""
+    try:
+        listed = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-encoders'],
+            capture_output=True, text=True, timeout=10
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return frozenset()
+
+    # The table follows a legend that ends with a ' ------' line;
+    # each row is ' <flags> <name> <description>'
+    _, _, table = listed.partition('------')
+    return frozenset(
+        fields[1] for fields in (line.split() for line in table.splitlines())
+        if len(fields) >= 2
+    )
+
+
+@lru_cache(maxsize=1)
+def detect_hw_encoder() -> Optional[str]:
+    """
+    The first HW_ENCODERS entry that can actually encode here, or None.
+
+    ffmpeg lists encoders it was built with even when there is no device
+    for them, so each candidate is confirmed with a tiny test encode.
+    Checked once per process.
+    """
+    setting = os.environ.get('STITCH_HW_ENCODER', 'auto').strip().lower()
+    if setting in ('none', 'off', '0', 'false'):
+        return None
+
+    listed = ffmpeg_encoders()
+    candidates = HW_ENCODERS if setting == 'auto' else (setting,)
+    for encoder in candidates:
+        if encoder not in listed:
+            continue
+        try:
+            test = subprocess.run(
+                ['ffmpeg', '-hide_banner', '-v', 'error', '-f', 'lavfi',
+                 '-i', 'color=size=256x256:duration=0.1', '-c:v', encoder, '-f', 'null', '-'],
+                capture_output=True, timeout=20
+            )
+        except (OSError, subprocess.SubprocessError):
+            continue
+        if test.returncode == 0:
+            logger.info(f"Using hardware encoder {encoder} for stitching")
+            return encoder
+    return None
+
 
 class VideoStitcher:
     """
@@ -21,18 +236,33 @@ class VideoStitcher:
     Attributes:
         output_dir (str): Directory to save stitched videos
         temp_dir (str): Directory for temporary files during processing
+        threads_per_job (int): Threads each ffmpeg encode may use
+        max_concurrent_jobs (int): Stitches allowed to run ffmpeg at the same time
     """
 
-    def __init__(self, output_dir: str = "videos", temp_dir: Optional[str] = None):
+    def __init__(
+        self,
+        output_dir: str = "videos",
+        temp_dir: Optional[str] = None,
+        max_concurrent_jobs: Optional[int] = None,
+        threads_per_job: int = 4
+    ):
         """
         Initialize the VideoStitcher.
 
         Args:
             output_dir: Directory to save output videos
             temp_dir: Directory for temporary files (uses system temp if None)
+            max_concurrent_jobs: Concurrent stitches; default cpu_count // threads_per_job (at least 1)
+            threads_per_job: Threads per ffmpeg encode
         """
         self.output_dir = output_dir
         self.temp_dir = temp_dir or tempfile.gettempdir()
+        self.threads_per_job = threads_per_job
+        self.max_concurrent_jobs = max_concurrent_jobs or max(1, (os.cpu_count() or 1) // threads_per_job)
+        self._slots = threading.BoundedSemaphore(self.max_concurrent_jobs)
+        self._probe_cache = {}
+        self._probe_cache_lock = threading.Lock()
 
         # Create output directory if it doesn't exist
         os.makedirs(self.output_dir, exist_ok=True)
@@ -45,7 +275,12 @@ class VideoStitcher:
         target_resolution: Optional[str] = None,
         video_codec: str = "libx264",
         audio_codec: str = "aac",
-        preset: str = "medium"
+        preset: str = "medium",
+        copy_mode: Optional[bool] = None,
+        streaming_mode: str = "faststart",
+        quality: Union[int, str] = "auto",
+        extra_renditions: Optional[List[Tuple[int, int]]] = None,
+        progress_callback: Optional[Callable[[float], None]] = None
     ) -> Dict[str, Any]:
         """
         Stitch multiple videos together into a single output video.
@@ -58,9 +293,34 @@ class VideoStitcher:
             video_codec: Video codec to use (default: libx264)
             audio_codec: Audio codec to use (default: aac)
             preset: FFmpeg preset (ultrafast, fast, medium, slow, veryslow)
+            copy_mode: Whether to copy the streams instead of re-encoding.
+                None copies only when that gives what a re-encode would: the
+                inputs are stream-compatible (see _inputs_are_stream_compatible),
+                already in video_codec and audio_codec and at target_resolution,
+                and quality is 'auto'. If that copy fails, the stitch is
+                re-encoded as requested. Without normalize, True requires stream
+                compatibility and raises ValueError, naming the mismatched
+                inputs, before running ffmpeg otherwise; False always re-encodes.
+            streaming_mode: MP4 layout, one of STREAMING_MODES ('faststart',
+                'fragmented' or 'none')
+            quality: Rate control for re-encoding. An int is a constant-quality
+                level (CRF for x264/x265, CQ for NVENC, ICQ for QSV); a bitrate
+                string such as '4M' caps the rate at that bitrate with a 2x VBV
+                buffer; 'auto' is DEFAULT_QUALITY.
+            extra_renditions: Further (width, height) sizes to encode the
+                stitched video at, e.g. [(1280, 720), (854, 480)]. All are
+                written by one ffmpeg pass that decodes the output once.
+                Repeated sizes are encoded once.
+            progress_callback: Called with the fraction (0.0 to 1.0) of the
+                inputs' total duration stitched so far, as ffmpeg reports it,
+                and with 1.0 once the result is ready. May be called from
+                worker threads.
 
         Returns:
-            Dict with output_path, duration, size, and metadata
+            Dict with output_path, duration, size, and metadata, plus
+            'copy_mode' (whether the streams were copied) and 'renditions'
+            (output_path, filename, resolution and size of each extra
+            rendition, in order)
 
         Raises:
             ValueError: If inputs are invalid
@@ -74,6 +334,23 @@ class VideoStitcher:
         if len(input_videos) > 100:
             raise ValueError("Too many input videos (max 100)")
 
+        if streaming_mode not in STREAMING_MODES:
+            raise ValueError(f"Unknown streaming_mode: {streaming_mode}")
+
+        if quality == 'auto':
+            pass
+        elif isinstance(quality, str):
+            parse_bitrate(quality)
+        elif isinstance(quality, bool) or not isinstance(quality, int) or not 0 <= quality <= 51:
+            raise ValueError(f"Invalid quality: {quality}")
+
+        # Renditions are named by size, so each size is encoded once
+        extra_renditions = list(dict.fromkeys(tuple(size) for size in extra_renditions or []))
+        for width, height in extra_renditions:
+            # 4:2:0 encoders need even dimensions
+            if width <= 0 or height <= 0 or width % 2 or height % 2:
+                raise ValueError(f"Invalid rendition size: {width}x{height}")
+
         # Check all input files exist
         for video_path in input_videos:
             if not os.path.exists(video_path):
@@ -88,28 +365,78 @@ class VideoStitcher:
         try:
             logger.info(f"Stitching {len(input_videos)} videos together")
 
-            if normalize:
-                # Normalize videos first, then concatenate
-                output_path = self._stitch_with_normalization(
-                    input_videos,
-                    output_path,
-                    target_resolution,
-                    video_codec,
-                    audio_codec,
-                    preset
-                )
-            else:
-                # Simple concatenation (requires compatible formats)
-                output_path = self._stitch_simple(
-                    input_videos,
-                    output_path,
-                    video_codec,
-                    audio_codec,
-                    preset
-                )
+            # One concurrent pass: every input must be readable by ffprobe,
+            # and the results are cached for the checks below
+            probes = self._probe_all(input_videos)
+
+            progress = None
+            total_duration = sum(float(probe['format'].get('duration', 0)) for probe in probes)
+            if progress_callback is not None and total_duration > 0:
+                def progress(seconds):
+                    progress_callback(min(seconds / total_duration, 1.0))
+
+            # The one place that decides to copy on the caller's behalf
+            auto_copy = copy_mode is None and self._copy_gives_request(
+                input_videos, probes, target_resolution if normalize else None,
+                video_codec, audio_codec, quality
+            )
+            copy_mode = bool(copy_mode)
+
+            if copy_mode and not normalize:
+                # Fail now rather than partway through a copy that cannot work
+                self._assert_concat_compatible(input_videos, probes)
+
+            # At most max_concurrent_jobs stitches run ffmpeg at once; the rest queue here
+            with self._slots:
+                copied = False
+                if auto_copy:
+                    # Every input already has the target format: nothing to re-encode
+                    logger.info("Inputs already match, concatenating without re-encoding")
+                    try:
+                        output_path = self._stitch_simple(
+                            input_videos, output_path, video_codec, audio_codec, preset,
+                            True, streaming_mode, quality, progress
+                        )
+                        copied = True
+                    except ffmpeg.Error as e:
+                        logger.warning(
+                            f"Stream-copy concat failed, re-encoding instead: {ffmpeg_error_message(e)}"
+                        )
+
+                if not copied:
+                    if normalize:
+                        # Normalize videos first, then concatenate
+                        output_path = self._stitch_with_normalization(
+                            input_videos,
+                            output_path,
+                            target_resolution,
+                            video_codec,
+                            audio_codec,
+                            preset,
+                            quality,
+                            streaming_mode,
+                            progress
+                        )
+                    else:
+                        # Simple concatenation (requires compatible formats)
+                        output_path = self._stitch_simple(
+                            input_videos,
+                            output_path,
+                            video_codec,
+                            audio_codec,
+                            preset,
+                            copy_mode,
+                            streaming_mode,
+                            quality,
+                            progress
+                        )
+
+                renditions = self._encode_renditions(
+                    output_path, extra_renditions, video_codec, preset, quality, streaming_mode
+                ) if extra_renditions else []
 
             # Get output video metadata
-            probe = ffmpeg.probe(output_path)
+            probe = self._probe(output_path)
             video_info = next(s for s in probe['streams'] if s['codec_type'] == 'video')
 
             result = {
@@ -119,63 +446,234 @@ class VideoStitcher:
                 "size": int(probe['format']['size']),
                 "resolution": f"{video_info['width']}x{video_info['height']}",
                 "codec": video_info['codec_name'],
-                "input_count": len(input_videos)
+                "input_count": len(input_videos),
+                "renditions": renditions,
+                # Whether the streams were copied rather than re-encoded
+                "copy_mode": copied or (copy_mode and not normalize),
+                # Full ffprobe output, so callers need not probe the file again
+                "probe": probe
             }
 
             logger.info(f"Successfully stitched video: {output_path}")
+            if progress_callback is not None:
+                progress_callback(1.0)
             return result
 
         except ffmpeg.Error as e:
-            error_message = e.stderr.decode() if e.stderr else str(e)
+            error_message = ffmpeg_error_message(e)
             logger.error(f"FFmpeg error during stitching: {error_message}")
             raise RuntimeError(f"Video stitching failed: {error_message}")
         except Exception as e:
             logger.error(f"Error during video stitching: {e}")
             raise
 
+    async def stitch_videos_async(self, input_videos: List[str], **kwargs) -> Dict[str, Any]:
+        """
+        Awaitable stitch_videos, for asyncio callers. The stitch runs on a
+        worker thread (ffmpeg waits there without holding the GIL), and still
+        counts against max_concurrent_jobs.
+        """
+        return await asyncio.to_thread(self.stitch_videos, input_videos, **kwargs)
+
     def _stitch_simple(
         self,
         input_videos: List[str],
         output_path: str,
         video_codec: str,
         audio_codec: str,
-        preset: str
+        preset: str,
+        copy_mode: bool = False,
+        streaming_mode: str = "faststart",
+        quality: Union[int, str] = "auto",
+        progress: Optional[Callable[[float], None]] = None
     ) -> str:
         """
         Simple concatenation using ffmpeg concat demuxer.
         Requires all videos to have the same format/codec/resolution.
+        With copy_mode the streams are copied rather than re-encoded; the
+        caller has checked that they are stream-compatible.
         """
-        # Create concat file list
-        concat_file = os.path.join(self.temp_dir, f"concat_{uuid.uuid4().hex[:8]}.txt")
 
-        try:
-            with open(concat_file, 'w') as f:
-                for video in input_videos:
-                    # Use absolute paths and escape special characters
-                    abs_path = os.path.abspath(video)
-                    f.write(f"file '{abs_path}'\n")
-
-            # Run ffmpeg concat
-            (
-                ffmpeg
-                .input(concat_file, format='concat', safe=0)
-                .output(
-                    output_path,
-                    vcodec=video_codec,
-                    acodec=audio_codec,
-                    preset=preset,
-                    movflags='faststart'  # Enable streaming
-                )
-                .overwrite_output()
-                .run(capture_stdout=True, capture_stderr=True)
+        if copy_mode:
+            output_args = {'c': 'copy'}
+        else:
+            output_args = {
+                'acodec': audio_codec,
+                **self._encoder_args(video_codec, preset, quality),
+                'threads': self.threads_per_job
+            }
+
+        # Run ffmpeg concat, with the file list on stdin
+        run_ffmpeg(
+            self._concat_input()
+            .output(
+                output_path,
+                **STREAMING_MODES[streaming_mode],
+                **output_args
             )
+            .overwrite_output(),
+            stdin_data=self._concat_list(input_videos),
+            on_progress=progress
+        )
 
-            return output_path
+        return output_path
 
-        finally:
-            # Clean up concat file
-            if os.path.exists(concat_file):
-                os.remove(concat_file)
+    @staticmethod
+    def _encoder_args(video_codec: str, preset: str, quality: Union[int, str] = "auto") -> Dict[str, Any]:
+        """
+        ffmpeg output arguments for the video encoder. libx264 is swapped for
+        the detected hardware encoder (see detect_hw_encoder), with the
+        preset translated to that encoder's scale. quality is a
+        constant-quality level or a bitrate string (see stitch_videos).
+        """
+        encoder = detect_hw_encoder() if video_codec == 'libx264' else None
+        if quality == 'auto':
+            quality = DEFAULT_QUALITY
+        if isinstance(quality, str):
+            # Capped bitrate: the VBV buffer holds two seconds at that rate
+            bitrate = parse_bitrate(quality)
+            rate_args = {'b:v': bitrate, 'maxrate': bitrate, 'bufsize': bitrate * 2}
+            if encoder and encoder.endswith('_nvenc'):
+                rate_args['rc'] = 'cbr'
+        elif encoder is None:
+            # Other software encoders have no CRF; leave them at their defaults
+            rate_args = {'crf': quality} if video_codec in ('libx264', 'libx265') else {}
+        elif encoder.endswith('_nvenc'):
+            rate_args = {'rc': 'vbr', 'cq': quality, 'b:v': 0}
+        elif encoder.endswith('_qsv'):
+            rate_args = {'global_quality': quality}
+        else:
+            # VideoToolbox has no constant-quality mode on every platform
+            rate_args = {}
+
+        if encoder is None:
+            return {'vcodec': video_codec, 'preset': preset, **rate_args}
+        if encoder.endswith('_nvenc'):
+            return {'vcodec': encoder, 'preset': NVENC_PRESETS.get(preset, preset), **rate_args}
+        if encoder.endswith('_qsv'):
+            # QSV encodes from NV12
+            return {'vcodec': encoder, 'preset': QSV_PRESETS.get(preset, preset), 'pix_fmt': 'nv12', **rate_args}
+        # VideoToolbox has no presets
+        return {'vcodec': encoder, **rate_args}
+
+    def _probe(self, video_path: str) -> Dict[str, Any]:
+        """ffmpeg.probe, cached until the file's mtime or size changes"""
+        st = os.stat(video_path)
+        key = (os.path.abspath(video_path), st.st_mtime_ns, st.st_size)
+        with self._probe_cache_lock:
+            cached = self._probe_cache.get(key)
+        if cached is not None:
+            return cached
+
+        probe = ffmpeg.probe(video_path)
+        with self._probe_cache_lock:
+            if len(self._probe_cache) >= PROBE_CACHE_SIZE:
+                # Drop the oldest entry (dicts keep insertion order)
+                del self._probe_cache[next(iter(self._probe_cache))]
+            self._probe_cache[key] = probe
+        return probe
+
+    def _probe_all(self, video_paths: List[str]) -> List[Dict[str, Any]]:
+        """
+        Probe several files, in order. Each probe is an ffprobe process, so
+        they run concurrently (at most os.cpu_count() at a time).
+        """
+        if len(video_paths) == 1:
+            return [self._probe(video_paths[0])]
+        with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, len(video_paths))) as pool:
+            return list(pool.map(self._probe, video_paths))
+
+    @staticmethod
+    def _stream_format(probe: Dict[str, Any]) -> tuple:
+        """(video, audio) stream properties that must match for a stream copy"""
+        streams = probe['streams']
+        video = next((st for st in streams if st['codec_type'] == 'video'), None)
+        audio = next((st for st in streams if st['codec_type'] == 'audio'), None)
+        return (
+            video and tuple(video.get(key) for key in VIDEO_COPY_KEYS),
+            audio and tuple(audio.get(key) for key in AUDIO_COPY_KEYS)
+        )
+
+    @classmethod
+    def _assert_concat_compatible(cls, input_videos: List[str], probes: List[Dict[str, Any]]):
+        """
+        Raise ValueError naming every input whose streams differ from the
+        first one's in VIDEO_COPY_KEYS / AUDIO_COPY_KEYS, which a stream-copy
+        concat cannot join.
+        """
+        reference = cls._stream_format(probes[0])
+        mismatched = [
+            path for path, probe in zip(input_videos[1:], probes[1:])
+            if cls._stream_format(probe) != reference
+        ]
+        if mismatched:
+            logger.warning(
+                f"{len(mismatched)} input(s) differ from {input_videos[0]} in their stream "
+                f"format; stitch with normalize=True or copy_mode=False instead"
+            )
+            raise ValueError(
+                f"Inputs cannot be concatenated with stream copy: {', '.join(mismatched)} "
+                f"differ from {input_videos[0]}"
+            )
+
+    def _copy_gives_request(
+        self,
+        input_videos: List[str],
+        probes: List[Dict[str, Any]],
+        target_resolution: Optional[str],
+        video_codec: str,
+        audio_codec: str,
+        quality: Union[int, str]
+    ) -> bool:
+        """
+        True when a stream-copy concat of the inputs gives what re-encoding
+        them was asked for (see copy_mode in stitch_videos)
+        """
+        if not self._inputs_match_request(probes, video_codec, audio_codec, quality):
+            return False
+        if not self._inputs_are_stream_compatible(input_videos):
+            return False
+        video_info = next(st for st in probes[0]['streams'] if st['codec_type'] == 'video')
+        return not target_resolution or target_resolution == f"{video_info['width']}x{video_info['height']}"
+
+    @staticmethod
+    def _inputs_match_request(
+        probes: List[Dict[str, Any]],
+        video_codec: str,
+        audio_codec: str,
+        quality: Union[int, str]
+    ) -> bool:
+        """
+        True when copying these inputs gives what re-encoding them was asked
+        for: every stream is already in video_codec / audio_codec (see
+        ENCODER_CODECS) and no particular quality or bitrate was requested.
+        """
+        if quality != 'auto':
+            return False
+        wanted = {
+            'video': ENCODER_CODECS.get(video_codec, video_codec),
+            'audio': ENCODER_CODECS.get(audio_codec, audio_codec)
+        }
+        return all(
+            stream['codec_name'] == wanted[stream['codec_type']]
+            for probe in probes for stream in probe['streams']
+            if stream['codec_type'] in wanted
+        )
+
+    def _inputs_are_stream_compatible(self, input_videos: List[str]) -> bool:
+        """
+        True when every input has the same video and audio stream properties
+        (VIDEO_COPY_KEYS / AUDIO_COPY_KEYS), so the concat demuxer can copy
+        the streams. Inputs are probed concurrently.
+        """
+        try:
+            formats = {self._stream_format(probe) for probe in self._probe_all(input_videos)}
+        except ffmpeg.Error as e:
+            logger.warning(f"Could not probe inputs for stream copy: {e}")
+            return False
+
+        video_format, _ = next(iter(formats))
+        return len(formats) == 1 and video_format is not None
 
     def _stitch_with_normalization(
         self,
@@ -184,14 +682,21 @@ class VideoStitcher:
         target_resolution: Optional[str],
         video_codec: str,
         audio_codec: str,
-        preset: str
+        preset: str,
+        quality: Union[int, str] = "auto",
+        streaming_mode: str = "faststart",
+        progress: Optional[Callable[[float], None]] = None
     ) -> str:
         """
         Concatenate videos with normalization (resolution, fps, codec).
         More robust but slower than simple concat.
+
+        Each input is re-encoded to an identically formatted NUT segment
+        by its own ffmpeg process, several at a time, and the segments are
+        then joined with a stream-copy concat.
         """
         # Get properties of first video to use as reference
-        first_probe = ffmpeg.probe(input_videos[0])
+        first_probe = self._probe(input_videos[0])
         first_video = next(s for s in first_probe['streams'] if s['codec_type'] == 'video')
 
         # Check if videos have audio
@@ -204,61 +709,185 @@ class VideoStitcher:
             width = int(first_video['width'])
             height = int(first_video['height'])
 
-        # Get target framerate
-        fps = eval(first_video['r_frame_rate'])  # e.g., "30/1" -> 30.0
+        # Get target framerate, kept exact: 30000/1001 rather than 29.97002997...
+        fps = frame_rate(first_video)
 
         logger.info(f"Normalizing to {width}x{height} @ {fps}fps (audio: {has_audio})")
 
-        # Build ffmpeg command with multiple inputs and filters
-        inputs = [ffmpeg.input(video) for video in input_videos]
-
-        # Create filter chain to normalize each video
-        normalized_streams = []
-        for input_stream in inputs:
-            # Scale, set fps, and set audio sample rate
-            video = (
-                input_stream
-                .video
-                .filter('scale', width, height)
-                .filter('setsar', '1/1')  # Set square pixel aspect ratio
-                .filter('fps', fps)
+        run_id = uuid.uuid4().hex[:8]
+        segments = [
+            os.path.join(self.temp_dir, f"segment_{run_id}_{idx}.nut")
+            for idx in range(len(input_videos))
+        ]
+
+        # Seconds encoded per segment; progress is their sum
+        encoded = [0.0] * len(input_videos)
+        encoded_lock = threading.Lock()
+
+        def normalize_one(idx):
+            def segment_progress(seconds):
+                with encoded_lock:
+                    encoded[idx] = seconds
+                    total = sum(encoded)
+                progress(total)
+
+            self._normalize_one(
+                input_videos[idx], segments[idx], width, height, fps,
+                has_audio, video_codec, audio_codec, preset, quality,
+                segment_progress if progress else None
             )
-            normalized_streams.append(video)
 
-            # Only process audio if present
-            if has_audio:
-                audio = input_stream.audio.filter('aresample', 48000)
-                normalized_streams.append(audio)
-
-        # Concatenate all normalized streams
-        if has_audio:
-            joined = ffmpeg.concat(*normalized_streams, v=1, a=1).node
-            # Output with audio
-            output = ffmpeg.output(
-                joined[0],
-                joined[1],
-                output_path,
-                vcodec=video_codec,
-                acodec=audio_codec,
-                preset=preset,
-                movflags='faststart',
-                strict='experimental'
-            )
-        else:
-            joined = ffmpeg.concat(*normalized_streams, v=1, a=0).node
-            # Output without audio
-            output = ffmpeg.output(
-                joined[0],
-                output_path,
-                vcodec=video_codec,
-                preset=preset,
-                movflags='faststart'
+        try:
+            # Each encode uses threads_per_job threads, so run one per that many cores
+            workers = min(len(input_videos), max(1, (os.cpu_count() or 1) // self.threads_per_job))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(normalize_one, range(len(input_videos))))
+
+            # The segments are identical in format, so they are joined without re-encoding
+            # NUT keeps the packets as the encoders wrote them (no ADTS AAC
+            # as MPEG-TS would have), so they go into the MP4 unchanged
+            output_args = {'c': 'copy', **STREAMING_MODES[streaming_mode]}
+            run_ffmpeg(
+                self._concat_input()
+                .output(output_path, **output_args)
+                .overwrite_output(),
+                stdin_data=self._concat_list(segments)
             )
 
-        # Run ffmpeg
-        output.overwrite_output().run(capture_stdout=True, capture_stderr=True)
+            return output_path
 
-        return output_path
+        finally:
+            for path in segments:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    @staticmethod
+    def _concat_list(paths: List[str]) -> bytes:
+        """
+        A concat-demuxer list of paths, for ffmpeg's stdin. Paths are made
+        absolute and single quotes are escaped.
+        """
+        cwd = os.getcwd()
+        return ''.join(
+            # join leaves absolute paths unchanged
+            "file '" + os.path.join(cwd, path).replace("'", "'\\''") + "'\n"
+            for path in paths
+        ).encode()
+
+    @staticmethod
+    def _concat_input():
+        """ffmpeg input reading a _concat_list() from stdin"""
+        # The list arrives over pipe: but names files, so both protocols are allowed
+        return ffmpeg.input('pipe:0', format='concat', safe=0, protocol_whitelist='file,pipe')
+
+    def _normalize_one(
+        self,
+        video_path: str,
+        segment_path: str,
+        width: int,
+        height: int,
+        fps: Optional[Fraction],
+        has_audio: bool,
+        video_codec: str,
+        audio_codec: str,
+        preset: str,
+        quality: Union[int, str] = "auto",
+        progress: Optional[Callable[[float], None]] = None
+    ):
+        """
+        Re-encode one input to a segment in the shared target format, so all
+        segments can be concatenated with stream copy. The segments are NUT,
+        which holds any codec the encoders produce (MPEG-TS has no VP8/VP9).
+        """
+        probe = self._probe(video_path)
+        input_video = next(s for s in probe['streams'] if s['codec_type'] == 'video')
+
+        input_stream = ffmpeg.input(video_path)
+        # Only add the filters that change something for this input; the
+        # pixel format conversion happens in the encoder's input scaler
+        video = input_stream.video
+        scaled = (int(input_video['width']), int(input_video['height'])) != (width, height)
+        if scaled:
+            video = video.filter('scale', width, height)
+        # scale adjusts the SAR to keep the display aspect, so reset it after scaling too
+        if scaled or input_video.get('sample_aspect_ratio') != '1:1':
+            video = video.filter('setsar', '1/1')  # Set square pixel aspect ratio
+        # Resample frames only when the rate actually differs
+        if fps is not None and frame_rate(input_video) != fps:
+            video = video.filter('fps', f"{fps.numerator}/{fps.denominator}")
+        streams = [video]
+        output_args = {
+            'pix_fmt': 'yuv420p',
+            **self._encoder_args(video_codec, preset, quality),
+            'threads': self.threads_per_job,
+            'format': 'nut'
+        }
+
+        if has_audio:
+            input_has_audio = any(s['codec_type'] == 'audio' for s in probe['streams'])
+            if input_has_audio:
+                audio = input_stream.audio.filter('aresample', 48000)
+            else:
+                # Silent track, so every segment has the same streams
+                audio = ffmpeg.input('anullsrc=channel_layout=stereo:sample_rate=48000', format='lavfi')
+                output_args['shortest'] = None
+            streams.append(audio)
+            output_args.update(acodec=audio_codec, ar=48000, ac=2, strict='experimental')
+
+        run_ffmpeg(
+            ffmpeg
+            .output(*streams, segment_path, **output_args)
+            .overwrite_output(),
+            on_progress=progress
+        )
+
+    def _encode_renditions(
+        self,
+        source_path: str,
+        sizes: List[Tuple[int, int]],
+        video_codec: str,
+        preset: str,
+        quality: Union[int, str],
+        streaming_mode: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Encode source_path at each (width, height) in sizes, next to it as
+        <name>_<width>x<height>.mp4. One ffmpeg run decodes the source once
+        and splits the frames across the scalers; audio is copied as is.
+        """
+        probe = self._probe(source_path)
+        has_audio = any(s['codec_type'] == 'audio' for s in probe['streams'])
+        stem, _ = os.path.splitext(source_path)
+
+        source = ffmpeg.input(source_path)
+        frames = source.video.filter_multi_output('split', len(sizes))
+        output_args = {
+            'pix_fmt': 'yuv420p',
+            **self._encoder_args(video_codec, preset, quality),
+            'threads': self.threads_per_job,
+            **STREAMING_MODES[streaming_mode]
+        }
+        if has_audio:
+            output_args['acodec'] = 'copy'
+
+        renditions = []
+        outputs = []
+        for idx, (width, height) in enumerate(sizes):
+            path = f"{stem}_{width}x{height}.mp4"
+            video = frames[idx].filter('scale', width, height).filter('setsar', '1/1')
+            streams = [video, source.audio] if has_audio else [video]
+            outputs.append(ffmpeg.output(*streams, path, **output_args))
+            renditions.append({
+                "output_path": path,
+                "filename": os.path.basename(path),
+                "resolution": f"{width}x{height}"
+            })
+
+        run_ffmpeg(ffmpeg.merge_outputs(*outputs).overwrite_output())
+
+        for rendition in renditions:
+            rendition["size"] = os.path.getsize(rendition["output_path"])
+        return renditions
 
     def get_video_info(self, video_path: str) -> Dict[str, Any]:
         """
@@ -273,8 +902,9 @@ class VideoStitcher:
         if not os.path.exists(video_path):
             raise FileNotFoundError(f"Video not found: {video_path}")
 
-        probe = ffmpeg.probe(video_path)
+        probe = self._probe(video_path)
         video_stream = next(s for s in probe['streams'] if s['codec_type'] == 'video')
+        fps = frame_rate(video_stream)
 
         return {
             "duration": float(probe['format']['duration']),
@@ -283,7 +913,7 @@ class VideoStitcher:
             "width": int(video_stream['width']),
             "height": int(video_stream['height']),
             "codec": video_stream['codec_name'],
-            "fps": eval(video_stream['r_frame_rate']),
+            "fps": float(fps) if fps else None,
             "bitrate": int(probe['format'].get('bit_rate', 0))
         }
 